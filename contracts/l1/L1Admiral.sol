@@ -8,6 +8,11 @@ import "./starknet/IStarknetMessaging.sol";
 contract L1Admiral {
     // Selector when sending message to L2 to call the `process_message_from_l1` func on the L2 Admiral
     uint256 constant PROCESS_MESSAGE_FROM_L1_SELECTOR = 816708063554545988512071046177985264005137018110515604108563152300587620475;
+    // Selector of the `process_indexed_msg_from_l1` func, returns ships by index
+    uint256 constant PROCESS_INDEXED_MESSAGE_FROM_L1_SELECTOR = 52357581461860396089620452624985387634989253256907965913609507801198506462;
+    // Version of the indexed messages: [version, ship index, amount] from L2 and the returns sent back.
+    // Messages without a version only hold the amount and are returned with `executeRides`.
+    uint256 constant MESSAGE_VERSION = 1;
     uint256 constant UINT256_PART_SIZE_BITS = 128;
     uint256 constant UINT256_PART_SIZE = 2**UINT256_PART_SIZE_BITS;
 
@@ -56,70 +61,137 @@ contract L1Admiral {
      * execute them), then this function will still execute the other rideAmounts.
      * 
      * The function returns an array of the rideAmounts which it successfully executed.
+     *
+     * Rides are matched by amount, use `executeShipRides` for ships that departed with an indexed message.
      */
     function executeRides(uint256[] calldata rideAmounts) external returns (uint256[] memory successfulRideAmounts) {
+        (, successfulRideAmounts) = _executeRides(false, new uint256[](0), rideAmounts);
+    }
+
+    /**
+     * Same as `executeRides` for ships that departed with an indexed message. The index of every ride is echoed back
+     * to L2 so the L2 Admiral addresses the ships directly instead of matching their amounts.
+     *
+     * The function returns the ship indexes and rideAmounts which it successfully executed.
+     */
+    function executeShipRides(uint256[] calldata shipIndexes, uint256[] calldata rideAmounts) external returns (
+        uint256[] memory successfulShipIndexes,
+        uint256[] memory successfulRideAmounts
+    ) {
+        require(shipIndexes.length == rideAmounts.length, "Every ride needs a ship index.");
+        return _executeRides(true, shipIndexes, rideAmounts);
+    }
+
+    function _executeRides(bool indexed, uint256[] memory shipIndexes, uint256[] memory rideAmounts) internal returns (
+        uint256[] memory successfulShipIndexes,
+        uint256[] memory successfulRideAmounts
+    ) {
         uint256 startGas = gasleft();
 
         // Attempt to withdraw all rideAmounts from gate
-        uint256 rideCount = rideAmounts.length;
+        uint256 inputTokenBalance = withdrawFromGate(rideAmounts);
 
-        for(uint256 i = 0; i < rideCount; i++) {
+        // Consume amount info message
+        uint256 totalAmount;
+        uint256 successfulRideCount;
+        (successfulShipIndexes, successfulRideAmounts, successfulRideCount, totalAmount) =
+            consumeRideMessages(indexed, shipIndexes, rideAmounts, inputTokenBalance);
 
-            bool success = safeWithdrawFromGate(rideAmounts[i]);
-            if (success) {
-                emit SuccessfulAmountWithdrawal(rideAmounts[i]);
-            } else {
-                emit UnsuccessfulAmountWithdrawal(rideAmounts[i]);
-            }
-        }
+        // Return empty arrays if no rides were successfully withdrawn
+        if (totalAmount == 0) return (successfulShipIndexes, successfulRideAmounts);
 
-        // Consume amount info message
-        // The ones that we are able to consume (and have enough input token balance to actually execute) will be
-        // pushed to successfulRideAmounts and their total to totalAmount
-        uint256 inputTokenBalance = inputToken.balanceOf(address(this));
-        uint256[] memory _successfulRideAmounts = new uint256[](rideCount);
-        uint256 totalAmount = 0;
-        uint256 successfulRideCount = 0;
-        for(uint256 i = 0; i < rideCount; i++) {
+        // Swap
+        uint256 outputTokenAmount = safeExecuteSwap(totalAmount);
+
+        // Deposit to gate
+        safeDepositToGate(outputTokenAmount);
+
+        // Send message to L2 to finalize the ride
+        sendReturnMessage(indexed, successfulShipIndexes, successfulRideAmounts, successfulRideCount,
+                          outputTokenAmount, startGas);
+
+        return (successfulShipIndexes, successfulRideAmounts);
+    }
+
+    /**
+        Consume the amount info messages of the rides.
+        The ones that we are able to consume (and have enough input token balance to actually execute) will be
+        pushed to successfulRideAmounts (and their index to successfulShipIndexes) and their total to totalAmount.
+        inputTokenBalance is this contract's input token balance after withdrawing from the gate.
+     */
+    function consumeRideMessages(
+        bool indexed,
+        uint256[] memory shipIndexes,
+        uint256[] memory rideAmounts,
+        uint256 inputTokenBalance
+    )
+        internal
+        returns (
+            uint256[] memory successfulShipIndexes,
+            uint256[] memory successfulRideAmounts,
+            uint256 successfulRideCount,
+            uint256 totalAmount
+        )
+    {
+        successfulShipIndexes = new uint256[](indexed ? rideAmounts.length : 0);
+        successfulRideAmounts = new uint256[](rideAmounts.length);
+        for(uint256 i = 0; i < rideAmounts.length; i++) {
             // If ride amount is bigger than our token balance, skip it
             if (rideAmounts[i] + totalAmount > inputTokenBalance) { continue; }
 
-            // Consume the amount info message
-            bool success = consumeAmountMessage(rideAmounts[i]);
+            bool success = indexed
+                ? consumeShipMessage(shipIndexes[i], rideAmounts[i])
+                : consumeAmountMessage(rideAmounts[i]);
             if (success) {
                 totalAmount += rideAmounts[i];
-                _successfulRideAmounts[successfulRideCount] = rideAmounts[i];
+                if (indexed) {
+                    successfulShipIndexes[successfulRideCount] = shipIndexes[i];
+                }
+                successfulRideAmounts[successfulRideCount] = rideAmounts[i];
                 successfulRideCount++;
                 emit SuccessfulAmountMessageWithdrawal(rideAmounts[i]);
             } else {
                 emit UnsuccessfulAmountMessageWithdrawal(rideAmounts[i]);
             }
         }
+    }
 
-        // Return empty array if no rides were successfully withdrawn
-        if (totalAmount == 0) return _successfulRideAmounts;
-
-        // Swap
-        uint256 outputTokenAmount = safeExecuteSwap(totalAmount);
-
-        // Deposit to gate
-        safeDepositToGate(outputTokenAmount);
-
-        // Send message to L2 to finalize the ride
+    /**
+        Send the message finalizing the successful rides to L2. Indexed messages are laid out as
+        [version, count, ship indexes..., count, ride amounts..., total_payout, gas_used], the others as
+        [count, ride amounts..., total_payout, gas_used], every uint256 split in low and high.
+     */
+    function sendReturnMessage(
+        bool indexed,
+        uint256[] memory shipIndexes,
+        uint256[] memory rideAmounts,
+        uint256 rideCount,
+        uint256 totalPayout,
+        uint256 startGas
+    ) internal {
         // Construct the message's payload
-        uint256[] memory payload = new uint256[](successfulRideCount * 2 + 5);
-        payload[0] = successfulRideCount;
+        uint256 offset = indexed ? rideCount + 2 : 0;
+        uint256[] memory payload = new uint256[](offset + rideCount * 2 + 5);
+        if (indexed) {
+            payload[0] = MESSAGE_VERSION;
+            payload[1] = rideCount;
+            for(uint256 i = 0; i < rideCount; i++) {
+                payload[i+2] = shipIndexes[i];
+            }
+        }
+
+        payload[offset] = rideCount;
         // ride_amounts
-        for(uint256 i = 0; i < successfulRideCount; i++) {
+        for(uint256 i = 0; i < rideCount; i++) {
             // Convert uint256 to to low and high (in order to be receivable by L2)
             // low 128
-            payload[i*2+1] = _successfulRideAmounts[i] & (UINT256_PART_SIZE - 1);
+            payload[offset+i*2+1] = rideAmounts[i] & (UINT256_PART_SIZE - 1);
             // high 128
-            payload[i*2+2] = _successfulRideAmounts[i] >> UINT256_PART_SIZE_BITS;
+            payload[offset+i*2+2] = rideAmounts[i] >> UINT256_PART_SIZE_BITS;
         }
         // total_payout
-        payload[successfulRideCount * 2 + 1] = outputTokenAmount & (UINT256_PART_SIZE - 1);
-        payload[successfulRideCount * 2 + 2] = outputTokenAmount >> UINT256_PART_SIZE_BITS;
+        payload[offset + rideCount * 2 + 1] = totalPayout & (UINT256_PART_SIZE - 1);
+        payload[offset + rideCount * 2 + 2] = totalPayout >> UINT256_PART_SIZE_BITS;
 
         // gas_used
         // TODO: gas seems off.. it's weirdly unpredictable, for example:
@@ -131,17 +203,15 @@ contract L1Admiral {
         // actual gas used: 287681
         // could be a problem on goerli specifically (gasUsed() implementation is different than actual node implementation)?
         uint256 gasUsed = startGas - gasleft();
-        payload[successfulRideCount * 2 + 3] = gasUsed & (UINT256_PART_SIZE - 1);
-        payload[successfulRideCount * 2 + 4] = gasUsed >> UINT256_PART_SIZE_BITS;
+        payload[offset + rideCount * 2 + 3] = gasUsed & (UINT256_PART_SIZE - 1);
+        payload[offset + rideCount * 2 + 4] = gasUsed >> UINT256_PART_SIZE_BITS;
 
 
         starknetCore.sendMessageToL2(
             l2Admiral,
-            PROCESS_MESSAGE_FROM_L1_SELECTOR,
+            indexed ? PROCESS_INDEXED_MESSAGE_FROM_L1_SELECTOR : PROCESS_MESSAGE_FROM_L1_SELECTOR,
             payload
         );
-
-        return _successfulRideAmounts;
     }
 
     /**
@@ -162,22 +232,81 @@ contract L1Admiral {
     }
 
     /**
-        Withdraw `amount` input token from the Stargate. Ensure that the correct amount was withdrawn.
-        Returns true if successful in withdrawing given amount.
-        Returns false if withdrawing function is unsucessful.
+        Attempt to consume the indexed depart message of the given ship and amount.
+        This function returns false if unsuccessful (e.g., message not available), and true if successful.
+        It does not revert.
+     */
+    function consumeShipMessage(uint256 shipIndex, uint256 amount) internal returns (bool success) {
+        uint256[] memory payload = new uint256[](4);
+        payload[0] = MESSAGE_VERSION;
+        payload[1] = shipIndex;
+        payload[2] = amount & (UINT256_PART_SIZE - 1);
+        payload[3] = amount >> UINT256_PART_SIZE_BITS;
+
+        try starknetCore.consumeMessageFromL2(l2Admiral, payload) returns (bytes32) {
+            return true;
+        } catch(bytes memory) {
+            return false;
+        }
+    }
+
+    /**
+        Withdraw every amount in `amounts` input token from the Starkgate and return the input token balance after.
+        The gate releases a single withdrawal message per call, so every amount takes its own call, but an amount that
+        failed is not tried again for the rides after it. The balance is only read before and after all the calls:
+        together they have to have given exactly the amounts that were withdrawn.
+        Emits SuccessfulAmountWithdrawal or UnsuccessfulAmountWithdrawal for every amount.
         Reverts if able to withdraw but wrong amount given from the gate.
      */
-    function safeWithdrawFromGate(uint256 amount) internal returns (bool success) {
+    function withdrawFromGate(uint256[] memory amounts) internal virtual returns (uint256 inputTokenBalance) {
         uint256 inputTokenAmountBeforeWithdraw = inputToken.balanceOf(address(this));
-        (bool _success,) = address(inputTokenStarkgate).call(abi.encodeWithSignature(
+        uint256 withdrawnAmount;
+        // Distinct amounts the gate failed to withdraw so far
+        uint256[] memory failedAmounts = new uint256[](amounts.length);
+        uint256 failedCount;
+
+        for(uint256 i = 0; i < amounts.length; i++) {
+            bool failedBefore = contains(failedAmounts, failedCount, amounts[i]);
+            if (!failedBefore && tryWithdrawFromGate(amounts[i])) {
+                withdrawnAmount += amounts[i];
+                emit SuccessfulAmountWithdrawal(amounts[i]);
+            } else {
+                if (!failedBefore) {
+                    failedAmounts[failedCount] = amounts[i];
+                    failedCount++;
+                }
+                emit UnsuccessfulAmountWithdrawal(amounts[i]);
+            }
+        }
+
+        // Calls that fail revert, nothing can have been received
+        if (withdrawnAmount == 0) return inputTokenAmountBeforeWithdraw;
+
+        inputTokenBalance = inputToken.balanceOf(address(this));
+        require(inputTokenAmountBeforeWithdraw + withdrawnAmount == inputTokenBalance, "Incorrect amount withdrawn from Starkgate");
+    }
+
+    /**
+        Whether `amount` is one of the first `count` entries of `values`.
+     */
+    function contains(uint256[] memory values, uint256 count, uint256 amount) internal pure returns (bool) {
+        for(uint256 i = 0; i < count; i++) {
+            if (values[i] == amount) return true;
+        }
+        return false;
+    }
+
+    /**
+        Attempt to withdraw `amount` input token from the Starkgate.
+        Returns true if successful in withdrawing given amount, false if the withdrawing function is unsuccessful.
+        It does not revert, the amount received is checked by `withdrawFromGate`.
+     */
+    function tryWithdrawFromGate(uint256 amount) internal returns (bool success) {
+        (success,) = address(inputTokenStarkgate).call(abi.encodeWithSignature(
             "withdraw(uint256,address)",
             amount,
             address(this)
         ));
-        if (!_success) {return false;}
-        uint256 inputTokenAmountAfterWithdraw = inputToken.balanceOf(address(this));
-        require(inputTokenAmountBeforeWithdraw + amount == inputTokenAmountAfterWithdraw, "Incorrect amount withdrawn from Starkgate");
-        return true;
     }
 
     /**
@@ -0,0 +1,58 @@
+/**
+    L1Admiral withdrawing from the Starkgate the way it did before withdrawFromGate: every ride checks the
+    input token balance before and after its own withdrawal, and rides that failed are tried again.
+    Only used to measure the gas of the batched withdrawal against it.
+ */
+
+// SPDX-License-Identifier: Apache-2.0.
+pragma solidity ^0.6.12;
+
+import "../L1Admiral.sol";
+
+contract MockPerRideL1Admiral is L1Admiral {
+
+    constructor(
+        IStarknetMessaging _starknetCore,
+        uint256 _l2Admiral,
+        IStarkgate _inputTokenStarkgate,
+        IStarkgate _outputTokenStarkgate,
+        ERC20 _inputToken,
+        ERC20 _outputToken,
+        address _destContract,
+        bytes4 _sighash
+    ) L1Admiral(
+        _starknetCore,
+        _l2Admiral,
+        _inputTokenStarkgate,
+        _outputTokenStarkgate,
+        _inputToken,
+        _outputToken,
+        _destContract,
+        _sighash
+    ) public {}
+
+    function withdrawFromGate(uint256[] memory amounts) internal override returns (uint256 inputTokenBalance) {
+        for(uint256 i = 0; i < amounts.length; i++) {
+            bool success = safeWithdrawFromGate(amounts[i]);
+            if (success) {
+                emit SuccessfulAmountWithdrawal(amounts[i]);
+            } else {
+                emit UnsuccessfulAmountWithdrawal(amounts[i]);
+            }
+        }
+        return inputToken.balanceOf(address(this));
+    }
+
+    function safeWithdrawFromGate(uint256 amount) internal returns (bool success) {
+        uint256 inputTokenAmountBeforeWithdraw = inputToken.balanceOf(address(this));
+        (bool _success,) = address(inputTokenStarkgate).call(abi.encodeWithSignature(
+            "withdraw(uint256,address)",
+            amount,
+            address(this)
+        ));
+        if (!_success) {return false;}
+        uint256 inputTokenAmountAfterWithdraw = inputToken.balanceOf(address(this));
+        require(inputTokenAmountBeforeWithdraw + amount == inputTokenAmountAfterWithdraw, "Incorrect amount withdrawn from Starkgate");
+        return true;
+    }
+}
@@ -6,11 +6,11 @@ from starkware.cairo.common.math_cmp import is_le
 from starkware.cairo.common.registers import get_label_location
 from starkware.cairo.common.registers import get_fp_and_pc
 
-from starkware.cairo.common.math import (assert_lt, assert_not_zero, assert_le)
+from starkware.cairo.common.math import (assert_lt, assert_not_zero, assert_le, unsigned_div_rem)
 from starkware.starknet.common.syscalls import (get_caller_address, get_contract_address)
 from starkware.cairo.common.uint256 import (Uint256, uint256_lt, uint256_le, uint256_eq)
 from openzeppelin.security.safemath.library import SafeUint256
-from starkware.cairo.common.bool import TRUE
+from starkware.cairo.common.bool import (TRUE, FALSE)
 from starkware.starknet.common.messages import send_message_to_l1
 
 from openzeppelin.token.erc20.IERC20 import IERC20
@@ -34,16 +34,22 @@ from contracts.l2.util.FleetManager import (
     FleetManager_shipDetails,
     FleetManager_rideContribution,
     FleetManager_rideContributions,
+    FleetManager_rideContributionsOf,
     FleetManager_findShipByAmount,
     FleetManager_markReturned,
     FleetManager_finalize,
+    FleetManager_finalizeBatch,
     FleetManager_updateOldestIndex,
 
     FleetManager_shipMetadata,
+    FleetManager_ship,
     FleetManager_openShipIndex,
     FleetManager_oldestActiveShipIdx,
     FleetManager_fleetSize,
-    FleetManager_fleet
+    FleetManager_fleet,
+    FleetManager_fleetPage,
+    FleetManager_crewPage,
+    IndexedShip
 )
 
 @storage_var
@@ -78,12 +84,35 @@ end
 func sv_unload_batch_size() -> (batch_size: felt):
 end
 
+# Most crew a ship takes, 0 for no limit
+@storage_var
+func sv_max_crew_size() -> (max_size: felt):
+end
+
+# Cargo at which a deposit departs the open ship, 0 to leave departing to the keeper
+@storage_var
+func sv_auto_depart_cargo() -> (cargo: Uint256):
+end
+
 @storage_var
 func sv_price_per_ship() -> (price_per_ship: Uint256):
 end
 
+# Steps an unload_ship transaction may take and what it costs, as measured by
+# tests/l2/pytest/calibrate_unload.py. When a budget is set it sizes the unload batches
+# instead of sv_unload_batch_size.
+struct UnloadCost:
+    member step_budget: felt
+    member ship_steps: felt
+    member crew_steps: felt
+end
+
+@storage_var
+func sv_unload_cost() -> (cost: UnloadCost):
+end
+
 @event
-func ev_deposited(contributor: felt, amount: Uint256):
+func ev_deposited(contributor: felt, amount: Uint256, ship_idx: felt):
 end
 
 @event
@@ -98,6 +127,17 @@ end
 func ev_returned(idx: felt):
 end
 
+# An unload batch paid out the crew of the ship from the last one down to crew_remaining, the
+# ship is not finalised yet
+@event
+func ev_unloaded(idx: felt, crew_remaining: felt):
+end
+
+# The crew member collected their loot and left the ship, see collect_loot
+@event
+func ev_loot_collected(idx: felt, crew_account: felt):
+end
+
 @event
 func ev_l1_message_received(from_address: felt, cargo_len: felt, cargo: Uint256*, total_loot: Uint256, gas_used: Uint256):
 end
@@ -105,6 +145,10 @@ end
 const MESSAGE_DEPART = 0
 const MESSAGE_FINALISE = 1
 
+# Version of the depart message sent to L1 and of the indexed return message L1 sends back.
+# Version 0, the cargo amount alone, is still accepted by process_msg_from_l1.
+const MESSAGE_VERSION = 1
+
 @constructor
 func constructor{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(
                     l2_starkgate_address: felt,
@@ -153,68 +197,157 @@ func deposit{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(a
     end
 
     # Add the deposit to internal bookkeeping
-    FleetManager_deposit(account, amount)
+    let (max_crew_size) = sv_max_crew_size.read()
+    let (ship_idx) = FleetManager_deposit(account, amount, max_crew_size)
 
     # Transfer tokens from sender account into L2Conductor
     IERC20.transferFrom(contract_address=token_address, sender=account, recipient=self, amount=amount)
-    ev_deposited.emit(account, amount)
+    ev_deposited.emit(account, amount, ship_idx)
 
+    _auto_depart(ship_idx)
     return ()
 end
 
-#@external
-#func collect_loot{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt):
-    #alloc_locals
-    #let (__fp__, _) = get_fp_and_pc()
-    #let (crew_account) = get_caller_address()
-    #let (ship: Ship) = FleetManager_shipMetadata(ship_idx)
+# Departs the ship in the deposit that brings its cargo to the auto departure target, unless
+# the fleet is full. The keeper departs it later then.
+func _auto_depart{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt):
+    alloc_locals
+    let (local target: Uint256) = sv_auto_depart_cargo.read()
+    let (is_disabled) = uint256_eq(target, Uint256(0, 0))
+    if is_disabled == TRUE:
+        return ()
+    end
 
-    #with_attr error_message("Ship must be in returned status"):
-        #assert ship.status = RETURNED
-    #end
+    # The cargo has to cover the price per ship as well
+    let (local ship: Ship) = FleetManager_ship(ship_idx)
+    let (price_per_ship: Uint256) = sv_price_per_ship.read()
+    let (is_target_reached) = uint256_le(target, ship.cargo)
+    let (is_price_covered) = uint256_le(price_per_ship, ship.cargo)
+    if is_target_reached * is_price_covered == FALSE:
+        return ()
+    end
 
-    #let (crew_cargo, was_finalised) = FleetManager_disembark(ship_idx, crew_account)
+    let (max_fleet_size: felt) = sv_max_fleet_size.read()
+    let (fleet_size: felt) = FleetManager_fleetSize()
+    let (is_fleet_full) = is_le(max_fleet_size, fleet_size)
+    if is_fleet_full == TRUE:
+        return ()
+    end
 
-    #with_attr error_message("No loot to collect"):
-        #let (has_contributed) = uint256_lt(Uint256(0,0), crew_cargo)
-        #assert has_contributed = 1
-    #end
+    _depart(ship_idx)
+    return ()
+end
+
+# Pay out the crew member's loot on a returned ship and take them off its crew. The loot comes
+# from the ship's PayoutCtx, recorded once when the ship returned, so this costs the same
+# whatever the size of the crew. The last crew member to leave finalises the ship.
+# @returns collected: FALSE if the ship is not returned or the account has no cargo on it
+func _collect_loot{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt, crew_account: felt) -> (collected: felt):
+    alloc_locals
+    let (__fp__, _) = get_fp_and_pc()
+    let (ship: Ship) = FleetManager_ship(ship_idx)
 
-    #let (local ctx: PayoutCtx) = sv_payout_ctx.read(ship_idx)
-    #_transfer_loot_to_crew(crew_account, crew_cargo, &ctx)
+    if ship.status != RETURNED:
+        return (FALSE)
+    end
+
+    let (local crew_cargo, local was_finalised) = FleetManager_disembark(ship_idx, crew_account)
+    let (has_cargo) = uint256_lt(Uint256(0,0), crew_cargo)
+    if has_cargo == FALSE:
+        return (FALSE)
+    end
 
-    ##if we only had one crew then the ship was finalised and we need to clean up
-    #if was_finalised == 1:
-        #sv_payout_ctx.write(ship_idx, PayoutCtx(Uint256(0,0), Uint256(0,0), Uint256(0,0), 0))
-        #FleetManager_updateOldestIndex()
-        #ev_finalised.emit(ship_idx)
-        #return ()
-    #else:
-        #return ()
-    #end
-#end
+    let (local ctx: PayoutCtx) = sv_payout_ctx.read(ship_idx)
+    _transfer_loot_to_crew(crew_account, crew_cargo, &ctx)
+    ev_loot_collected.emit(ship_idx, crew_account)
 
+    #if this was the last crew member then the ship was finalised and we need to clean up
+    if was_finalised == 1:
+        sv_payout_ctx.write(ship_idx, PayoutCtx(Uint256(0,0), Uint256(0,0), Uint256(0,0), 0))
+        ev_finalised.emit(ship_idx)
+        return (TRUE)
+    end
+
+    return (TRUE)
+end
+
+func _collect_loot_for{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt, crew_accounts_len: felt, crew_accounts: felt*, collected: felt) -> (collected: felt):
+    if crew_accounts_len == 0:
+        return (collected)
+    end
+
+    let (is_collected) = _collect_loot(ship_idx, [crew_accounts])
+    return _collect_loot_for(ship_idx, crew_accounts_len - 1, crew_accounts + 1, collected + is_collected)
+end
+
+# Claim the caller's loot on a returned ship without waiting for unload_ship
 @external
-func depart{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt):
+func collect_loot{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt):
+    alloc_locals
+    let (local crew_account) = get_caller_address()
+    let (ship: Ship) = FleetManager_shipMetadata(ship_idx)
+
+    with_attr error_message("Ship must be in returned status"):
+        assert ship.status = RETURNED
+    end
+
+    with_attr error_message("No loot to collect"):
+        let (collected) = _collect_loot(ship_idx, crew_account)
+        assert collected = TRUE
+    end
+
+    return ()
+end
+
+# Claim the loot of several crew members of a returned ship, e.g. from a relayer. The loot
+# always goes to the crew member. Accounts with nothing to collect are skipped.
+# @returns collected: number of accounts paid out
+@external
+func collect_loot_for{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt, crew_accounts_len: felt, crew_accounts: felt*) -> (collected: felt):
+    return _collect_loot_for(ship_idx, crew_accounts_len, crew_accounts, 0)
+end
+
+# Sends the ship to L1: pays the keeper, withdraws the cargo through starkgate and tells L1
+# which ship it is
+func _depart{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt):
     alloc_locals
 
     let (l1_contract_address: felt) = sv_l1_contract_address.read()
     let (l2_starkgate_address: felt) = sv_l2_starkgate_address.read()
     let (pooling_token_address: felt) = sv_pooling_token_address.read()
-    let (caller_address: felt) = get_caller_address()
     let (keeper: felt) = sv_keeper_address.read()
-    let (open_ship_idx) = FleetManager_openShipIndex()
-    let (max_fleet_size: felt) = sv_max_fleet_size.read()
-    let (fleet_size: felt) = FleetManager_fleetSize()
     let (price_per_ship: Uint256) = sv_price_per_ship.read()
 
     assert_not_zero(l1_contract_address)
     assert_not_zero(l2_starkgate_address)
 
+    IERC20.transfer(pooling_token_address, keeper, price_per_ship)
 
-    with_attr error_message("Only current ship can be departed"):
-        assert open_ship_idx = ship_idx
-    end
+    let (ship_idx: felt, ship: Ship) = FleetManager_depart(ship_idx, price_per_ship)
+
+    let (cargo_minus_fee) = SafeUint256.sub_le(ship.cargo, price_per_ship)
+    ITokenBridge.initiate_withdraw(contract_address=l2_starkgate_address, l1_recipient=l1_contract_address, amount=cargo_minus_fee)
+
+    let (message_payload : felt*) = alloc()
+    assert message_payload[0] = MESSAGE_VERSION
+    assert message_payload[1] = ship_idx
+    assert message_payload[2] = cargo_minus_fee.low
+    assert message_payload[3] = cargo_minus_fee.high
+    send_message_to_l1(l1_contract_address, 4, message_payload)
+
+    ev_departed.emit(ship_idx, ship.crew, ship.cargo, price_per_ship)
+
+    return ()
+end
+
+@external
+func depart{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt):
+    alloc_locals
+
+    let (caller_address: felt) = get_caller_address()
+    let (keeper: felt) = sv_keeper_address.read()
+    let (max_fleet_size: felt) = sv_max_fleet_size.read()
+    let (fleet_size: felt) = FleetManager_fleetSize()
 
     with_attr error_message("Maximum fleet size exceeded"):
         assert_lt(fleet_size, max_fleet_size)
@@ -229,21 +362,7 @@ func depart{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(sh
         end
     end
 
-
-    IERC20.transfer(pooling_token_address, keeper, price_per_ship)
-
-    let (ship_idx: felt, ship: Ship) = FleetManager_depart(price_per_ship)
-
-    let (cargo_minus_fee) = SafeUint256.sub_le(ship.cargo, price_per_ship)
-    ITokenBridge.initiate_withdraw(contract_address=l2_starkgate_address, l1_recipient=l1_contract_address, amount=cargo_minus_fee)
-
-    let (message_payload : felt*) = alloc()
-    assert message_payload[0] = cargo_minus_fee.low
-    assert message_payload[1] = cargo_minus_fee.high
-    send_message_to_l1(l1_contract_address, 2, message_payload)
-
-    ev_departed.emit(ship_idx, ship.crew, ship.cargo, price_per_ship)
-
+    _depart(ship_idx)
     return ()
 end
 
@@ -265,12 +384,16 @@ end
 #    shipCargo        crewCargo                              crewCargo * payoutAllShips
 # --------------- * ------------ * payoutAllShips   ===>   ----------------------------
 #  allShipsCargo      shipCargo                                     allShipsCargo
-func _transfer_loot_to_crew{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(crew_account: felt, crew_cargo: Uint256, ctx: PayoutCtx*) -> ():
-    alloc_locals
-
+func _loot_payout{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(crew_cargo: Uint256, ctx: PayoutCtx*) -> (payout: Uint256):
     let (result: Uint256) = SafeUint256.mul(crew_cargo, ctx.allShipsLoot)
     let (payout: Uint256, _: Uint256) = SafeUint256.div_rem(result, ctx.allShipsCargo)
+    return (payout)
+end
+
+func _transfer_loot_to_crew{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(crew_account: felt, crew_cargo: Uint256, ctx: PayoutCtx*) -> ():
+    alloc_locals
 
+    let (payout: Uint256) = _loot_payout(crew_cargo, ctx)
 
     let (success) = IERC20.transfer(contract_address=ctx.loot_token_address, recipient=crew_account, amount=payout)
     assert success = TRUE
@@ -279,6 +402,24 @@ func _transfer_loot_to_crew{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,ran
     return ()
 end
 
+# Loot paid out to crew but not transferred yet, see unload_ships_to_ledger
+@storage_var
+func sv_loot_owed(account: felt) -> (loot: Uint256):
+end
+
+# Same payout as _transfer_loot_to_crew, credited to the crew member's loot ledger instead of
+# transferred. A storage write instead of a call into the loot token.
+func _credit_loot_to_crew{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(crew_account: felt, crew_cargo: Uint256, ctx: PayoutCtx*) -> ():
+    alloc_locals
+
+    let (payout: Uint256) = _loot_payout(crew_cargo, ctx)
+    let (owed: Uint256) = sv_loot_owed.read(crew_account)
+    let (new_owed: Uint256) = SafeUint256.add(owed, payout)
+    sv_loot_owed.write(crew_account, new_owed)
+
+    return ()
+end
+
 
 func _process_amounts{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(amount: Uint256*, end_ptr: Uint256*, ship_indexes: felt*, total: Uint256, total_loot: Uint256) -> (res: felt):
     alloc_locals
@@ -319,6 +460,31 @@ func _sum_ship_cargo_with_fee_re_applied{syscall_ptr : felt*, pedersen_ptr : Has
     return (sum)
 end
 
+func _sum_indexed_ship_cargo_with_fee_re_applied{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ships_count: felt, ships_cargo_without_fee: Uint256*, ship_indexes: felt*) -> (total_cargo_plus_fees: Uint256):
+    alloc_locals
+    if ships_count == 0:
+        return (Uint256(0, 0))
+    end
+    let (sub_sum) = _sum_indexed_ship_cargo_with_fee_re_applied(ships_count - 1, ships_cargo_without_fee + Uint256.SIZE, ship_indexes + 1)
+
+    let cargo_without_fee = [ships_cargo_without_fee]
+    let ship_idx = [ship_indexes]
+
+    let (ship) = FleetManager_shipMetadata(ship_idx)
+    with_attr error_message("Returned cargo does not match the ship"):
+        let (is_eq) = uint256_eq(ship.cargo, cargo_without_fee)
+        assert is_eq = TRUE
+    end
+    FleetManager_markReturned(ship_idx)
+
+    let (cargo_with_fee) = SafeUint256.add(cargo_without_fee, ship.fee_taken)
+    let (sum) = SafeUint256.add(cargo_with_fee, sub_sum)
+
+    return (sum)
+end
+
+# Process the return of ships matched by cargo amount, the message format (version 0) sent
+# back by L1 for ships that departed before messages carried the ship index
 @l1_handler
 func process_msg_from_l1{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(from_address: felt, ships_cargo_without_fee_len: felt, ships_cargo_without_fee: Uint256*, total_loot: Uint256, gas_used: Uint256):
     alloc_locals
@@ -339,15 +505,49 @@ func process_msg_from_l1{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_
 
     let (total_amount_with_fee) = _sum_ship_cargo_with_fee_re_applied(ships_cargo_without_fee_len, ships_cargo_without_fee, ship_indexes)
     _process_amounts(ships_cargo_without_fee, ships_cargo_without_fee + (ships_cargo_without_fee_len * Uint256.SIZE), ship_indexes, total_amount_with_fee, total_loot)
-    FleetManager_updateOldestIndex()
     return ()
 end
 
+# Process the return of ships addressed by index, the ships' cargo has to match what departed
+@l1_handler
+func process_indexed_msg_from_l1{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(from_address: felt, version: felt, ship_indexes_len: felt, ship_indexes: felt*, ships_cargo_without_fee_len: felt, ships_cargo_without_fee: Uint256*, total_loot: Uint256, gas_used: Uint256):
+    alloc_locals
+    let (l1_contract_address: felt) = sv_l1_contract_address.read()
+    assert from_address = l1_contract_address
+
+    with_attr error_message("Unsupported message version"):
+        assert version = MESSAGE_VERSION
+    end
+
+    with_attr error_message("Every returned ship needs an index and a cargo"):
+        assert_lt(0, ships_cargo_without_fee_len)
+        assert ship_indexes_len = ships_cargo_without_fee_len
+    end
+
+    ev_l1_message_received.emit(from_address, ships_cargo_without_fee_len, ships_cargo_without_fee, total_loot, gas_used)
+
+    let (total_amount_with_fee) = _sum_indexed_ship_cargo_with_fee_re_applied(ships_cargo_without_fee_len, ships_cargo_without_fee, ship_indexes)
+    _process_amounts(ships_cargo_without_fee, ships_cargo_without_fee + (ships_cargo_without_fee_len * Uint256.SIZE), ship_indexes, total_amount_with_fee, total_loot)
+    return ()
+end
+
+# Number of crew unload_ship pays out: as many as fit in the step budget, or
+# sv_unload_batch_size when there is none
+func _unload_batch_size{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}() -> (batch_size: felt):
+    let (cost: UnloadCost) = sv_unload_cost.read()
+    if cost.step_budget == 0:
+        return sv_unload_batch_size.read()
+    end
+
+    let (batch_size, _) = unsigned_div_rem(cost.step_budget - cost.ship_steps, cost.crew_steps)
+    return (batch_size)
+end
+
 @external
 func unload_ship{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(idx: felt) -> (success: felt):
     alloc_locals
-    let (ship: Ship) = FleetManager_shipMetadata(idx)
-    let (batch_size) = sv_unload_batch_size.read()
+    let (local ship: Ship) = FleetManager_shipMetadata(idx)
+    let (local batch_size) = _unload_batch_size()
 
     # Return if ship is not in correct status
     if ship.status != RETURNED:
@@ -363,13 +563,163 @@ func unload_ship{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_pt
     if was_finalised == 1:
         ev_finalised.emit(idx)
         sv_payout_ctx.write(idx, PayoutCtx(Uint256(0,0), Uint256(0,0), Uint256(0,0), 0))
-        FleetManager_updateOldestIndex()
         return (success=1)
     end
 
+    ev_unloaded.emit(idx, ship.crew - batch_size)
     return (success=1)
 end
 
+struct UnloadProgress:
+    member ship_idx: felt
+    member crew_unloaded: felt
+    member crew_remaining: felt
+end
+
+# Finalise up to `budget` crew of the ship if it returned, recording what was done in progress
+func _unload_with_budget{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(idx: felt, budget: felt, cb: felt*, progress: UnloadProgress*, count: felt) -> (budget: felt, count: felt):
+    alloc_locals
+    let (local ship: Ship) = FleetManager_ship(idx)
+    if ship.status != RETURNED:
+        return (budget, count)
+    end
+
+    local crew_unloaded
+    let (is_budget_enough) = is_le(ship.crew, budget)
+    if is_budget_enough == TRUE:
+        crew_unloaded = ship.crew
+    else:
+        crew_unloaded = budget
+    end
+
+    let (local ctx: PayoutCtx) = sv_payout_ctx.read(idx)
+
+    let (__fp__, _) = get_fp_and_pc()
+    let (was_finalised) = FleetManager_finalizeBatch(idx, crew_unloaded, cb, &ctx)
+    assert progress[count] = UnloadProgress(idx, crew_unloaded, ship.crew - crew_unloaded)
+
+    if was_finalised == 1:
+        ev_finalised.emit(idx)
+        sv_payout_ctx.write(idx, PayoutCtx(Uint256(0,0), Uint256(0,0), Uint256(0,0), 0))
+        return (budget - crew_unloaded, count + 1)
+    end
+
+    ev_unloaded.emit(idx, ship.crew - crew_unloaded)
+    return (budget - crew_unloaded, count + 1)
+end
+
+func _unload_listed_ships{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_indexes_len: felt, ship_indexes: felt*, budget: felt, cb: felt*, progress: UnloadProgress*, count: felt) -> (count: felt):
+    if ship_indexes_len == 0:
+        return (count)
+    end
+    if budget == 0:
+        return (count)
+    end
+
+    let (budget_left, new_count) = _unload_with_budget([ship_indexes], budget, cb, progress, count)
+    return _unload_listed_ships(ship_indexes_len - 1, ship_indexes + 1, budget_left, cb, progress, new_count)
+end
+
+func _unload_returned_ships{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(idx: felt, open_ship_idx: felt, budget: felt, cb: felt*, progress: UnloadProgress*, count: felt) -> (count: felt):
+    if idx == open_ship_idx:
+        return (count)
+    end
+    if budget == 0:
+        return (count)
+    end
+
+    let (budget_left, new_count) = _unload_with_budget(idx, budget, cb, progress, count)
+    return _unload_returned_ships(idx + 1, open_ship_idx, budget_left, cb, progress, new_count)
+end
+
+func _unload_ships{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_indexes_len: felt, ship_indexes: felt*, crew_budget: felt, cb: felt*) -> (progress_len: felt, progress: UnloadProgress*):
+    alloc_locals
+    let (local progress: UnloadProgress*) = alloc()
+
+    with_attr error_message("Crew budget must be > 0"):
+        assert_lt(0, crew_budget)
+    end
+
+    if ship_indexes_len == 0:
+        let (oldest_ship_idx) = FleetManager_oldestActiveShipIdx()
+        let (open_ship_idx) = FleetManager_openShipIndex()
+        let (count) = _unload_returned_ships(oldest_ship_idx, open_ship_idx, crew_budget, cb, progress, 0)
+        FleetManager_updateOldestIndex()
+        return (count, progress)
+    end
+
+    let (count) = _unload_listed_ships(ship_indexes_len, ship_indexes, crew_budget, cb, progress, 0)
+    FleetManager_updateOldestIndex()
+    return (count, progress)
+end
+
+# Unload several returned ships in one transaction, paying out at most `crew_budget` crew in total.
+# Ships are unloaded in the order of `ship_indexes`, or oldest first through every returned
+# ship when the list is empty. Ships that are not returned are skipped.
+# @returns progress: crew unloaded and left on every ship that was worked on
+@external
+func unload_ships{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_indexes_len: felt, ship_indexes: felt*, crew_budget: felt) -> (progress_len: felt, progress: UnloadProgress*):
+    let (cb: felt*) = get_label_location(_transfer_loot_to_crew)
+    return _unload_ships(ship_indexes_len, ship_indexes, crew_budget, cb)
+end
+
+# unload_ships that credits the loot to the crew's loot ledger instead of transferring it to
+# every crew member. Without a call into the loot token per crew member a transaction unloads
+# many more crew. The crew take their loot with withdraw_loot, in one transfer for all the
+# ships they were unloaded from.
+@external
+func unload_ships_to_ledger{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_indexes_len: felt, ship_indexes: felt*, crew_budget: felt) -> (progress_len: felt, progress: UnloadProgress*):
+    let (cb: felt*) = get_label_location(_credit_loot_to_crew)
+    return _unload_ships(ship_indexes_len, ship_indexes, crew_budget, cb)
+end
+
+func _withdraw_loot{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(loot_token_address: felt, account: felt) -> (withdrawn: felt):
+    alloc_locals
+    let (local owed: Uint256) = sv_loot_owed.read(account)
+    let (has_loot) = uint256_lt(Uint256(0,0), owed)
+    if has_loot == FALSE:
+        return (FALSE)
+    end
+
+    sv_loot_owed.write(account, Uint256(0,0))
+    let (success) = IERC20.transfer(contract_address=loot_token_address, recipient=account, amount=owed)
+    assert success = TRUE
+
+    return (TRUE)
+end
+
+func _withdraw_loot_for{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(loot_token_address: felt, accounts_len: felt, accounts: felt*, withdrawn: felt) -> (withdrawn: felt):
+    if accounts_len == 0:
+        return (withdrawn)
+    end
+
+    let (is_withdrawn) = _withdraw_loot(loot_token_address, [accounts])
+    return _withdraw_loot_for(loot_token_address, accounts_len - 1, accounts + 1, withdrawn + is_withdrawn)
+end
+
+# Transfer the caller's loot ledger balance to them
+@external
+func withdraw_loot{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}():
+    let (account) = get_caller_address()
+    let (loot_token_address) = sv_payout_token_address.read()
+
+    with_attr error_message("No loot to withdraw"):
+        let (withdrawn) = _withdraw_loot(loot_token_address, account)
+        assert withdrawn = TRUE
+    end
+
+    return ()
+end
+
+# Settle the loot ledger of several accounts, e.g. from a relayer. The loot always goes to the
+# account it is owed to. Accounts owed nothing are skipped.
+# @returns withdrawn: number of accounts paid out
+@external
+func withdraw_loot_for{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(accounts_len: felt, accounts: felt*) -> (withdrawn: felt):
+    let (loot_token_address) = sv_payout_token_address.read()
+    return _withdraw_loot_for(loot_token_address, accounts_len, accounts, 0)
+end
+
 #####################################################################
 # Governance
 #####################################################################
@@ -399,6 +749,26 @@ func set_max_fleet_size{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_c
     return ()
 end
 
+# Ships are sealed for departure once they have max_size crew, new crew join the next ship.
+# 0 removes the limit.
+@external
+func set_max_crew_size{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(max_size: felt) -> ():
+    Ownable.assert_only_owner()
+
+    sv_max_crew_size.write(max_size)
+    return ()
+end
+
+# Depart the open ship as soon as a deposit brings its cargo (fee included) to `cargo`, in the
+# same transaction. 0 turns auto departure off.
+@external
+func set_auto_depart_cargo{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(cargo: Uint256) -> ():
+    Ownable.assert_only_owner()
+
+    sv_auto_depart_cargo.write(cargo)
+    return ()
+end
+
 @external
 func set_unload_batch_size{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(batch_size: felt) -> ():
     Ownable.assert_only_owner()
@@ -407,6 +777,26 @@ func set_unload_batch_size{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,rang
     return ()
 end
 
+# Size unload_ship batches by steps: every batch pays out as many crew as fit in step_budget,
+# a ship costing ship_steps plus crew_steps per crew member. A step_budget of 0 goes back to
+# the fixed unload batch size.
+@external
+func set_unload_step_budget{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(step_budget: felt, ship_steps: felt, crew_steps: felt) -> ():
+    Ownable.assert_only_owner()
+
+    if step_budget != 0:
+        with_attr error_message("Step budget must fit the ship and at least one crew member"):
+            assert_not_zero(crew_steps)
+            assert_le(ship_steps + crew_steps, step_budget)
+        end
+        sv_unload_cost.write(UnloadCost(step_budget, ship_steps, crew_steps))
+        return ()
+    end
+
+    sv_unload_cost.write(UnloadCost(0, 0, 0))
+    return ()
+end
+
 @external
 func set_price_per_ship{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(price_per_ship: Uint256) -> ():
     Ownable.assert_only_owner()
@@ -470,11 +860,30 @@ func get_metadata{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_p
     return (pooling_token, payout_token, min_deposit, max_fleet_size, price_per_ship)
 end
 
+@view
+func get_max_crew_size{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}() -> (max_size: felt):
+    return sv_max_crew_size.read()
+end
+
+@view
+func get_auto_depart_cargo{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}() -> (cargo: Uint256):
+    return sv_auto_depart_cargo.read()
+end
+
 @view
 func get_unload_batch_size{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}() -> (batch_size: felt):
     return sv_unload_batch_size.read()
 end
 
+# @returns batch_size: crew paid out by the next unload_ship
+@view
+func get_unload_step_budget{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}() -> (cost: UnloadCost, batch_size: felt):
+    alloc_locals
+    let (local cost: UnloadCost) = sv_unload_cost.read()
+    let (batch_size) = _unload_batch_size()
+    return (cost, batch_size)
+end
+
 @view
 func get_price_per_ship{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}() -> (price_per_ship: Uint256):
     return sv_price_per_ship.read()
@@ -494,6 +903,47 @@ func get_balances{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_p
     return (pooling_token_balance, payout_token_balance, balances_len, balances)
 end
 
+struct AccountBalances:
+    member account: felt
+    member cargo_token_balance: Uint256
+    member loot_token_balance: Uint256
+    member cargo_len: felt
+end
+
+func _token_balances{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(pooling_token_address: felt, payout_token_address: felt, accounts_len: felt, accounts: felt*, cargo_counts: felt*, balances: AccountBalances*):
+    if accounts_len == 0:
+        return ()
+    end
+
+    let (pooling_token_balance) = IERC20.balanceOf(contract_address=pooling_token_address, account=[accounts])
+    let (payout_token_balance) = IERC20.balanceOf(contract_address=payout_token_address, account=[accounts])
+    assert [balances] = AccountBalances([accounts], pooling_token_balance, payout_token_balance, [cargo_counts])
+
+    return _token_balances(pooling_token_address, payout_token_address, accounts_len - 1, accounts + 1, cargo_counts + 1, balances + AccountBalances.SIZE)
+end
+
+# get_balances for several accounts at once. The cargo of all accounts is returned in a single
+# list, in the order of the accounts, balances[i].cargo_len entries for accounts[i].
+@view
+func get_balances_of{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(accounts_len: felt, accounts: felt*) -> (balances_len: felt, balances: AccountBalances*, cargo_len: felt, cargo: Cargo*):
+    alloc_locals
+    let (pooling_token_address) = sv_pooling_token_address.read()
+    let (payout_token_address) = sv_payout_token_address.read()
+    let (local cargo_counts: felt*) = alloc()
+    let (local cargo: Cargo*) = alloc()
+    let (local balances: AccountBalances*) = alloc()
+
+    let (cargo_len) = FleetManager_rideContributionsOf(accounts_len, accounts, cargo_counts, cargo, 0)
+    _token_balances(pooling_token_address, payout_token_address, accounts_len, accounts, cargo_counts, balances)
+
+    return (accounts_len, balances, cargo_len, cargo)
+end
+
+@view
+func get_loot_owed{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(account: felt) -> (loot: Uint256):
+    return sv_loot_owed.read(account)
+end
+
 @view
 func get_ship{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}() -> (ship: Ship, contribution: CrewMember):
     let (account: felt) = get_caller_address()
@@ -510,6 +960,13 @@ func get_ship_status{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_chec
     return (details.idx, details.cargo, details.fee_taken, details.status, details.crew_len, details.crew)
 end
 
+# Crew of a ship by pages of `limit` members, start with cursor 0 and pass next_cursor back
+# until it is 0
+@view
+func get_ship_crew{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt, cursor: felt, limit: felt) -> (crew_len: felt, crew: CrewMember*, next_cursor: felt):
+    return FleetManager_crewPage(ship_idx, cursor, limit)
+end
+
 @view
 
 func get_open_ship_status{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}() -> (ship_idx: felt, ship_cargo: Uint256, fee_taken: Uint256, status: felt, crew_len: felt, crew: CrewMember*):
@@ -531,3 +988,10 @@ end
 func get_fleet{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}() -> (start_idx: felt, ships_len: felt, ships: Ship*):
     return FleetManager_fleet()
 end
+
+# Fleet by pages of `limit` ships, optionally only the ones in `status` (OPEN, AT_SEA,
+# RETURNED or SEALED, 0 for all). Start with cursor 0 and pass next_cursor back until it is 0.
+@view
+func get_fleet_page{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(cursor: felt, limit: felt, status: felt) -> (ships_len: felt, ships: IndexedShip*, next_cursor: felt):
+    return FleetManager_fleetPage(cursor, limit, status)
+end
@@ -5,9 +5,9 @@ from starkware.cairo.common.alloc import alloc
 from starkware.cairo.common.invoke import invoke
 
 from starkware.starknet.common.syscalls import (get_caller_address, get_contract_address)
-from starkware.cairo.common.math import (assert_le, assert_lt, assert_nn, assert_not_equal)
+from starkware.cairo.common.math import (assert_le, assert_lt, assert_nn, assert_not_equal, split_felt, unsigned_div_rem)
 from starkware.cairo.common.math_cmp import is_le
-from starkware.cairo.common.uint256 import (Uint256, uint256_lt, uint256_eq)
+from starkware.cairo.common.uint256 import (Uint256, uint256_le, uint256_lt, uint256_eq, uint256_sub)
 from openzeppelin.security.safemath.library import SafeUint256
 from starkware.cairo.common.bool import (TRUE, FALSE)
 
@@ -16,6 +16,8 @@ const FINALISED        = 0
 const OPEN             = 1
 const AT_SEA           = 2
 const RETURNED         = 3
+# Full ship waiting for departure, deposits go to the open ship after it
+const SEALED           = 4
 
 struct Ship:
     member cargo: Uint256
@@ -38,6 +40,41 @@ end
 func sv_oldest_active_ship_idx() -> (ship_idx: felt):
 end
 
+# Number of ships in AT_SEA status, kept up to date on depart and return. It starts at 0 with the
+# fleet and is not seeded from the ships, storage with ships at sea from before it existed needs a
+# fresh deployment (see README, Deployment), a return would take it below 0 otherwise.
+@storage_var
+func sv_ships_at_sea() -> (count: felt):
+end
+
+# Ship and Crew records are stored packed when their amounts fit in 128 bits:
+#   Ship: cargo | crew << 128 | status << 192 | flags << 200, and fee_taken in a second felt
+#   Crew: cargo | idx << 128 | flags << 200
+# Records with larger amounts are flagged PACKED_WIDE and kept in the wide sv_fleet and
+# sv_crew_cargo layout. A record that was never written packed is read from the wide layout
+# too, which is where storage written before packing lives. It moves to the packed layout on
+# its next write.
+const PACKED_PRESENT = 1
+const PACKED_WIDE = 2
+const SHIFT_HIGH = 2 ** 128
+# Offsets within the high 128 bits of a packed record
+const SHIFT_STATUS = 2 ** 64
+const SHIFT_FLAGS = 2 ** 72
+const MAX_PACKED_COUNT = 2 ** 64 - 1
+
+struct PackedShip:
+    member word: felt
+    member fee_taken: felt
+end
+
+@storage_var
+func sv_fleet_packed(idx: felt) -> (ship: PackedShip):
+end
+
+@storage_var
+func sv_crew_packed(ship_idx: felt, account: felt) -> (word: felt):
+end
+
 @storage_var
 func sv_fleet(idx: felt) -> (ship: Ship):
 end
@@ -50,63 +87,186 @@ end
 func sv_crew_list(ship_idx: felt, crew_idx: felt) -> (account: felt):
 end
 
+# Ships an account has cargo on, as a list linked from the newest ship to the oldest one.
+# Accounts only join the open ship, which is always newer than the ones they already joined,
+# so adding to the head keeps the list sorted. Cargo deposited before the list existed is not on
+# it, such storage needs a fresh deployment (see README, Deployment).
+struct ShipLinks:
+    member newer: felt
+    member older: felt
+end
+
+@storage_var
+func sv_crew_newest_ship_idx(account: felt) -> (ship_idx: felt):
+end
+
+@storage_var
+func sv_crew_ship_links(account: felt, ship_idx: felt) -> (links: ShipLinks):
+end
+
+func _read_ship{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(idx: felt) -> (ship: Ship):
+    alloc_locals
+    let (local packed: PackedShip) = sv_fleet_packed.read(idx)
+    let (high, local low) = split_felt(packed.word)
+    let (flags, crew_status) = unsigned_div_rem(high, SHIFT_FLAGS)
+
+    if flags != PACKED_PRESENT:
+        return sv_fleet.read(idx)
+    end
+
+    let (status, crew) = unsigned_div_rem(crew_status, SHIFT_STATUS)
+    return (Ship(Uint256(low, 0), Uint256(packed.fee_taken, 0), crew, status))
+end
+
+func _write_ship{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(idx: felt, ship: Ship):
+    # Both high parts are < 2**128, their sum is only 0 if they both are
+    if ship.cargo.high + ship.fee_taken.high == 0:
+        assert_le(ship.crew, MAX_PACKED_COUNT)
+        let high = ship.crew + ship.status * SHIFT_STATUS + PACKED_PRESENT * SHIFT_FLAGS
+        sv_fleet_packed.write(idx, PackedShip(ship.cargo.low + high * SHIFT_HIGH, ship.fee_taken.low))
+        return ()
+    end
+
+    sv_fleet_packed.write(idx, PackedShip((PACKED_PRESENT + PACKED_WIDE) * SHIFT_FLAGS * SHIFT_HIGH, 0))
+    sv_fleet.write(idx, ship)
+    return ()
+end
+
+func _read_crew{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(ship_idx: felt, account: felt) -> (crew: Crew):
+    alloc_locals
+    let (word) = sv_crew_packed.read(ship_idx, account)
+    let (high, local low) = split_felt(word)
+    let (flags, idx) = unsigned_div_rem(high, SHIFT_FLAGS)
+
+    if flags != PACKED_PRESENT:
+        return sv_crew_cargo.read(ship_idx, account)
+    end
+
+    return (Crew(idx, Uint256(low, 0)))
+end
+
+func _write_crew{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(ship_idx: felt, account: felt, crew: Crew):
+    if crew.cargo.high == 0:
+        assert_le(crew.idx, MAX_PACKED_COUNT)
+        let high = crew.idx + PACKED_PRESENT * SHIFT_FLAGS
+        sv_crew_packed.write(ship_idx, account, crew.cargo.low + high * SHIFT_HIGH)
+        return ()
+    end
+
+    sv_crew_packed.write(ship_idx, account, (PACKED_PRESENT + PACKED_WIDE) * SHIFT_FLAGS * SHIFT_HIGH)
+    sv_crew_cargo.write(ship_idx, account, crew)
+    return ()
+end
+
 func FleetManager_initialise{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}():
     sv_open_ship_idx.write(1)
     sv_oldest_active_ship_idx.write(1)
-    sv_fleet.write(1, Ship(Uint256(0, 0), Uint256(0, 0), 0, OPEN))
+    _write_ship(1, Ship(Uint256(0, 0), Uint256(0, 0), 0, OPEN))
 
     return ()
 end
 
-func FleetManager_depart{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(fee: Uint256) -> (idx: felt, res: Ship):
+# Opens the ship after the open ship, which is left as it is
+func _open_next_ship{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}() -> (next_idx: felt):
     alloc_locals
     let (ship_idx: felt) = sv_open_ship_idx.read()
-    let (ship: Ship) = sv_fleet.read(ship_idx)
+    local next_idx = ship_idx + 1
 
-    let next_idx = ship_idx + 1
-    sv_open_ship_idx.write( next_idx  )
+    sv_open_ship_idx.write(next_idx)
+    _write_ship(next_idx, Ship(Uint256(0, 0), Uint256(0, 0), 0, OPEN))
+    return (next_idx)
+end
+
+# Departs the open ship, opening the next one, or a sealed ship
+func FleetManager_depart{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*, range_check_ptr}(ship_idx: felt, fee: Uint256) -> (idx: felt, res: Ship):
+    alloc_locals
+    let (local ship: Ship) = _read_ship(ship_idx)
+
+    if ship.status == OPEN:
+        _open_next_ship()
+        tempvar syscall_ptr = syscall_ptr
+        tempvar pedersen_ptr = pedersen_ptr
+        tempvar range_check_ptr = range_check_ptr
+    else:
+        with_attr error_message("Only the open ship or a sealed ship can be departed"):
+            assert ship.status = SEALED
+        end
+        tempvar syscall_ptr = syscall_ptr
+        tempvar pedersen_ptr = pedersen_ptr
+        tempvar range_check_ptr = range_check_ptr
+    end
 
     let (cargo_minus_fee) = SafeUint256.sub_le(ship.cargo, fee)
-    sv_fleet.write( ship_idx, Ship(cargo_minus_fee, fee, ship.crew, AT_SEA))
-    sv_fleet.write( next_idx, Ship(Uint256(0, 0), Uint256(0, 0), 0, OPEN) )
+    _write_ship( ship_idx, Ship(cargo_minus_fee, fee, ship.crew, AT_SEA))
+
+    let (ships_at_sea) = sv_ships_at_sea.read()
+    sv_ships_at_sea.write(ships_at_sea + 1)
 
     return (ship_idx, ship)
 end
 
-func FleetManager_deposit{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(account: felt, amount: Uint256):
+# Adds the deposit to the account's cargo on the open ship. An account joining a ship that has
+# max_crew crew already seals it and joins the next ship instead, max_crew 0 is no limit.
+# @returns ship_idx: ship the deposit went to
+func FleetManager_deposit{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(account: felt, amount: Uint256, max_crew: felt) -> (ship_idx: felt):
     alloc_locals
 
     let (local ship_idx: felt) = sv_open_ship_idx.read()
-    let (ship: Ship) = sv_fleet.read(ship_idx)
-    let (crew: Crew) = sv_crew_cargo.read(ship_idx, account) #defaults to Crew(0, 0)
+    let (local ship: Ship) = _read_ship(ship_idx)
+    let (local crew: Crew) = _read_crew(ship_idx, account) #defaults to Crew(0, 0)
 
     with_attr error_message("Deposit must be > 0"):
         let (is_deposit_greater_zero) = uint256_lt(Uint256(0, 0), amount)
         assert is_deposit_greater_zero = 1
     end
 
+    let (local is_first_contribution) = uint256_eq(Uint256(0,0), crew.cargo)
+    if is_first_contribution * max_crew != 0:
+        let (is_full) = is_le(max_crew, ship.crew)
+        if is_full == TRUE:
+            _write_ship(ship_idx, Ship(ship.cargo, ship.fee_taken, ship.crew, SEALED))
+            _open_next_ship()
+            return FleetManager_deposit(account, amount, max_crew)
+        end
+    end
+
     #Update contribution for this account to active ship
     let (new_contribution: Uint256) = SafeUint256.add(crew.cargo, amount)
     let (cargo: Uint256) = SafeUint256.add(ship.cargo, amount)
 
-    let (is_first_contribution) = uint256_eq(Uint256(0,0), crew.cargo)
     if is_first_contribution == 1:
         # account has not yet contributed to this ship. Add them to bookkeeping
         sv_crew_list.write(ship_idx=ship_idx, crew_idx=ship.crew, value=account)
-        sv_crew_cargo.write(ship_idx, account, Crew(ship.crew, new_contribution))
-        sv_fleet.write(ship_idx, Ship(cargo, ship.fee_taken, ship.crew+1, ship.status))
-        return ()
+        _write_crew(ship_idx, account, Crew(ship.crew, new_contribution))
+        _write_ship(ship_idx, Ship(cargo, ship.fee_taken, ship.crew+1, ship.status))
+        _link_crew_ship(account, ship_idx)
+        return (ship_idx)
     end
 
-    sv_crew_cargo.write(ship_idx, account, Crew(crew.idx, new_contribution))
-    sv_fleet.write(ship_idx, Ship(cargo, ship.fee_taken, ship.crew, ship.status))
-    return ()
+    _write_crew(ship_idx, account, Crew(crew.idx, new_contribution))
+    _write_ship(ship_idx, Ship(cargo, ship.fee_taken, ship.crew, ship.status))
+    return (ship_idx)
 end
 
+# Cargo left on a ship once crew with `crew_cargo` between them leave it. The departure fee came
+# off the ship's cargo but not off the crew's, so the crew leaving last can have more cargo than
+# the ship has left, which leaves the ship empty.
+func _cargo_left{range_check_ptr}(ship_cargo: Uint256, crew_cargo: Uint256) -> (cargo: Uint256):
+    let (is_covered) = uint256_le(crew_cargo, ship_cargo)
+    if is_covered == FALSE:
+        return (Uint256(0, 0))
+    end
+    let (cargo) = uint256_sub(ship_cargo, crew_cargo)
+    return (cargo)
+end
+
+# Remove the account from the crew of a ship that is not at sea. The ship is finalised when
+# it returned and the account was its last crew member.
+# @returns crew_cargo: cargo the account had on the ship, 0 if it was not part of the crew
 func FleetManager_disembark{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt, account: felt) -> (crew_cargo: Uint256, was_finalised: felt):
     alloc_locals
 
-    let (ship: Ship) = sv_fleet.read(ship_idx)
+    let (ship: Ship) = _read_ship(ship_idx)
 
     with_attr error_message("Can't disembark ships at sea"):
         if ship.status == AT_SEA:
@@ -114,39 +274,43 @@ func FleetManager_disembark{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,ran
         end
     end
 
-    let (crew: Crew) = sv_crew_cargo.read(ship_idx, account) #defaults to Crew(0, 0)
-
-    let (has_contributed) = uint256_eq(Uint256(0,0), crew.cargo)
-    if has_contributed == 1:
-
-        if ship.crew - 1 == 0:
-            #Ship is now empty, finalise it
-            sv_crew_list.write(ship_idx, ship.crew - 1, 0)
-            sv_crew_cargo.write(ship_idx, account, Crew(0, Uint256(0, 0)))
+    let (local crew: Crew) = _read_crew(ship_idx, account) #defaults to Crew(0, 0)
 
-            if ship.status == OPEN:
-                #Don't finalise open ship
-                return (crew.cargo, 0)
-            else:
-                sv_fleet.write(ship_idx, Ship(Uint256(0,0), Uint256(0, 0), 0, FINALISED))
-                return (crew.cargo, 1)
-            end
-
-        else:
-            #Ship is not yet empty, replace crew slot with last crew
-            let (last_crew_account) = sv_crew_list.read(ship_idx, ship.crew - 1)
+    let (is_not_crew) = uint256_eq(Uint256(0,0), crew.cargo)
+    if is_not_crew == 1:
+        return (Uint256(0, 0), 0)
+    end
 
-            sv_crew_list.write(ship_idx, crew.idx, last_crew_account)
-            sv_fleet.write(ship_idx, Ship(ship.cargo, ship.fee_taken, ship.crew - 1, ship.status))
+    _unlink_crew_ship(account, ship_idx)
 
-            sv_crew_list.write(ship_idx, ship.crew - 1, 0)
+    if ship.crew - 1 == 0:
+        #Ship is now empty, finalise it
+        sv_crew_list.write(ship_idx, ship.crew - 1, 0)
+        _write_crew(ship_idx, account, Crew(0, Uint256(0, 0)))
 
-            sv_crew_cargo.write(ship_idx, account, Crew(0, Uint256(0, 0)))
+        if ship.status == OPEN:
+            #Don't finalise open ship
+            _write_ship(ship_idx, Ship(Uint256(0, 0), ship.fee_taken, 0, ship.status))
             return (crew.cargo, 0)
         end
+
+        _write_ship(ship_idx, Ship(Uint256(0,0), Uint256(0, 0), 0, FINALISED))
+        _advance_oldest_index(ship_idx)
+        return (crew.cargo, 1)
     end
 
-    return (Uint256(0, 0), 0)
+    #Ship is not yet empty, replace crew slot with last crew
+    let (cargo_remaining) = _cargo_left(ship.cargo, crew.cargo)
+    let (last_crew_account) = sv_crew_list.read(ship_idx, ship.crew - 1)
+    let (last_crew: Crew) = _read_crew(ship_idx, last_crew_account)
+
+    sv_crew_list.write(ship_idx, crew.idx, last_crew_account)
+    _write_crew(ship_idx, last_crew_account, Crew(crew.idx, last_crew.cargo))
+    sv_crew_list.write(ship_idx, ship.crew - 1, 0)
+    _write_crew(ship_idx, account, Crew(0, Uint256(0, 0)))
+    _write_ship(ship_idx, Ship(cargo_remaining, ship.fee_taken, ship.crew - 1, ship.status))
+
+    return (crew.cargo, 0)
 end
 
 struct CrewMember:
@@ -165,21 +329,22 @@ end
 
 
 func _collect_contributions{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt, next_crew: felt, remaining_crew: felt, contributions: CrewMember*):
+    alloc_locals
     if remaining_crew == 0:
         return()
     end
 
-    let (crew_account) = sv_crew_list.read(ship_idx, next_crew)
-    let (crew: Crew) = sv_crew_cargo.read(ship_idx, crew_account)
+    let (local crew_account) = sv_crew_list.read(ship_idx, next_crew)
+    let (crew: Crew) = _read_crew(ship_idx, crew_account)
 
-    assert contributions[next_crew] = CrewMember(crew_account, crew.cargo)
+    assert [contributions] = CrewMember(crew_account, crew.cargo)
 
-    return _collect_contributions(ship_idx, next_crew+1, remaining_crew-1, contributions)
+    return _collect_contributions(ship_idx, next_crew+1, remaining_crew-1, contributions + CrewMember.SIZE)
 end
 
 func FleetManager_shipDetails{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(idx: felt) -> (res: ShipDetails):
     alloc_locals
-    let (local ship: Ship) = sv_fleet.read(idx)
+    let (local ship: Ship) = _read_ship(idx)
     let (local contributions: CrewMember*) = alloc()
 
     _collect_contributions(idx, 0, ship.crew, contributions)
@@ -188,9 +353,36 @@ func FleetManager_shipDetails{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,r
     return  (details)
 end
 
+# Page of at most `limit` crew members of a ship, starting at crew index `cursor`
+# @returns next_cursor: crew index to start the next page at, 0 once the whole crew was listed
+func FleetManager_crewPage{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt, cursor: felt, limit: felt) -> (crew_len: felt, crew: CrewMember*, next_cursor: felt):
+    alloc_locals
+    let (local crew: CrewMember*) = alloc()
+    let (ship: Ship) = _read_ship(ship_idx)
+
+    with_attr error_message("Page limit must be > 0"):
+        assert_lt(0, limit)
+    end
+
+    let (is_past_end) = is_le(ship.crew, cursor)
+    if is_past_end == TRUE:
+        return (0, crew, 0)
+    end
+
+    let (is_last_page) = is_le(ship.crew, cursor + limit)
+    if is_last_page == TRUE:
+        _collect_contributions(ship_idx, cursor, ship.crew - cursor, crew)
+        return (ship.crew - cursor, crew, 0)
+    end
+
+    _collect_contributions(ship_idx, cursor, limit, crew)
+    return (limit, crew, cursor + limit)
+end
+
 func FleetManager_rideContribution{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt, account: felt) -> (ship: Ship, contribution: CrewMember):
-    let (ship: Ship) = sv_fleet.read(ship_idx)
-    let (crew: Crew) = sv_crew_cargo.read(ship_idx, account)
+    alloc_locals
+    let (local ship: Ship) = _read_ship(ship_idx)
+    let (crew: Crew) = _read_crew(ship_idx, account)
 
     return (ship, CrewMember(account, crew.cargo))
 end
@@ -200,37 +392,91 @@ struct Cargo:
     member amount: Uint256
 end
 
-func _account_balances{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(account: felt, balances: Cargo*, ship_idx: felt, last_idx: felt) -> (count: felt):
-    alloc_locals
-    if ship_idx == last_idx + 1:
-        return (0)
+# Add the account's cargo on every ship from ship_idx to its oldest one
+func _account_balances{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(account: felt, balances: Cargo*, ship_idx: felt, count: felt) -> (count: felt):
+    if ship_idx == 0:
+        return (count)
     end
 
-    let (contributions_count: felt) = _account_balances(account, balances, ship_idx + 1, last_idx)
-
-    let (crew: Crew) = sv_crew_cargo.read(ship_idx, account)
-    let (has_contributed: felt) = uint256_lt(Uint256(0, 0), crew.cargo)
+    let (crew: Crew) = _read_crew(ship_idx, account)
+    assert balances[count] = Cargo(ship_idx, crew.cargo)
 
-    if has_contributed == 1:
-        assert balances[contributions_count] = Cargo(ship_idx, crew.cargo)
-        return (contributions_count + 1)
-    else:
-        return (contributions_count)
-    end
+    let (links: ShipLinks) = sv_crew_ship_links.read(account, ship_idx)
+    return _account_balances(account, balances, links.older, count + 1)
 end
 
 
+# Cargo of the account on every ship it has not been paid out for yet, newest ship first
 func FleetManager_rideContributions{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(account: felt) -> (balances_len: felt, balances: Cargo*):
     alloc_locals
-    let (start: felt) = sv_oldest_active_ship_idx.read()
-    let (ship_idx: felt) = sv_open_ship_idx.read()
+    let (newest_ship_idx: felt) = sv_crew_newest_ship_idx.read(account)
     let (local balances: Cargo*) = alloc()
 
-    let (count: felt) = _account_balances(account, balances, start, ship_idx)
+    let (count: felt) = _account_balances(account, balances, newest_ship_idx, 0)
 
     return (count, balances)
 end
 
+# Same as FleetManager_rideContributions for a list of accounts. The cargo of every account is
+# appended to balances, counts[i] holds the number of entries added for accounts[i].
+func FleetManager_rideContributionsOf{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(accounts_len: felt, accounts: felt*, counts: felt*, balances: Cargo*, total: felt) -> (balances_len: felt):
+    if accounts_len == 0:
+        return (total)
+    end
+
+    let (newest_ship_idx: felt) = sv_crew_newest_ship_idx.read([accounts])
+    let (new_total: felt) = _account_balances([accounts], balances, newest_ship_idx, total)
+    assert [counts] = new_total - total
+
+    return FleetManager_rideContributionsOf(accounts_len - 1, accounts + 1, counts + 1, balances, new_total)
+end
+
+func _link_crew_ship{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(account: felt, ship_idx: felt):
+    let (newest_ship_idx) = sv_crew_newest_ship_idx.read(account)
+    sv_crew_ship_links.write(account, ship_idx, ShipLinks(0, newest_ship_idx))
+    sv_crew_newest_ship_idx.write(account, ship_idx)
+
+    if newest_ship_idx == 0:
+        return ()
+    end
+
+    let (links: ShipLinks) = sv_crew_ship_links.read(account, newest_ship_idx)
+    sv_crew_ship_links.write(account, newest_ship_idx, ShipLinks(ship_idx, links.older))
+    return ()
+end
+
+func _unlink_crew_ship{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(account: felt, ship_idx: felt):
+    alloc_locals
+    let (local links: ShipLinks) = sv_crew_ship_links.read(account, ship_idx)
+    sv_crew_ship_links.write(account, ship_idx, ShipLinks(0, 0))
+
+    if links.older != 0:
+        let (older_links: ShipLinks) = sv_crew_ship_links.read(account, links.older)
+        sv_crew_ship_links.write(account, links.older, ShipLinks(links.newer, older_links.older))
+        tempvar syscall_ptr = syscall_ptr
+        tempvar pedersen_ptr = pedersen_ptr
+        tempvar range_check_ptr = range_check_ptr
+    else:
+        tempvar syscall_ptr = syscall_ptr
+        tempvar pedersen_ptr = pedersen_ptr
+        tempvar range_check_ptr = range_check_ptr
+    end
+
+    if links.newer == 0:
+        # Either the newest ship of the account or a ship it is not on
+        let (newest_ship_idx) = sv_crew_newest_ship_idx.read(account)
+        if newest_ship_idx == ship_idx:
+            sv_crew_newest_ship_idx.write(account, links.older)
+            return ()
+        end
+        return ()
+    end
+
+    let (newer_links: ShipLinks) = sv_crew_ship_links.read(account, links.newer)
+    sv_crew_ship_links.write(account, links.newer, ShipLinks(newer_links.newer, links.older))
+    return ()
+end
+
 
 # This function finds the oldest active ship that matches the specified amount
 func _find_ship_by_amount{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(current_index: felt, num_to_check: felt, amount: Uint256) -> (res: felt):
@@ -239,7 +485,7 @@ func _find_ship_by_amount{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range
         return (-1)
     end
 
-    let (ship: Ship) = sv_fleet.read(current_index)
+    let (ship: Ship) = _read_ship(current_index)
     let (is_eq) = uint256_eq(ship.cargo, amount)
 
     if ship.status == AT_SEA:
@@ -272,7 +518,7 @@ func _finalize_crew{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check
     let contributor_idx = crew_count - 1
 
     let (local crew_account) = sv_crew_list.read(ship_idx, contributor_idx)
-    let (crew: Crew) = sv_crew_cargo.read(ship_idx, crew_account)
+    let (crew: Crew) = _read_crew(ship_idx, crew_account)
 
     [ap] = syscall_ptr; ap++
     [ap] = pedersen_ptr; ap++
@@ -289,7 +535,8 @@ func _finalize_crew{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check
     let range_check_ptr = [ap-1]
 
     sv_crew_list.write(ship_idx, contributor_idx, 0)
-    sv_crew_cargo.write(ship_idx, crew_account, Crew(0, Uint256(0,0)))
+    _write_crew(ship_idx, crew_account, Crew(0, Uint256(0,0)))
+    _unlink_crew_ship(crew_account, ship_idx)
 
     let (accumulator) = _finalize_crew(ship_idx, contributor_idx, stop_crew_count, callback, ctx)
     let (finalised_cargo) = SafeUint256.add(crew.cargo, accumulator)
@@ -297,35 +544,42 @@ func _finalize_crew{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check
 end
 
 func FleetManager_finalize{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt, batch_size: felt, cb: felt*, ctx: felt*) -> (finalised: felt):
+    let (finalised) = FleetManager_finalizeBatch(ship_idx, batch_size, cb, ctx)
+    if finalised == 1:
+        _advance_oldest_index(ship_idx)
+        return (1)
+    end
+    return (0)
+end
+
+# Same as FleetManager_finalize but leaves the oldest active index alone. Callers finalising
+# several ships update it once with FleetManager_updateOldestIndex when done.
+func FleetManager_finalizeBatch{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt, batch_size: felt, cb: felt*, ctx: felt*) -> (finalised: felt):
     alloc_locals
-    let (ship) = sv_fleet.read(ship_idx)
+    let (ship) = _read_ship(ship_idx)
     let (disembark_all_users) = is_le(ship.crew, batch_size)
     # TODO: do we need to assert ship exists?
 
     if disembark_all_users == 1:
         let (finalised_cargo) = _finalize_crew(ship_idx, ship.crew, 0, cb, ctx)
-        sv_fleet.write(ship_idx, Ship(Uint256(0,0), Uint256(0, 0), 0, FINALISED))
-
-        # TODO: this is for sequential finalisation, we also do an update outside
-        # check what we want to do and keep only one?
-        let (oldest_idx) = sv_oldest_active_ship_idx.read()
-        if ship_idx == oldest_idx:
-            sv_oldest_active_ship_idx.write(ship_idx + 1)
-            return (1)
-        else:
-            return (1)
-        end
+        _write_ship(ship_idx, Ship(Uint256(0,0), Uint256(0, 0), 0, FINALISED))
+        return (1)
     else:
         let (finalised_cargo) = _finalize_crew(ship_idx, ship.crew, ship.crew - batch_size, cb, ctx)
-        let (cargo_remaining) = SafeUint256.sub_le(ship.cargo, finalised_cargo)
-        sv_fleet.write(ship_idx, Ship(cargo_remaining, ship.fee_taken, ship.crew - batch_size, ship.status))
+        let (cargo_remaining) = _cargo_left(ship.cargo, finalised_cargo)
+        _write_ship(ship_idx, Ship(cargo_remaining, ship.fee_taken, ship.crew - batch_size, ship.status))
         return (0)
     end
 
 end
 
+# Ship at the given index, whatever its status
+func FleetManager_ship{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(idx: felt) -> (ship: Ship):
+    return _read_ship(idx)
+end
+
 func FleetManager_shipMetadata{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(idx: felt) -> (ship: Ship):
-    let (ship: Ship) = sv_fleet.read(idx)
+    let (ship: Ship) = _read_ship(idx)
 
     # fail if ship was finalized or doesn't yet exist
     assert_lt(0, ship.status)
@@ -334,7 +588,7 @@ func FleetManager_shipMetadata{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,
 end
 
 func _find_new_oldest_active_ship_idx{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(idx: felt) -> (idx: felt):
-    let (ship: Ship) = sv_fleet.read(idx)
+    let (ship: Ship) = _read_ship(idx)
     if ship.status == FINALISED:
         return _find_new_oldest_active_ship_idx(idx+1)
     else:
@@ -342,6 +596,21 @@ func _find_new_oldest_active_ship_idx{syscall_ptr : felt*, pedersen_ptr : HashBu
     end
 end
 
+# Moves the oldest active index past a ship that was just finalised, when it was the oldest one,
+# and past the following ships that were already finalised out of order.
+# Every ship is skipped only once, so this is O(1) amortised per finalisation.
+func _advance_oldest_index{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(finalised_idx: felt):
+    let (oldest_idx) = sv_oldest_active_ship_idx.read()
+    if finalised_idx != oldest_idx:
+        return ()
+    end
+
+    # The open ship is never finalised, the search stops there at the latest
+    let (new_oldest_idx) = _find_new_oldest_active_ship_idx(finalised_idx + 1)
+    sv_oldest_active_ship_idx.write(new_oldest_idx)
+    return ()
+end
+
 func FleetManager_updateOldestIndex{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}():
     let (idx) = sv_oldest_active_ship_idx.read()
 
@@ -359,8 +628,16 @@ end
 #Flat a ship as pending finalisation. This makes the ship eligible for finalisation by users
 #@param ship_idx: Index of the ship to be flagged
 func FleetManager_markReturned{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt):
-    let (ship) = sv_fleet.read(ship_idx)
-    sv_fleet.write(ship_idx, Ship(ship.cargo, ship.fee_taken, ship.crew, RETURNED) )
+    let (ship) = _read_ship(ship_idx)
+
+    with_attr error_message("Only ships at sea can return"):
+        assert ship.status = AT_SEA
+    end
+
+    _write_ship(ship_idx, Ship(ship.cargo, ship.fee_taken, ship.crew, RETURNED) )
+
+    let (ships_at_sea) = sv_ships_at_sea.read()
+    sv_ships_at_sea.write(ships_at_sea - 1)
 
     return ()
 end
@@ -378,38 +655,14 @@ func FleetManager_oldestActiveShipIdx{syscall_ptr : felt*, pedersen_ptr : HashBu
 end
 
 
-# Count all ships in given status in the range [from, to)
-#
-# @param wanted_status: status to count
-# @param start_idx:  index to start from, inclusive
-# @param end_idx:    index to end at, exclusive
-#
-func _count_ships{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(wanted_status: felt, start_idx: felt, end_idx: felt) -> (count: felt):
-    if start_idx == end_idx:
-        return (0)
-    end
-
-    let (ship: Ship) = sv_fleet.read(start_idx)
-    if ship.status == wanted_status:
-        let (r) = _count_ships(wanted_status, start_idx+1, end_idx)
-        return (1 + r)
-    end
-
-    return _count_ships(wanted_status, start_idx+1, end_idx)
-end
-
 # Get the count of active ships
 func FleetManager_fleetSize{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}() -> (count: felt):
-    let (oldest_active_ship_idx) = sv_oldest_active_ship_idx.read()
-    let (next_ship_idx) = sv_open_ship_idx.read()
-
-    assert_le(oldest_active_ship_idx, next_ship_idx)
-    return _count_ships(AT_SEA, oldest_active_ship_idx, next_ship_idx)
+    return sv_ships_at_sea.read()
 end
 
 func _collect_ships{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(start_idx: felt, end_idx: felt, i: felt, ships: Ship*) -> (count: felt):
 
-    let (ship: Ship) = sv_fleet.read(start_idx + i)
+    let (ship: Ship) = _read_ship(start_idx + i)
     assert ships[i] = ship
 
     if (start_idx + i) == end_idx:
@@ -420,6 +673,69 @@ func _collect_ships{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check
     return (r + 1)
 end
 
+struct IndexedShip:
+    member idx: felt
+    member ship: Ship
+end
+
+func _collect_ship_page{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(ship_idx: felt, end_idx: felt, status: felt, ships: IndexedShip*, count: felt) -> (count: felt):
+    alloc_locals
+    if ship_idx == end_idx:
+        return (count)
+    end
+
+    let (local ship: Ship) = _read_ship(ship_idx)
+    if status != 0:
+        if ship.status != status:
+            return _collect_ship_page(ship_idx + 1, end_idx, status, ships, count)
+        end
+    end
+
+    assert ships[count] = IndexedShip(ship_idx, ship)
+    return _collect_ship_page(ship_idx + 1, end_idx, status, ships, count + 1)
+end
+
+# Page of the fleet, from the oldest active ship to the open one. At most `limit` ships are read,
+# starting at index `cursor` (0 or anything older than the oldest active ship starts at the oldest).
+# Only ships in `status` are returned, 0 returns them all, so a filtered page can hold fewer ships.
+# @returns next_cursor: ship index to start the next page at, 0 once the open ship was read
+func FleetManager_fleetPage{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}(cursor: felt, limit: felt, status: felt) -> (ships_len: felt, ships: IndexedShip*, next_cursor: felt):
+    alloc_locals
+    let (local ships: IndexedShip*) = alloc()
+    let (oldest_active_ship_idx) = sv_oldest_active_ship_idx.read()
+    let (local open_ship_idx) = sv_open_ship_idx.read()
+
+    with_attr error_message("Page limit must be > 0"):
+        assert_lt(0, limit)
+    end
+
+    with_attr error_message("Unknown ship status"):
+        assert_le(status, SEALED)
+    end
+
+    local start_idx
+    let (is_before_oldest) = is_le(cursor, oldest_active_ship_idx)
+    if is_before_oldest == TRUE:
+        start_idx = oldest_active_ship_idx
+    else:
+        start_idx = cursor
+    end
+
+    let (is_past_end) = is_le(open_ship_idx + 1, start_idx)
+    if is_past_end == TRUE:
+        return (0, ships, 0)
+    end
+
+    let (is_last_page) = is_le(open_ship_idx + 1, start_idx + limit)
+    if is_last_page == TRUE:
+        let (count) = _collect_ship_page(start_idx, open_ship_idx + 1, status, ships, 0)
+        return (count, ships, 0)
+    end
+
+    let (count) = _collect_ship_page(start_idx, start_idx + limit, status, ships, 0)
+    return (count, ships, start_idx + limit)
+end
+
 # Collect all ships in the fleet metadata into an array of Ship
 func FleetManager_fleet{syscall_ptr : felt*, pedersen_ptr : HashBuiltin*,range_check_ptr}() -> (start_idx: felt, ships_len: felt, ships: Ship*):
     alloc_locals
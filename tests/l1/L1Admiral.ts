@@ -347,6 +347,103 @@ describe("L1Admiral", function () {
         });
     });
 
+    it("should execute ship rides and echo the ship indexes to L2", async function () {
+        const shipIndexes = [7, 3, 9];
+        const amounts = [50, 50, 20];
+
+        await Promise.all(amounts.map(async (amount, i) => {
+            await createStarkateTokenWithdrawalMessage(
+                starknetCore,
+                INPUT_TOKEN_L2_STARKGATE_ADDRESS,
+                inputTokenStarkgate.address,
+                l1Conductor.address,
+                amount
+            );
+
+            // Indexed depart message: [version, ship index, amount low, amount high]
+            await starknetCore.addL2ToL1Message(
+                BigInt(INPUT_TO_OUTPUT_L2_CONDUCTOR_ADDRESS),
+                BigInt(l1Conductor.address),
+                [1n, BigInt(shipIndexes[i]), BigInt(amount) & (UINT256_PART_SIZE - 1n), BigInt(amount) >> UINT256_PART_SIZE_BITS]
+            );
+        }));
+
+        // Amount-only messages are not consumed by indexed rides
+        await expect(l1Conductor.executeShipRides([1], [50])).to.emit(l1Conductor, "UnsuccessfulAmountMessageWithdrawal");
+
+        const tx = await l1Conductor.executeShipRides(shipIndexes, amounts);
+        const receipt = await tx.wait();
+        const messages = receipt.logs
+            .filter((log: any) => log.address === starknetCore.address)
+            .map((log: any) => starknetCore.interface.parseLog(log))
+            .filter((event: any) => event.name === "LogMessageToL2");
+
+        expect(messages.length).to.equal(1);
+        expect(messages[0].args.selector).to.equal(
+            "52357581461860396089620452624985387634989253256907965913609507801198506462"
+        );
+        // [version, ship count, ship indexes..., amount count, amounts (low, high)..., payout (low, high), gas used (low, high)]
+        // The L2 side of this layout is tested in tests/l2/pytest/test_indexed_return.py (test_l1_admiral_return_message_layout)
+        const payload = messages[0].args.payload.map((x: any) => x.toNumber());
+        expect(payload.slice(0, 12)).to.deep.equal([1, 3, 7, 3, 9, 3, 50, 0, 50, 0, 20, 0]);
+        expect(payload.length).to.equal(16);
+    });
+
+    it("should not execute ship rides without an index for every amount", async function () {
+        await expect(l1Conductor.executeShipRides([1, 2], [50])).to.be.revertedWith("Every ride needs a ship index.");
+    });
+
+    it("should withdraw a batch of rides from the gate for less gas than checking the balance per ride", async function () {
+        // Same L1Admiral with the withdrawal loop it had before withdrawFromGate
+        const PerRideL1Admiral = await ethers.getContractFactory("MockPerRideL1Admiral");
+        const perRideConductor = await PerRideL1Admiral.deploy(
+            starknetCore.address,
+            INPUT_TO_OUTPUT_L2_CONDUCTOR_ADDRESS,
+            inputTokenStarkgate.address,
+            outputTokenStarkgate.address,
+            inputToken.address,
+            outputToken.address,
+            deFiContract.address,
+            "0xb6b55f25"
+        );
+        await perRideConductor.deployed();
+
+        const amounts = [10, 20, 30, 40, 50, 60, 70, 80];
+        const executeRides = async (conductor: Contract) => {
+            for (const amount of amounts) {
+                await createStarkateTokenWithdrawalMessage(
+                    starknetCore,
+                    INPUT_TOKEN_L2_STARKGATE_ADDRESS,
+                    inputTokenStarkgate.address,
+                    conductor.address,
+                    amount
+                );
+                await starknetCore.addL2ToL1Message(
+                    BigInt(INPUT_TO_OUTPUT_L2_CONDUCTOR_ADDRESS),
+                    BigInt(conductor.address),
+                    [BigInt(amount) & (UINT256_PART_SIZE - 1n), BigInt(amount) >> UINT256_PART_SIZE_BITS]
+                );
+            }
+            const receipt = await (await conductor.executeRides(amounts)).wait();
+            expect(receipt.events.filter((event: any) => event.event === "SuccessfulAmountMessageWithdrawal").length)
+                .to.equal(amounts.length);
+            return receipt.gasUsed;
+        };
+
+        // Both execute every ride, only the balance checks around the gate withdrawals differ. The batch goes first
+        // and pays for the storage the first ride ever sets (e.g. the output Starkgate's balance), not the baseline.
+        const batchGas = await executeRides(l1Conductor);
+        const perRideGas = await executeRides(perRideConductor);
+        expect(batchGas).to.be.lt(perRideGas);
+    });
+
+    it("should not retry withdrawing an amount the gate already failed to withdraw", async function () {
+        // Rides the gate has no tokens for yet only cost one gate call per distinct amount
+        const repeatedReceipt = await (await l1Conductor.executeRides([5, 5, 5, 5])).wait();
+        const distinctReceipt = await (await l1Conductor.executeRides([5, 6, 7, 8])).wait();
+        expect(repeatedReceipt.gasUsed).to.be.lt(distinctReceipt.gasUsed);
+    });
+
     // it("should fail to execute when depositing to Starkgate fails", async function () {
 
     // });
@@ -1,41 +1,205 @@
+from collections import namedtuple
+
 from open_zeppelin.utils import Signer, uint
 
+SignedTransaction = namedtuple("SignedTransaction", ["nonce", "call_array", "calldata", "signature"])
+
+# Default limit on the __execute__ calldata (in felts) of a single batched transaction
+MAX_BATCH_CALLDATA = 2000
+
+
+def mint_call(erc20_contract, to_contract, amount: int):
+    return erc20_contract.contract_address, 'mint', [to_contract.contract_address, *uint(amount)]
+
+
+def transfer_call(erc20_contract, to_user, amount: int):
+    return erc20_contract.contract_address, 'transfer', [to_user.contract_address, *uint(amount)]
+
+
+def approve_call(erc20_contract, spender_address, amount: int):
+    return erc20_contract.contract_address, 'approve', [spender_address, *uint(amount)]
+
+
+def depart_call(admiral, ship_idx):
+    return admiral.contract_address, 'depart', [ship_idx]
+
+
+def deposit_call(conductor, amount: int):
+    return conductor.contract_address, 'deposit', [*uint(amount)]
+
+
+def unload_ship_call(admiral, ship_idx):
+    return admiral.contract_address, 'unload_ship', [ship_idx]
+
+
+def unload_ships_call(admiral, ship_indexes, crew_budget):
+    """An empty ship_indexes unloads every returned ship, oldest first."""
+    return admiral.contract_address, 'unload_ships', [len(ship_indexes), *ship_indexes, crew_budget]
+
+
+def execute_calldata_size(calls) -> int:
+    # call_array_len, 4 felts per call, calldata_len, the calldata and the nonce
+    return 3 + sum(4 + len(calldata) for _, _, calldata in calls)
+
 
 # This class is a wrapper for user account
 class Account(Signer):
     def __init__(self, private_key):
         super(Account, self).__init__(private_key)
+        # Nonce of the next transaction, None until it is read from the account contract
+        self.nonce = None
 
     def set_contract(self, account_contract):
         self.contract = account_contract
         self.contract_address = account_contract.contract_address
+        self.nonce = None
+
+    async def sync_nonce(self):
+        execution_info = await self.contract.get_nonce().call()
+        self.nonce, = execution_info.result
+        return self.nonce
+
+    async def next_nonce(self):
+        if self.nonce is None:
+            return await self.sync_nonce()
+        return self.nonce
 
     async def mint(self, erc20_contract, to_contract, amount: int):
-        uint_amount = uint(amount)
-        return await self.send_transaction(to=erc20_contract.contract_address, selector_name='mint',
-                                           calldata=[to_contract.contract_address, *uint_amount])
+        return await self.send_transactions([mint_call(erc20_contract, to_contract, amount)])
 
     async def burn(self, erc20_contract, amount: int):
         return await self.transfer(erc20_contract, 0x0, amount)
 
     async def transfer(self, erc20_contract, to_user, amount: int):
-        uint_amount = uint(amount)
-        return await self.send_transaction(to=erc20_contract.contract_address, selector_name='transfer',
-                                           calldata=[to_user.contract_address, *uint_amount])
+        return await self.send_transactions([transfer_call(erc20_contract, to_user, amount)])
 
     async def approve(self, erc20_contract, spender_address, amount: int):
-        uint_amount = uint(amount)
-        return await self.send_transaction(to=erc20_contract.contract_address, selector_name='approve',
-                                           calldata=[spender_address, *uint_amount])
+        return await self.send_transactions([approve_call(erc20_contract, spender_address, amount)])
 
     async def depart(self, admiral, ship_idx):
-        return await self.send_transaction(to=admiral.contract_address, selector_name='depart', calldata=[ship_idx])
+        return await self.send_transactions([depart_call(admiral, ship_idx)])
 
     async def deposit_into_ship(self, conductor, amount: int):
-        uint_amount = uint(amount)
-        return await self.send_transaction(to=conductor.contract_address, selector_name='deposit',
-                                           calldata=[*uint_amount])
+        return await self.send_transactions([deposit_call(conductor, amount)])
+
+    def batch(self, max_calldata=MAX_BATCH_CALLDATA, max_steps=None):
+        return Batch(self, max_calldata, max_steps)
 
     async def send_transaction(self, to, selector_name, calldata, nonce=None, max_fee=0):
-        return await super(Account, self).send_transaction(account=self.contract, to=to, selector_name=selector_name,
-                                                           calldata=calldata, nonce=nonce, max_fee=max_fee)
+        return await self.send_transactions([(to, selector_name, calldata)], nonce=nonce, max_fee=max_fee)
+
+    async def send_transactions(self, calls, nonce=None, max_fee=0):
+        if nonce is None:
+            nonce = await self.next_nonce()
+
+        (call_array, calldata, sig_r, sig_s) = self.sign_transactions(self.contract, calls, nonce, max_fee)
+        return await self._execute(SignedTransaction(nonce, call_array, calldata, [sig_r, sig_s]))
+
+    async def estimate_steps(self, calls, max_fee=0) -> int:
+        """Number of Cairo steps __execute__ takes for the given calls, without changing the state."""
+        nonce = await self.next_nonce()
+        (call_array, calldata, sig_r, sig_s) = self.sign_transactions(self.contract, calls, nonce, max_fee)
+        res = await self.contract.__execute__(call_array, calldata, nonce).call(signature=[sig_r, sig_s])
+        return res.call_info.execution_resources.n_steps
+
+    async def presign_transactions(self, transactions, max_fee=0):
+        """
+        Signs a queue of transactions, each a list of calls, with consecutive nonces.
+        Send them in order with send_presigned().
+        """
+        nonce = await self.next_nonce()
+        queue = []
+        for calls in transactions:
+            (call_array, calldata, sig_r, sig_s) = self.sign_transactions(self.contract, calls, nonce, max_fee)
+            queue.append(SignedTransaction(nonce, call_array, calldata, [sig_r, sig_s]))
+            nonce += 1
+
+        return queue
+
+    async def send_presigned(self, queue):
+        return [await self._execute(tx) for tx in queue]
+
+    async def _execute(self, tx: SignedTransaction):
+        try:
+            res = await self.contract.__execute__(tx.call_array, tx.calldata, tx.nonce).invoke(signature=tx.signature)
+        except Exception:
+            # Don't trust the local nonce after a failure, read it again before the next transaction
+            self.nonce = None
+            raise
+
+        self.nonce = tx.nonce + 1
+        return res
+
+
+class Batch:
+    """
+    Queues calls and sends them as __execute__ multicalls, one signature and nonce per multicall:
+
+    >>> await user.batch().approve(cargo_token, admiral.contract_address, 100).deposit_into_ship(admiral, 100).send()
+
+    A batch is split into several transactions so that none exceeds `max_calldata` felts of
+    calldata and, when `max_steps` is set, `max_steps` Cairo steps. Steps are only known by
+    running the calls, so a batch over the step limit is estimated and halved until it fits.
+    """
+
+    def __init__(self, account: Account, max_calldata=MAX_BATCH_CALLDATA, max_steps=None):
+        self.account = account
+        self.max_calldata = max_calldata
+        self.max_steps = max_steps
+        self.calls = []
+
+    def __len__(self):
+        return len(self.calls)
+
+    def add(self, to, selector_name, calldata):
+        self.calls.append((to, selector_name, calldata))
+        return self
+
+    def mint(self, erc20_contract, to_contract, amount: int):
+        return self.add(*mint_call(erc20_contract, to_contract, amount))
+
+    def transfer(self, erc20_contract, to_user, amount: int):
+        return self.add(*transfer_call(erc20_contract, to_user, amount))
+
+    def approve(self, erc20_contract, spender_address, amount: int):
+        return self.add(*approve_call(erc20_contract, spender_address, amount))
+
+    def depart(self, admiral, ship_idx):
+        return self.add(*depart_call(admiral, ship_idx))
+
+    def deposit_into_ship(self, conductor, amount: int):
+        return self.add(*deposit_call(conductor, amount))
+
+    def unload_ship(self, admiral, ship_idx):
+        return self.add(*unload_ship_call(admiral, ship_idx))
+
+    def unload_ships(self, admiral, ship_indexes, crew_budget):
+        return self.add(*unload_ships_call(admiral, ship_indexes, crew_budget))
+
+    def split(self):
+        """Splits the queued calls into consecutive chunks within the calldata limit."""
+        chunks = []
+        for call in self.calls:
+            if chunks and execute_calldata_size(chunks[-1] + [call]) <= self.max_calldata:
+                chunks[-1].append(call)
+            else:
+                chunks.append([call])
+
+        return chunks
+
+    async def send(self, max_fee=0):
+        """Sends the queued calls and empties the batch. Returns the execution info of every transaction sent."""
+        results = []
+        for chunk in self.split():
+            results.extend(await self._send(chunk, max_fee))
+
+        self.calls = []
+        return results
+
+    async def _send(self, calls, max_fee):
+        if self.max_steps is not None and len(calls) > 1:
+            if await self.account.estimate_steps(calls, max_fee) > self.max_steps:
+                half = len(calls) // 2
+                return await self._send(calls[:half], max_fee) + await self._send(calls[half:], max_fee)
+
+        return [await self.account.send_transactions(calls, max_fee=max_fee)]
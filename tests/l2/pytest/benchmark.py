@@ -0,0 +1,244 @@
+"""
+Throughput benchmark replaying Ironfleet traffic against L2Admiral.
+
+Users deposit into the open ship, the keeper departs it, L1 returns come back through
+process_indexed_msg_from_l1 and the keeper unloads the returned ships. Every transaction is recorded
+with its wall-clock time, Cairo steps, builtin usage and state diff, summarised per entry point:
+
+    python tests/l2/pytest/benchmark.py --users 20 --rounds 10 --json bench.json --csv bench.csv
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import math
+import random
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List
+
+from starkware.starknet.core.os.class_hash import set_class_hash_cache
+
+from conftest import ShipStatus, build_base_state
+from contract_cache import class_hash_cache
+from l1_messages import L1_INDEXED_HANDLER_SELECTOR, build_l1_indexed_message_handler_payload
+from open_zeppelin.utils import from_uint
+from scenarios import deploy_crew
+from snapshot import bind_handles, snapshot
+from state_diff import StateDiff, track
+
+
+@dataclass
+class Workload:
+    users: int = 10
+    # A round is one deposit from every user followed by the keeper departing the ship
+    rounds: int = 5
+    # fixed, uniform or lognormal, between min_deposit and max_deposit
+    deposit_size: str = "uniform"
+    min_deposit: int = 10
+    max_deposit: int = 1000
+    # Ships returning in a single L1 message, the rest come back at the end
+    ships_per_return: int = 2
+    # Loot paid out per unit of cargo returned
+    loot_ratio: float = 1.1
+    seed: int = 0
+
+    def deposit_amounts(self, rng: random.Random):
+        if self.deposit_size == "fixed":
+            return lambda: self.min_deposit
+        if self.deposit_size == "uniform":
+            return lambda: rng.randint(self.min_deposit, self.max_deposit)
+        if self.deposit_size == "lognormal":
+            # Median at the geometric mean of the bounds, most of the mass between them
+            mu = (math.log(self.min_deposit) + math.log(self.max_deposit)) / 2
+            sigma = (math.log(self.max_deposit) - math.log(self.min_deposit)) / 4
+            return lambda: max(self.min_deposit, min(self.max_deposit, int(rng.lognormvariate(mu, sigma))))
+        raise ValueError(f"Unknown deposit size distribution {self.deposit_size}")
+
+
+@dataclass
+class TransactionRecord:
+    entry_point: str
+    wall_time: float
+    n_steps: int
+    n_memory_holes: int
+    builtins: Dict[str, int] = field(default_factory=dict)
+    state_diff: Dict[str, int] = field(default_factory=dict)
+
+
+class Recorder:
+    """Collects a TransactionRecord for every transaction the workload sends."""
+
+    def __init__(self):
+        self.records: List[TransactionRecord] = []
+        self.wall_time = 0.0
+
+    async def record(self, entry_point: str, tx):
+        with track() as diff:
+            start = time.perf_counter()
+            execution_info = await tx
+            wall_time = time.perf_counter() - start
+
+        resources = execution_info.call_info.execution_resources
+        self.records.append(TransactionRecord(entry_point, wall_time, resources.n_steps, resources.n_memory_holes,
+                                              dict(resources.builtin_instance_counter), diff.as_dict()))
+        return execution_info
+
+    def summary(self) -> Dict[str, dict]:
+        by_entry_point = defaultdict(list)
+        for record in self.records:
+            by_entry_point[record.entry_point].append(record)
+
+        summary = {}
+        for entry_point, records in by_entry_point.items():
+            wall_time = sum(r.wall_time for r in records)
+            builtins = defaultdict(int)
+            state_diff = defaultdict(int)
+            for r in records:
+                for builtin, count in r.builtins.items():
+                    builtins[builtin] += count
+                for metric, value in r.state_diff.items():
+                    state_diff[metric] += value
+
+            summary[entry_point] = {
+                "transactions": len(records),
+                "wall_time": wall_time,
+                "tx_per_sec": len(records) / wall_time if wall_time else 0.0,
+                "mean_wall_time": wall_time / len(records),
+                "total_steps": sum(r.n_steps for r in records),
+                "mean_steps": sum(r.n_steps for r in records) / len(records),
+                "max_steps": max(r.n_steps for r in records),
+                "mean_memory_holes": sum(r.n_memory_holes for r in records) / len(records),
+                "builtins": {builtin: count / len(records) for builtin, count in sorted(builtins.items())},
+                "state_diff": {metric: value / len(records) for metric, value in state_diff.items()},
+            }
+
+        return summary
+
+    def report(self, workload: Workload) -> dict:
+        tx_wall_time = sum(r.wall_time for r in self.records)
+        return {
+            "workload": asdict(workload),
+            "transactions": len(self.records),
+            "wall_time": self.wall_time,
+            "tx_per_sec": len(self.records) / tx_wall_time if tx_wall_time else 0.0,
+            "entry_points": self.summary(),
+        }
+
+    def write_json(self, filename: str, workload: Workload):
+        report = self.report(workload)
+        report["records"] = [asdict(r) for r in self.records]
+        with open(filename, "w") as f:
+            json.dump(report, f, indent=2)
+
+    def write_csv(self, filename: str):
+        summary = self.summary()
+        builtins = sorted({builtin for s in summary.values() for builtin in s["builtins"]})
+        state_diff = list(StateDiff().as_dict())
+        columns = ["entry_point", "transactions", "wall_time", "tx_per_sec", "mean_wall_time", "total_steps",
+                   "mean_steps", "max_steps", "mean_memory_holes"]
+
+        with open(filename, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns + builtins + [f"mean_{metric}" for metric in state_diff])
+            for entry_point, s in summary.items():
+                writer.writerow([entry_point] + [s[c] for c in columns[1:]] + [s["builtins"].get(b, 0) for b in builtins]
+                                + [s["state_diff"].get(metric, 0) for metric in state_diff])
+
+
+async def _return_ships(starknet, fleet: dict, recorder: Recorder, ships: List[int], cargo: Dict[int, int],
+                        workload: Workload):
+    """Sends one L1 message returning the given ships, then unloads them until they are finalised."""
+    admiral = fleet["admiral"]
+    l2_keeper = fleet["l2_keeper"]
+    l1_contract_address = (await admiral.get_l1_contract_address().call()).result.address
+    price_per_ship = from_uint((await admiral.get_price_per_ship().call()).result.price_per_ship)
+
+    amounts = [cargo[ship_idx] - price_per_ship for ship_idx in ships]
+    loot = int(sum(amounts) * workload.loot_ratio)
+    await recorder.record("mint", l2_keeper.mint(fleet["loot_token"], admiral, loot))
+    await recorder.record("process_indexed_msg_from_l1", starknet.send_message_to_l2(
+        l1_contract_address, admiral.contract_address, L1_INDEXED_HANDLER_SELECTOR,
+        build_l1_indexed_message_handler_payload(ships, amounts, loot)))
+
+    for ship_idx in ships:
+        while (await admiral.get_ship_status(ship_idx).call()).result.status == ShipStatus.RETURNED.value:
+            await recorder.record("unload_ship", l2_keeper.send_transaction(
+                admiral.contract_address, 'unload_ship', calldata=[ship_idx]))
+
+
+async def run_workload(starknet, fleet: dict, workload: Workload, recorder: Recorder):
+    """Replays the workload on the given Starknet, `fleet` holding the base state handles bound to it."""
+    rng = random.Random(workload.seed)
+    deposit_amount = workload.deposit_amounts(rng)
+    admiral = fleet["admiral"]
+
+    start = time.perf_counter()
+    users = await deploy_crew(starknet, fleet, workload.users, balance=workload.max_deposit * workload.rounds)
+
+    cargo = {}
+    at_sea = []
+    for _ in range(workload.rounds):
+        ship_idx = (await admiral.get_open_ship_status().call()).result.ship_idx
+        cargo[ship_idx] = 0
+        for user in users:
+            amount = deposit_amount()
+            await recorder.record("deposit", user.deposit_into_ship(admiral, amount))
+            cargo[ship_idx] += amount
+
+        await recorder.record("depart", fleet["l2_keeper"].depart(admiral, ship_idx))
+        at_sea.append(ship_idx)
+
+        if len(at_sea) == workload.ships_per_return:
+            await _return_ships(starknet, fleet, recorder, at_sea, cargo, workload)
+            at_sea = []
+
+    if at_sea:
+        await _return_ships(starknet, fleet, recorder, at_sea, cargo, workload)
+
+    recorder.wall_time += time.perf_counter() - start
+    return recorder
+
+
+async def main(argv=None):
+    defaults = Workload()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--rounds", type=int, default=defaults.rounds)
+    parser.add_argument("--deposit-size", choices=["fixed", "uniform", "lognormal"], default=defaults.deposit_size)
+    parser.add_argument("--min-deposit", type=int, default=defaults.min_deposit)
+    parser.add_argument("--max-deposit", type=int, default=defaults.max_deposit)
+    parser.add_argument("--ships-per-return", type=int, default=defaults.ships_per_return)
+    parser.add_argument("--loot-ratio", type=float, default=defaults.loot_ratio)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--json", help="write the report, per transaction records included, to this file")
+    parser.add_argument("--csv", help="write the per entry point summary to this file")
+    args = parser.parse_args(argv)
+
+    workload = Workload(users=args.users, rounds=args.rounds, deposit_size=args.deposit_size,
+                        min_deposit=args.min_deposit, max_deposit=args.max_deposit,
+                        ships_per_return=args.ships_per_return, loot_ratio=args.loot_ratio, seed=args.seed)
+
+    with set_class_hash_cache(class_hash_cache):
+        base_state = await build_base_state()
+        starknet = snapshot(base_state["starknet"])
+        fleet = bind_handles(base_state, starknet)
+        recorder = await run_workload(starknet, fleet, workload, Recorder())
+
+    if args.json:
+        recorder.write_json(args.json, workload)
+    if args.csv:
+        recorder.write_csv(args.csv)
+
+    report = recorder.report(workload)
+    print(f"{report['transactions']} transactions in {report['wall_time']:.1f}s, {report['tx_per_sec']:.2f} tx/s")
+    for entry_point, s in report["entry_points"].items():
+        print(f"  {entry_point:<20} {s['transactions']:>6} tx  {s['tx_per_sec']:>8.2f} tx/s  "
+              f"{s['mean_steps']:>10.0f} steps/tx  {s['state_diff']['keys_changed']:>6.1f} keys/tx  "
+              f"{s['state_diff']['da_gas']:>8.0f} DA gas/tx  {s['builtins']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,222 @@
+"""
+Step-level profiler for Cairo contract executions.
+
+Every contract entry point run inside a `profiled()` block is attributed step by step to its
+Cairo call stack. Calls into other contracts are nested under the stack that made the call, so
+an account transaction shows up as __execute__ -> ... -> call_contract -> __wrappers__.unload_ship -> ...
+
+    with profiled() as profiler:
+        await admiral.unload_ship(1).invoke()
+    profiler.print_summary()
+    profiler.write_folded("unload_ship.folded")    # flamegraph.pl, speedscope, ...
+    profiler.write_pprof("unload_ship.pb.gz")      # pprof -http=: unload_ship.pb.gz
+
+It also works as a pytest plugin: `pytest --cairo-profile=DIR` profiles every test to DIR.
+"""
+
+import bisect
+import contextlib
+import gzip
+import os
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+from starkware.cairo.common.cairo_function_runner import CairoFunctionRunner
+from starkware.cairo.lang.compiler.identifier_definition import FunctionDefinition
+from starkware.cairo.lang.compiler.program import Program
+from starkware.cairo.lang.tracer.third_party.profile_pb2 import Profile
+
+Stack = Tuple[str, ...]
+
+
+class _FunctionIndex:
+    """Maps pcs of a program to the name of the function they belong to."""
+
+    def __init__(self, program: Program):
+        functions = sorted((definition.pc, str(name)) for name, definition in program.identifiers.as_dict().items()
+                           if isinstance(definition, FunctionDefinition))
+        self.pcs = [pc for pc, _ in functions]
+        self.names = [name for _, name in functions]
+
+    def function_at(self, pc: int) -> str:
+        i = bisect.bisect_right(self.pcs, pc) - 1
+        return self.names[i] if i >= 0 else f"pc_{pc}"
+
+
+class _Run:
+    """A single entry point execution: its runner and the stack of whoever called it."""
+
+    def __init__(self, runner: CairoFunctionRunner, functions: _FunctionIndex, prefix: Stack):
+        self.runner = runner
+        self.functions = functions
+        self.prefix = prefix
+        # fp -> stack of the callers of the frame at fp. Cairo memory is write-once, so the
+        # return fp/pc stored below a frame, and thus its callers, never change for a given fp.
+        self._callers: Dict = {}
+
+    def _function(self, pc) -> str:
+        return self.functions.function_at(pc - self.runner.program_base)
+
+    def _caller_stack(self, fp) -> Stack:
+        if fp == self.runner.initial_fp:
+            return self.prefix
+        if fp not in self._callers:
+            memory = self.runner.memory
+            self._callers[fp] = self.stack(memory[fp - 2], memory[fp - 1])
+        return self._callers[fp]
+
+    def stack(self, fp, pc) -> Stack:
+        return self._caller_stack(fp) + (self._function(pc),)
+
+    def current_stack(self) -> Stack:
+        run_context = self.runner.vm.run_context
+        return self.stack(run_context.fp, run_context.pc)
+
+    def samples(self) -> Counter:
+        samples = Counter()
+        for entry in self.runner.vm.trace:
+            samples[self.stack(entry.fp, entry.pc)] += 1
+        return samples
+
+
+class CairoProfiler:
+    """Collects the steps of every profiled run by call stack."""
+
+    def __init__(self):
+        self.samples: Counter = Counter()
+        self._functions: Dict[int, _FunctionIndex] = {}
+        self._active: List[_Run] = []
+
+    def _function_index(self, program: Program) -> _FunctionIndex:
+        if id(program) not in self._functions:
+            self._functions[id(program)] = _FunctionIndex(program)
+        return self._functions[id(program)]
+
+    def run(self, runner: CairoFunctionRunner, run_from_entrypoint, *args, **kwargs):
+        prefix = self._active[-1].current_stack() if self._active else ()
+        run = _Run(runner, self._function_index(runner.program), prefix)
+        self._active.append(run)
+        try:
+            return run_from_entrypoint(runner, *args, **kwargs)
+        finally:
+            self._active.pop()
+            # Failed runs are profiled up to the failing step
+            self.samples.update(run.samples())
+
+    @property
+    def total_steps(self) -> int:
+        return sum(self.samples.values())
+
+    def summary(self) -> List[Tuple[str, int, int]]:
+        """(function, inclusive steps, exclusive steps), most inclusive steps first."""
+        inclusive = Counter()
+        exclusive = Counter()
+        for stack, steps in self.samples.items():
+            exclusive[stack[-1]] += steps
+            for function in set(stack):
+                inclusive[function] += steps
+
+        return sorted(((f, inclusive[f], exclusive[f]) for f in inclusive), key=lambda s: (-s[1], -s[2], s[0]))
+
+    def print_summary(self, limit: int = 25):
+        total = self.total_steps or 1
+        print(f"{'inclusive':>10} {'%':>6} {'exclusive':>10} {'%':>6}  function")
+        for function, inclusive, exclusive in self.summary()[:limit]:
+            print(f"{inclusive:>10} {100 * inclusive / total:>5.1f}% {exclusive:>10} {100 * exclusive / total:>5.1f}%  "
+                  f"{function}")
+
+    def write_folded(self, filename: str):
+        """Folded stacks, one `caller;...;callee steps` line per stack, as read by flamegraph tools."""
+        with open(filename, "w") as f:
+            for stack, steps in sorted(self.samples.items()):
+                f.write(f"{';'.join(stack)} {steps}\n")
+
+    def write_pprof(self, filename: str):
+        """Gzipped pprof profile with a single `steps` sample type."""
+        profile = Profile()
+        strings = {"": 0}
+        profile.string_table.append("")
+
+        def string_id(s: str) -> int:
+            if s not in strings:
+                strings[s] = len(strings)
+                profile.string_table.append(s)
+            return strings[s]
+
+        sample_type = profile.sample_type.add()
+        sample_type.type = string_id("running time")
+        sample_type.unit = string_id("steps")
+        profile.time_nanos = int(time.time() * 10 ** 9)
+
+        # One function and one location per Cairo function, ids start at 1
+        location_ids: Dict[str, int] = {}
+        for stack in self.samples:
+            for name in stack:
+                if name not in location_ids:
+                    location_ids[name] = len(location_ids) + 1
+                    function = profile.function.add()
+                    function.id = location_ids[name]
+                    function.name = function.system_name = string_id(name)
+                    location = profile.location.add()
+                    location.id = location_ids[name]
+                    location.line.add().function_id = location_ids[name]
+
+        for stack, steps in self.samples.items():
+            sample = profile.sample.add()
+            # pprof wants the leaf first
+            sample.location_id.extend(location_ids[name] for name in reversed(stack))
+            sample.value.append(steps)
+
+        with open(filename, "wb") as f:
+            f.write(gzip.compress(profile.SerializeToString()))
+
+
+_profiler: Optional[CairoProfiler] = None
+_run_from_entrypoint = CairoFunctionRunner.run_from_entrypoint
+
+
+def _profiled_run_from_entrypoint(runner, *args, **kwargs):
+    # Only contract entry points get a syscall handler, leave other Cairo programs (e.g. class hashing) alone
+    if _profiler is None or "syscall_handler" not in (kwargs.get("hint_locals") or {}):
+        return _run_from_entrypoint(runner, *args, **kwargs)
+    return _profiler.run(runner, _run_from_entrypoint, *args, **kwargs)
+
+
+@contextlib.contextmanager
+def profiled(profiler: CairoProfiler = None):
+    """Profiles every contract execution in the block: invoke(), call(), Account transactions and L1 messages."""
+    global _profiler
+    previous = _profiler
+    _profiler = profiler if profiler is not None else CairoProfiler()
+    CairoFunctionRunner.run_from_entrypoint = _profiled_run_from_entrypoint
+    try:
+        yield _profiler
+    finally:
+        _profiler = previous
+        if _profiler is None:
+            CairoFunctionRunner.run_from_entrypoint = _run_from_entrypoint
+
+
+def pytest_addoption(parser):
+    parser.getgroup("cairo profiler").addoption(
+        "--cairo-profile", metavar="DIR",
+        help="profile the Cairo steps of every test, writing <test>.folded and <test>.pb.gz to DIR")
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    directory = item.config.getoption("cairo_profile")
+    if not directory:
+        yield
+        return
+
+    with profiled() as profiler:
+        yield
+
+    os.makedirs(directory, exist_ok=True)
+    name = re.sub(r"[^\w.-]+", "_", item.nodeid)
+    profiler.write_folded(os.path.join(directory, f"{name}.folded"))
+    profiler.write_pprof(os.path.join(directory, f"{name}.pb.gz"))
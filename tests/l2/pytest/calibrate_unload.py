@@ -0,0 +1,132 @@
+"""
+Calibration of the unload_ship step budget.
+
+Sails ships with growing crews, unloads each of them whole in one unload_ship and fits the
+steps taken to a cost per ship plus a cost per crew member. The fit bounds every measurement
+from above, so batches sized with it stay within the budget for the crews measured:
+
+    python tests/l2/pytest/calibrate_unload.py --crew-sizes 1 2 4 8 16 --step-budget 1000000
+
+The recommended values go to L2Admiral.set_unload_step_budget. With --entry-point the ships are
+unloaded with unload_ships or unload_ships_to_ledger instead, to compare how many crew a
+transaction settles within the budget:
+
+    python tests/l2/pytest/calibrate_unload.py --entry-point unload_ships_to_ledger
+"""
+
+import argparse
+import asyncio
+import math
+from dataclasses import dataclass
+from typing import Dict, List
+
+from starkware.starknet.core.os.class_hash import set_class_hash_cache
+from starkware.starknet.definitions.general_config import DEFAULT_MAX_STEPS
+
+from conftest import build_base_state
+from contract_cache import class_hash_cache
+from l1_messages import L1_INDEXED_HANDLER_SELECTOR, build_l1_indexed_message_handler_payload
+from open_zeppelin.utils import from_uint
+from scenarios import CREW_DEPOSIT, deploy_crew
+from snapshot import bind_handles, snapshot
+
+
+@dataclass
+class UnloadCostModel:
+    ship_steps: int
+    crew_steps: int
+
+    def steps(self, crew: int) -> int:
+        return self.ship_steps + self.crew_steps * crew
+
+    def batch_size(self, step_budget: int) -> int:
+        """Crew an unload_ship pays out within `step_budget`, as computed by L2Admiral."""
+        return (step_budget - self.ship_steps) // self.crew_steps
+
+
+def fit(measurements: Dict[int, int]) -> UnloadCostModel:
+    """
+    Fits the steps of unloading a whole ship, by crew size, to ship_steps + crew_steps * crew.
+    The steepest slope between two sizes is the cost per crew member, the ship cost is then
+    the smallest that keeps every measurement under the line.
+    """
+    sizes = sorted(measurements)
+    if len(sizes) < 2:
+        raise ValueError("Calibrating needs measurements for at least two crew sizes")
+
+    crew_steps = max(math.ceil((measurements[b] - measurements[a]) / (b - a)) for a, b in zip(sizes, sizes[1:]))
+    crew_steps = max(crew_steps, 1)
+    ship_steps = max(measurements[size] - crew_steps * size for size in sizes)
+    return UnloadCostModel(max(ship_steps, 0), crew_steps)
+
+
+ENTRY_POINTS = ("unload_ship", "unload_ships", "unload_ships_to_ledger")
+
+
+async def measure(starknet, fleet: dict, crew_sizes: List[int], entry_point: str = "unload_ship") -> Dict[int, int]:
+    """Steps of the keeper's `entry_point` transaction finalising a ship of every crew size."""
+    admiral = fleet["admiral"]
+    l2_keeper = fleet["l2_keeper"]
+    crew = await deploy_crew(starknet, fleet, max(crew_sizes), balance=CREW_DEPOSIT * len(crew_sizes))
+
+    # Unload every ship whole, whatever the configured batch size
+    await l2_keeper.send_transaction(admiral.contract_address, 'set_unload_step_budget', calldata=[0, 0, 0])
+    await l2_keeper.send_transaction(admiral.contract_address, 'set_unload_batch_size', calldata=[max(crew_sizes)])
+
+    price_per_ship = from_uint((await admiral.get_price_per_ship().call()).result.price_per_ship)
+    ships = {}
+    for size in crew_sizes:
+        ship_idx = (await admiral.get_open_ship_status().call()).result.ship_idx
+        for member in crew[:size]:
+            await member.deposit_into_ship(admiral, CREW_DEPOSIT)
+        await l2_keeper.depart(admiral, ship_idx)
+        ships[size] = ship_idx
+
+    ship_indexes = list(ships.values())
+    amounts = [CREW_DEPOSIT * size - price_per_ship for size in ships]
+    loot = sum(amounts)
+    await l2_keeper.mint(fleet["loot_token"], admiral, loot)
+    l1_contract_address = (await admiral.get_l1_contract_address().call()).result.address
+    await starknet.send_message_to_l2(l1_contract_address, admiral.contract_address, L1_INDEXED_HANDLER_SELECTOR,
+                                      build_l1_indexed_message_handler_payload(ship_indexes, amounts, loot))
+
+    measurements = {}
+    for size, ship_idx in ships.items():
+        calldata = [ship_idx] if entry_point == "unload_ship" else [1, ship_idx, size]
+        res = await l2_keeper.send_transaction(admiral.contract_address, entry_point, calldata=calldata)
+        measurements[size] = res.call_info.execution_resources.n_steps
+
+    return measurements
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--crew-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--step-budget", type=int, default=DEFAULT_MAX_STEPS,
+                        help="steps a transaction may take, the Starknet limit by default")
+    parser.add_argument("--headroom", type=float, default=0.9,
+                        help="share of the step budget unload_ship may use")
+    parser.add_argument("--entry-point", choices=ENTRY_POINTS, default="unload_ship")
+    args = parser.parse_args(argv)
+
+    with set_class_hash_cache(class_hash_cache):
+        base_state = await build_base_state()
+        starknet = snapshot(base_state["starknet"])
+        fleet = bind_handles(base_state, starknet)
+        measurements = await measure(starknet, fleet, sorted(set(args.crew_sizes)), args.entry_point)
+
+    model = fit(measurements)
+    step_budget = int(args.step_budget * args.headroom)
+    for size, steps in sorted(measurements.items()):
+        print(f"  {size:>5} crew  {steps:>10} steps  (model {model.steps(size)})")
+    print(f"{args.entry_point} costs {model.ship_steps} steps per ship and {model.crew_steps} steps per crew member")
+    if args.entry_point == "unload_ship":
+        print(f"set_unload_step_budget({step_budget}, {model.ship_steps}, {model.crew_steps}) "
+              f"pays out {model.batch_size(step_budget)} crew per unload_ship")
+    else:
+        print(f"{args.entry_point} settles {model.batch_size(step_budget)} crew per transaction "
+              f"within {step_budget} steps")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -5,17 +5,26 @@ from enum import Enum
 
 import pytest
 import pytest_asyncio
+from starkware.starknet.core.os.class_hash import set_class_hash_cache
 from starkware.starknet.testing.starknet import Starknet
 
+import resource_gate
 from account import Account
+from contract_cache import class_hash_cache, get_contract_class
 from open_zeppelin.utils import (str_to_felt, uint)
+from scenarios import load_scenario
+from snapshot import bind_account, bind_contract, deploy_salt, snapshot
 
 ACCOUNT_FILE = os.path.join(get_python_lib(), "openzeppelin/account/presets/Account.cairo")
 MINTABLE_TOKEN = os.path.join(get_python_lib(), "openzeppelin/token/erc20/presets/ERC20Mintable.cairo")
 ADMIRAL_FILE = os.path.join(os.path.dirname(__file__), "../../../contracts/l2/L2Admiral.cairo")
 MOCK_STARKGATE = os.path.join(os.path.dirname(__file__), "../../../contracts/l2/testing/MockStarkGate.cairo")
 
+pytest_plugins = ["resource_gate", "cairo_profiler"]
+resource_gate.watch(ADMIRAL_FILE)
+
 L1_CONTRACT_ADDRESS = 0x42
+USER_CARGO_BALANCE = 100000
 
 
 class ShipStatus(Enum):
@@ -23,87 +32,138 @@ class ShipStatus(Enum):
     OPEN = 1
     AT_SEA = 2
     RETURNED = 3
+    SEALED = 4
 
 
-@pytest_asyncio.fixture(scope="module")
-async def starknet():
-    return await Starknet.empty()
+@pytest.fixture(scope="session", autouse=True)
+def contract_class_hashes():
+    # Every deploy hashes the contract class again, serve those from the contract cache instead
+    with set_class_hash_cache(class_hash_cache):
+        yield
 
 
-@pytest_asyncio.fixture(scope="module")
-async def cargo_token(starknet, l2_keeper):
-    cargo_token = await starknet.deploy(MINTABLE_TOKEN, constructor_calldata=[
-        str_to_felt("PoolingToken"),
-        str_to_felt("PT"),
-        18,
-        *uint(0),
-        l2_keeper.contract_address,
-        l2_keeper.contract_address
-    ])
+async def deploy_contract(starknet, source, constructor_calldata):
+    # Compile once (or load from the on-disk cache) and deploy the same class as often as needed
+    return await starknet.deploy(contract_class=get_contract_class(source), constructor_calldata=constructor_calldata,
+                                 contract_address_salt=deploy_salt(starknet))
 
-    return cargo_token
 
+async def deploy_account(starknet):
+    u = Account(123456789987654321)
+    u.set_contract(await deploy_contract(starknet, ACCOUNT_FILE, constructor_calldata=[u.public_key]))
+    return u
 
-@pytest_asyncio.fixture(scope="module")
-async def loot_token(starknet, l2_keeper):
-    loot_token = await starknet.deploy(MINTABLE_TOKEN, constructor_calldata=[
-        str_to_felt("PayoutToken"),
-        str_to_felt("RT"),
+
+async def deploy_token(starknet, name, symbol, owner):
+    return await deploy_contract(starknet, MINTABLE_TOKEN, constructor_calldata=[
+        str_to_felt(name),
+        str_to_felt(symbol),
         18,
         *uint(0),
-        l2_keeper.contract_address,
-        l2_keeper.contract_address
+        owner.contract_address,
+        owner.contract_address
     ])
-    return loot_token
 
 
-@pytest_asyncio.fixture(scope="function")
-async def starkgate(starknet):
-    starkgate = await starknet.deploy(MOCK_STARKGATE, constructor_calldata=[0])
-    return starkgate
+async def build_base_state():
+    """
+    Fully wired state every test starts from: tokens, keeper, starkgate, admiral and users that
+    hold USER_CARGO_BALANCE cargo tokens with the admiral approved to spend them.
+    """
+    starknet = await Starknet.empty()
+    l2_keeper = await deploy_account(starknet)
+    cargo_token = await deploy_token(starknet, "PoolingToken", "PT", l2_keeper)
+    loot_token = await deploy_token(starknet, "PayoutToken", "RT", l2_keeper)
+    starkgate = await deploy_contract(starknet, MOCK_STARKGATE, constructor_calldata=[0])
 
-
-@pytest_asyncio.fixture(scope="function")
-async def admiral(starknet, starkgate, cargo_token, loot_token, l2_keeper):
-    admiral = await starknet.deploy(ADMIRAL_FILE, constructor_calldata=[
+    admiral = await deploy_contract(starknet, ADMIRAL_FILE, constructor_calldata=[
         starkgate.contract_address,
         cargo_token.contract_address,
         loot_token.contract_address,
         l2_keeper.contract_address
     ])
-
     await l2_keeper.send_transaction(admiral.contract_address, 'set_l1_conductor_address',
                                      calldata=[L1_CONTRACT_ADDRESS])
-    return admiral
 
+    users = []
+    for _ in range(3):
+        user = await deploy_account(starknet)
+        await l2_keeper.mint(cargo_token, user, USER_CARGO_BALANCE)
+        await user.approve(cargo_token, admiral.contract_address, USER_CARGO_BALANCE)
+        users.append(user)
 
-async def deploy_account(starknet):
-    u = Account(123456789987654321)
-    u.set_contract(await starknet.deploy(ACCOUNT_FILE, constructor_calldata=[u.public_key]))
-    return u
+    return {
+        "starknet": starknet,
+        "l2_keeper": l2_keeper,
+        "cargo_token": cargo_token,
+        "loot_token": loot_token,
+        "starkgate": starkgate,
+        "admiral": admiral,
+        "users": users,
+    }
+
+
+@pytest_asyncio.fixture(scope="session")
+async def base_state(contract_class_hashes):
+    # Built once per session (per worker when sharding), tests only ever see snapshots of it
+    return await build_base_state()
+
+
+@pytest.fixture(scope="function")
+def starknet(base_state):
+    # Every test runs on its own copy-on-write snapshot, dropping it at teardown reverts the test
+    return snapshot(base_state["starknet"])
+
+
+@pytest.fixture(scope="function")
+def cargo_token(starknet, base_state):
+    return bind_contract(base_state["cargo_token"], starknet)
+
+
+@pytest.fixture(scope="function")
+def loot_token(starknet, base_state):
+    return bind_contract(base_state["loot_token"], starknet)
+
+
+@pytest.fixture(scope="function")
+def starkgate(starknet, base_state):
+    return bind_contract(base_state["starkgate"], starknet)
+
+
+@pytest.fixture(scope="function")
+def admiral(starknet, base_state):
+    return bind_contract(base_state["admiral"], starknet)
+
+
+@pytest.fixture(scope="function")
+def l2_keeper(starknet, base_state):
+    return bind_account(base_state["l2_keeper"], starknet)
 
 
-@pytest_asyncio.fixture(scope="module")
-async def l2_keeper(starknet):
-    return await deploy_account(starknet)
+@pytest.fixture(scope="function")
+def user1(starknet, base_state):
+    return bind_account(base_state["users"][0], starknet)
 
 
-@pytest_asyncio.fixture(scope="function")
-async def user1(starknet):
-    return await deploy_account(starknet)
+@pytest.fixture(scope="function")
+def user2(starknet, base_state):
+    return bind_account(base_state["users"][1], starknet)
 
 
-@pytest_asyncio.fixture(scope="function")
-async def user2(starknet):
-    return await deploy_account(starknet)
+@pytest.fixture(scope="function")
+def user3(starknet, base_state):
+    return bind_account(base_state["users"][2], starknet)
 
 
-@pytest_asyncio.fixture(scope="function")
-async def user3(starknet):
-    return await deploy_account(starknet)
+@pytest.fixture(scope="function")
+def scenario(base_state):
+    # Usage: `starknet, fleet = await scenario("small_fleet")`, see scenarios.SCENARIOS
+    async def load(name):
+        return await load_scenario(name, base_state)
+    return load
 
 
-@pytest.fixture(scope='module')
+@pytest.fixture(scope='session')
 def event_loop(request):
     loop = asyncio.get_event_loop_policy().new_event_loop()
     yield loop
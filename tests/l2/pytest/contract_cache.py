@@ -0,0 +1,124 @@
+"""On-disk cache of compiled contract classes for the pytest harness."""
+
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+import cachetools
+from starkware.cairo.lang.compiler.cairo_compile import get_module_reader
+from starkware.cairo.lang.compiler.module_reader import ModuleNotFoundException
+from starkware.cairo.lang.version import __version__ as CAIRO_LANG_VERSION
+from starkware.cairo.lang.vm.crypto import pedersen_hash
+from starkware.starknet.compiler.compile import compile_starknet_files
+from starkware.starknet.core.os.class_hash import compute_class_hash_inner
+from starkware.starknet.public.abi import starknet_keccak
+from starkware.starknet.services.api.contract_class import ContractClass
+
+CACHE_DIR = os.environ.get("IRONFLEET_CONTRACT_CACHE",
+                           os.path.join(os.path.dirname(__file__), ".contract_cache"))
+
+IMPORT_PATTERN = re.compile(r"^\s*(?:from\s+([\w.]+)\s+import|import\s+([\w.]+))", re.MULTILINE)
+
+# Classes already loaded by this process and their class hashes, keyed by cache key
+_loaded_classes: Dict[str, ContractClass] = {}
+_loaded_class_hashes: Dict[str, int] = {}
+
+# Handed to compute_class_hash() through set_class_hash_cache() and seeded with the class hashes
+# kept next to the cached classes, so deploying a cached class never runs the class hash program
+class_hash_cache = cachetools.LRUCache(maxsize=32)
+
+
+def _module_sources(source: str, cairo_path: List[str]) -> List[str]:
+    """Returns the source file followed by every module it transitively imports."""
+    module_reader = get_module_reader(cairo_path=cairo_path)
+    files = [os.path.abspath(source)]
+    seen = set(files)
+
+    i = 0
+    while i < len(files):
+        with open(files[i]) as f:
+            code = f.read()
+        i += 1
+
+        for match in IMPORT_PATTERN.finditer(code):
+            module_name = match.group(1) or match.group(2)
+            try:
+                filename = os.path.abspath(module_reader.module_to_file_path(module_name))
+            except ModuleNotFoundException:
+                # Leave it to the compiler to report
+                continue
+
+            if filename not in seen:
+                seen.add(filename)
+                files.append(filename)
+
+    return files
+
+
+def cache_key(source: str, cairo_path: Optional[List[str]] = None) -> str:
+    """Hash of the contract sources, its imports, the include paths and the cairo-lang version."""
+    cairo_path = [] if cairo_path is None else cairo_path
+    h = hashlib.sha256()
+    h.update(CAIRO_LANG_VERSION.encode())
+    h.update(json.dumps([os.path.abspath(p) for p in cairo_path]).encode())
+
+    for filename in _module_sources(source, cairo_path):
+        h.update(filename.encode())
+        with open(filename, "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+
+    return h.hexdigest()
+
+
+def get_contract_class(source: str, cairo_path: Optional[List[str]] = None) -> ContractClass:
+    """
+    Returns the compiled class for the given Cairo source, compiling it only when
+    neither this process nor the on-disk cache has seen the same sources before.
+    """
+    key = cache_key(source, cairo_path)
+    if key in _loaded_classes:
+        return _loaded_classes[key]
+
+    name = os.path.splitext(os.path.basename(source))[0]
+    cache_file = os.path.join(CACHE_DIR, f"{name}-{key[:16]}.json")
+    hash_file = os.path.join(CACHE_DIR, f"{name}-{key[:16]}.hash")
+
+    if os.path.isfile(cache_file) and os.path.isfile(hash_file):
+        with open(cache_file) as f:
+            contract_class = ContractClass.loads(f.read())
+        with open(hash_file) as f:
+            class_hash = int(f.read())
+    else:
+        contract_class = compile_starknet_files(files=[source], debug_info=True, cairo_path=cairo_path)
+        class_hash = compute_class_hash_inner(contract_class=contract_class, hash_func=pedersen_hash)
+
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        _write_atomic(hash_file, str(class_hash))
+        _write_atomic(cache_file, contract_class.dumps(sort_keys=True))
+
+    # Same key compute_class_hash() looks up
+    contract_class_bytes = contract_class.dumps(sort_keys=True).encode()
+    class_hash_cache[(starknet_keccak(data=contract_class_bytes), pedersen_hash)] = class_hash
+
+    _loaded_classes[key] = contract_class
+    _loaded_class_hashes[key] = class_hash
+    return contract_class
+
+
+def get_class_hash(source: str, cairo_path: Optional[List[str]] = None) -> int:
+    """Class hash of the class get_contract_class() returns for the same source."""
+    key = cache_key(source, cairo_path)
+    if key not in _loaded_class_hashes:
+        get_contract_class(source, cairo_path)
+
+    return _loaded_class_hashes[key]
+
+
+def _write_atomic(filename: str, data: str):
+    # Write to a temporary file first so concurrent workers never read a partial file
+    tmp_file = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        f.write(data)
+    os.replace(tmp_file, filename)
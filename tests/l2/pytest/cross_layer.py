@@ -0,0 +1,282 @@
+"""
+Cross-layer simulator running L1Admiral and L2Admiral side by side.
+
+L1Admiral runs with the mock Starknet core, Starkgates, tokens and DeFi contract on a local EVM
+through web3, L2Admiral on the Starknet testing state. Messages are relayed between the two like
+the Starknet sequencer would, so whole round trips (deposit, depart, executeShipRides, return and
+unload) run offline and report their L1 gas and L2 steps together:
+
+    python tests/l2/pytest/cross_layer.py --users 3 --rounds 5
+
+The EVM is py-evm through web3's EthereumTesterProvider (web3[tester] in requirements.txt) unless
+IRONFLEET_L1_RPC points at a running node, e.g. `yarn hardhat node`. The L1 contracts are loaded
+from the hardhat artifacts, run `yarn compile:l1` first.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from starkware.starknet.core.os.class_hash import set_class_hash_cache
+from web3 import Web3
+from web3.logs import DISCARD
+
+from conftest import ADMIRAL_FILE, USER_CARGO_BALANCE, build_base_state, deploy_contract
+from contract_cache import class_hash_cache
+from l1_messages import MESSAGE_VERSION
+from open_zeppelin.utils import uint
+from snapshot import bind_handles, snapshot
+
+ARTIFACTS_DIR = os.environ.get(
+    "IRONFLEET_L1_ARTIFACTS", os.path.join(os.path.dirname(__file__), "../../../artifacts/contracts/l1"))
+
+# Sighash of MockDeFiContract.deposit(uint256), as used by the hardhat tests
+DEFI_DEPOSIT_SIGHASH = bytes.fromhex("b6b55f25")
+# Input token the L1 Starkgate and the DeFi contract hold to pay out withdrawals and swaps
+L1_LIQUIDITY = 10**30
+
+TRANSFER_FROM_STARKNET = 0
+UINT256_PART_SIZE_BITS = 128
+UINT256_PART_SIZE = 2**UINT256_PART_SIZE_BITS
+
+
+def load_artifact(path: str) -> dict:
+    """ABI and bytecode of an L1 contract compiled by hardhat, e.g. `starknet/MockStarknetCore.sol`."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    filename = os.path.join(ARTIFACTS_DIR, path, f"{name}.json")
+    if not os.path.exists(filename):
+        raise FileNotFoundError(f"{filename} not found, compile the L1 contracts with `yarn compile:l1`")
+    with open(filename) as f:
+        return json.load(f)
+
+
+def connect_l1() -> Web3:
+    """Web3 connected to IRONFLEET_L1_RPC, or to an in-process py-evm chain."""
+    rpc = os.environ.get("IRONFLEET_L1_RPC")
+    if rpc:
+        return Web3(Web3.HTTPProvider(rpc))
+    return Web3(Web3.EthereumTesterProvider())
+
+
+async def deploy_l2_admiral(starknet, fleet: dict) -> dict:
+    """
+    The fleet with a fresh L2Admiral, approved by its users, in place of the base state's one. The L1
+    conductor address can only be set once and the base state's admiral already points at a mock one.
+    """
+    admiral = await deploy_contract(starknet, ADMIRAL_FILE, constructor_calldata=[
+        fleet["starkgate"].contract_address,
+        fleet["cargo_token"].contract_address,
+        fleet["loot_token"].contract_address,
+        fleet["l2_keeper"].contract_address
+    ])
+    for user in fleet["users"]:
+        await user.approve(fleet["cargo_token"], admiral.contract_address, USER_CARGO_BALANCE)
+    return {**fleet, "admiral": admiral}
+
+
+def is_depart_message(payload: List[int]) -> bool:
+    """Whether an L2Admiral message to L1 is a ship departing: [version, ship index, cargo low, cargo high]."""
+    return len(payload) == 4 and payload[0] == MESSAGE_VERSION
+
+
+def starkgate_withdrawal_payload(recipient: int, amount: int) -> List[int]:
+    """The message a Starkgate sends to L1 when `amount` is withdrawn to `recipient`."""
+    return [TRANSFER_FROM_STARKNET, recipient, amount & (UINT256_PART_SIZE - 1), amount >> UINT256_PART_SIZE_BITS]
+
+
+@dataclass
+class LayerCost:
+    layer: str  # "l1" or "l2"
+    name: str
+    # Gas used on L1, Cairo steps on L2
+    cost: int
+
+
+class CrossLayerSimulator:
+    """
+    L1Admiral wired to an L2Admiral. L2 transactions and L1 calls go through `l2()` and `l1()`, which
+    record their cost and relay the messages they send to the other layer.
+
+    The L2 Starkgate mock only records what is withdrawn, so the simulator also plays the Starkgate:
+    every ship departing adds the matching token withdrawal message on L1, and every deposit of loot
+    to the L1 output Starkgate is minted to the L2Admiral before the return message reaches it.
+    """
+
+    def __init__(self, starknet, fleet: dict, w3: Web3, l1_contracts: Dict[str, object]):
+        self.starknet = starknet
+        self.fleet = fleet
+        self.w3 = w3
+        self.l1_keeper = w3.eth.accounts[0]
+        self.l1_contracts = l1_contracts
+        self.l1_admiral = l1_contracts["admiral"]
+        self.costs: List[LayerCost] = []
+        self.n_relayed_l2_to_l1_messages = len(starknet.state.l2_to_l1_messages_log)
+        self.loot_bridged = 0
+        # Cargo (without fee) every ship departed with, by ship index
+        self.departed: Dict[int, int] = {}
+
+    @classmethod
+    async def create(cls, starknet, fleet: dict, w3: Optional[Web3] = None) -> "CrossLayerSimulator":
+        """
+        Deploys the L1 side for the given fleet (see conftest.build_base_state) and a fresh L2Admiral
+        pointed at it, the simulator's fleet holds the new admiral.
+        """
+        w3 = w3 or connect_l1()
+        keeper = w3.eth.accounts[0]
+
+        def deploy(path, *args):
+            artifact = load_artifact(path)
+            factory = w3.eth.contract(abi=artifact["abi"], bytecode=artifact["bytecode"])
+            receipt = w3.eth.wait_for_transaction_receipt(factory.constructor(*args).transact({"from": keeper}))
+            return w3.eth.contract(address=receipt.contractAddress, abi=artifact["abi"])
+
+        def transact(fn):
+            w3.eth.wait_for_transaction_receipt(fn.transact({"from": keeper}))
+
+        fleet = await deploy_l2_admiral(starknet, fleet)
+        admiral = fleet["admiral"]
+        input_token = deploy("tokens/erc20/MockERC20.sol", "Input Token", "IN", 18)
+        output_token = deploy("tokens/erc20/MockERC20.sol", "Output Token", "OUT", 18)
+        defi = deploy("defi-mock/MockDeFiContract.sol", input_token.address, output_token.address)
+        core = deploy("starknet/MockStarknetCore.sol")
+        input_gate = deploy("starknet/MockERC20Starkgate.sol", core.address,
+                            fleet["starkgate"].contract_address, input_token.address)
+        output_gate = deploy("starknet/MockERC20Starkgate.sol", core.address,
+                             fleet["starkgate"].contract_address, output_token.address)
+        l1_admiral = deploy("L1Admiral.sol", core.address, admiral.contract_address, input_gate.address,
+                            output_gate.address, input_token.address, output_token.address, defi.address,
+                            DEFI_DEPOSIT_SIGHASH)
+
+        transact(input_token.functions.mint(defi.address, L1_LIQUIDITY))
+        transact(output_token.functions.mint(defi.address, L1_LIQUIDITY))
+        transact(input_token.functions.mint(input_gate.address, L1_LIQUIDITY))
+
+        await fleet["l2_keeper"].send_transaction(admiral.contract_address, 'set_l1_conductor_address',
+                                                  calldata=[int(l1_admiral.address, 16)])
+
+        return cls(starknet, fleet, w3, {
+            "admiral": l1_admiral,
+            "core": core,
+            "input_token": input_token,
+            "output_token": output_token,
+            "input_gate": input_gate,
+            "output_gate": output_gate,
+            "defi": defi,
+        })
+
+    async def l2(self, account, selector_name: str, calldata: List[int]):
+        """Sends an L2 transaction from `account` and relays the messages it sends to L1."""
+        res = await account.send_transaction(self.fleet["admiral"].contract_address, selector_name, calldata)
+        self.costs.append(LayerCost("l2", selector_name, res.call_info.execution_resources.n_steps))
+        await self.flush()
+        return res
+
+    async def l1(self, function_name: str, *args):
+        """Calls an L1Admiral function from the L1 keeper and relays the messages it sends to L2."""
+        fn = getattr(self.l1_admiral.functions, function_name)(*args)
+        receipt = self.w3.eth.wait_for_transaction_receipt(fn.transact({"from": self.l1_keeper}))
+        self.costs.append(LayerCost("l1", function_name, receipt.gasUsed))
+        await self._relay_l1_to_l2(receipt)
+        await self.flush()
+        return receipt
+
+    async def flush(self):
+        """Relays the messages L2 sent to L1 since the last flush."""
+        log = self.starknet.state.l2_to_l1_messages_log
+        core = self.l1_contracts["core"]
+        l1_admiral_address = int(self.l1_admiral.address, 16)
+        l2_starkgate_address = self.fleet["starkgate"].contract_address
+
+        for message in log[self.n_relayed_l2_to_l1_messages:]:
+            self._transact(core.functions.addL2ToL1Message(message.from_address, message.to_address,
+                                                           message.payload))
+            self.starknet.consume_message_from_l2(message.from_address, message.to_address, message.payload)
+
+            if message.to_address == l1_admiral_address and is_depart_message(message.payload):
+                amount = message.payload[2] + (message.payload[3] << UINT256_PART_SIZE_BITS)
+                self.departed[message.payload[1]] = amount
+                withdrawal = starkgate_withdrawal_payload(l1_admiral_address, amount)
+                self._transact(core.functions.addL2ToL1Message(
+                    l2_starkgate_address, int(self.l1_contracts["input_gate"].address, 16), withdrawal))
+
+        self.n_relayed_l2_to_l1_messages = len(log)
+
+    async def _relay_l1_to_l2(self, receipt):
+        await self._bridge_loot()
+
+        core = self.l1_contracts["core"]
+        for event in core.events.LogMessageToL2().processReceipt(receipt, errors=DISCARD):
+            if event.address != core.address:
+                continue
+            res = await self.starknet.send_message_to_l2(
+                from_address=int(event.args.fromAddress, 16),
+                to_address=event.args.toAddress,
+                selector=event.args.selector,
+                payload=list(event.args.payload),
+            )
+            self.costs.append(LayerCost("l2", "l1_handler", res.call_info.execution_resources.n_steps))
+
+    async def _bridge_loot(self):
+        # What L1Admiral deposited to the output Starkgate shows up as loot on L2
+        output_token = self.l1_contracts["output_token"]
+        deposited = output_token.functions.balanceOf(self.l1_contracts["output_gate"].address).call()
+        if deposited > self.loot_bridged:
+            await self.fleet["l2_keeper"].mint(self.fleet["loot_token"], self.fleet["admiral"],
+                                               deposited - self.loot_bridged)
+            self.loot_bridged = deposited
+
+    def _transact(self, fn):
+        return self.w3.eth.wait_for_transaction_receipt(fn.transact({"from": self.l1_keeper}))
+
+    def total(self, layer: str) -> int:
+        return sum(c.cost for c in self.costs if c.layer == layer)
+
+    def summary(self) -> Dict[str, dict]:
+        """Calls and total cost per layer and entry point."""
+        summary = {}
+        for c in self.costs:
+            entry = summary.setdefault(f"{c.layer}:{c.name}", {"calls": 0, "cost": 0})
+            entry["calls"] += 1
+            entry["cost"] += c.cost
+        return summary
+
+    async def round_trip(self, deposits: Dict[object, int]) -> int:
+        """
+        Takes the open ship around: `deposits` (account -> amount) board it, the keeper departs it,
+        L1Admiral executes the ride and the keeper unloads the ship once it returned.
+        Returns the ship index.
+        """
+        ship_idx = (await self.fleet["admiral"].get_open_ship_status().call()).result.ship_idx
+        for account, amount in deposits.items():
+            await self.l2(account, 'deposit', [*uint(amount)])
+        await self.l2(self.fleet["l2_keeper"], 'depart', [ship_idx])
+        await self.l1("executeShipRides", [ship_idx], [self.departed[ship_idx]])
+        await self.l2(self.fleet["l2_keeper"], 'unload_ship', [ship_idx])
+        return ship_idx
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=3, help="at most the users of the base state")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--deposit", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    with set_class_hash_cache(class_hash_cache):
+        base_state = await build_base_state()
+        starknet = snapshot(base_state["starknet"])
+        fleet = bind_handles(base_state, starknet)
+        simulator = await CrossLayerSimulator.create(starknet, fleet)
+        for _ in range(args.rounds):
+            await simulator.round_trip({user: args.deposit for user in fleet["users"][:args.users]})
+
+    for name, entry in sorted(simulator.summary().items()):
+        print(f"{name:<30} {entry['calls']:>5} calls  {entry['cost']:>12}")
+    print(f"{args.rounds} round trips: {simulator.total('l1')} L1 gas, {simulator.total('l2')} L2 steps")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
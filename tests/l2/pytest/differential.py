@@ -0,0 +1,304 @@
+"""
+Differential testing of L2Admiral against the FleetModel reference model.
+
+Runs randomized operation sequences on the contract and on the model side by side. After every
+operation both have to agree on whether it reverted, and on the whole fleet: indexes, every ship
+with its crew, the cargo of every account and the loot it was paid or is owed:
+
+    python tests/l2/pytest/differential.py --sequences 5 --ops 50 --seed 1
+
+With --model-only the operations are generated up front and replayed on the model alone, to see
+how fast it simulates a fleet:
+
+    python tests/l2/pytest/differential.py --model-only --ops 1000000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+from starkware.starknet.core.os.class_hash import set_class_hash_cache
+from starkware.starkware_utils.error_handling import StarkException
+
+from conftest import L1_CONTRACT_ADDRESS, USER_CARGO_BALANCE, build_base_state
+from contract_cache import class_hash_cache
+from fleet_model import AT_SEA, RETURNED, SEALED, FleetModel, FleetModelError
+from l1_messages import (L1_HANDLER_SELECTOR, L1_INDEXED_HANDLER_SELECTOR, build_l1_indexed_message_handler_payload,
+                         build_l1_message_handler_payload)
+from open_zeppelin.utils import from_uint, uint
+from snapshot import bind_handles, snapshot
+
+MAX_DEPOSIT = 300
+SHIPS_TO_PICK_FROM = 8
+
+
+@dataclass
+class Operation:
+    name: str
+    # Index in the users of the fleet of the account sending it, None for the keeper
+    sender: Optional[int]
+    args: Tuple = ()
+
+    def __str__(self):
+        sender = "keeper" if self.sender is None else f"user{self.sender}"
+        return f"{sender}.{self.name}{self.args}"
+
+
+class Divergence(AssertionError):
+    pass
+
+
+@dataclass
+class OperationGenerator:
+    """
+    Random operations that mostly make sense for the fleet as the model has it (departing the
+    open ship, returning ships at sea with their cargo), with some that should revert mixed in.
+    """
+    rng: random.Random
+    users: List[int]
+    # Cargo token every user holds, deposits stay within it
+    balance: int = USER_CARGO_BALANCE
+    deposited: List[int] = field(init=False)
+
+    def __post_init__(self):
+        self.deposited = [0] * len(self.users)
+
+    def next(self, model: FleetModel) -> Operation:
+        rng = self.rng
+        # Only the oldest few ships of each status are picked from, long runs pile up sealed ships
+        at_sea, returned, sealed = (model.ships_by_status[status][:SHIPS_TO_PICK_FROM]
+                                    for status in (AT_SEA, RETURNED, SEALED))
+        user = rng.randrange(len(self.users))
+
+        roll = rng.random()
+        if roll < 0.35:
+            amount = min(rng.randint(0 if rng.random() < 0.05 else 1, MAX_DEPOSIT),
+                         self.balance - self.deposited[user])
+            if amount > 0:
+                self.deposited[user] += amount
+            return Operation("deposit", user, (amount,))
+        if roll < 0.5:
+            ship_idx = rng.choice(sealed + [model.open_ship_idx] * 3 + [model.open_ship_idx - 1])
+            return Operation("depart", None if rng.random() < 0.7 else user, (ship_idx,))
+        if roll < 0.6 and at_sea:
+            ships = rng.sample(at_sea, rng.randint(1, min(3, len(at_sea))))
+            cargo = [model.ship_cargo[i] + (1 if rng.random() < 0.05 else 0) for i in ships]
+            loot = rng.randint(0, 2 * (sum(cargo) + 1))
+            if rng.random() < 0.2:
+                return Operation("return_ships_by_amount", None, (cargo, loot))
+            return Operation("return_ships", None, (ships, cargo, loot))
+        if roll < 0.7:
+            ship_idx = rng.choice(returned + at_sea + [model.open_ship_idx, rng.randint(1, model.open_ship_idx)])
+            return Operation("unload_ship", None, (ship_idx,))
+        if roll < 0.78:
+            ships = rng.sample(returned, rng.randint(0, len(returned))) if returned else []
+            name = "unload_ships_to_ledger" if rng.random() < 0.4 else "unload_ships"
+            return Operation(name, None, (ships, rng.randint(0 if rng.random() < 0.05 else 1, 6)))
+        if roll < 0.86:
+            ship_idx = rng.choice(returned + [model.open_ship_idx])
+            if rng.random() < 0.5:
+                return Operation("collect_loot", user, (ship_idx,))
+            accounts = [self.users[rng.randrange(len(self.users))] for _ in range(rng.randint(1, 4))]
+            return Operation("collect_loot_for", None, (ship_idx, accounts))
+        if roll < 0.92:
+            if rng.random() < 0.5:
+                return Operation("withdraw_loot", user)
+            return Operation("withdraw_loot_for", None, (rng.sample(self.users, rng.randint(1, len(self.users))),))
+
+        setting = rng.choice(["set_max_crew_size", "set_price_per_ship", "set_auto_depart_cargo",
+                              "set_unload_batch_size", "set_max_fleet_size"])
+        value = {
+            "set_max_crew_size": lambda: rng.choice([0, 0, 1, 2, 3]),
+            "set_price_per_ship": lambda: rng.choice([0, 0, 5, 50]),
+            "set_auto_depart_cargo": lambda: rng.choice([0, 0, 300, 600]),
+            "set_unload_batch_size": lambda: rng.choice([1, 2, 5]),
+            "set_max_fleet_size": lambda: rng.choice([2, 20]),
+        }[setting]()
+        return Operation(setting, None, (value,))
+
+
+def model_call(model: FleetModel, keeper: int, users: List[int], op: Operation) -> Tuple[Callable, Tuple]:
+    """The model method running the operation and its arguments."""
+    sender = keeper if op.sender is None else users[op.sender]
+    name, args = op.name, op.args
+    if name in ("deposit", "depart", "collect_loot", "withdraw_loot"):
+        return getattr(model, name), (sender, *args)
+    if name in ("unload_ships", "unload_ships_to_ledger"):
+        return model.unload_ships, (*args, name == "unload_ships_to_ledger")
+    if name.startswith("set_"):
+        return setattr, (model, name[len("set_"):], args[0])
+    return getattr(model, name), args
+
+
+def apply_to_model(model: FleetModel, keeper: int, users: List[int], op: Operation):
+    """Runs the operation on the model, raises FleetModelError where the contract reverts."""
+    fn, args = model_call(model, keeper, users, op)
+    return fn(*args)
+
+
+async def apply_to_contract(starknet, fleet: dict, op: Operation):
+    """Runs the operation on L2Admiral, raises StarkException when it reverts."""
+    admiral, keeper = fleet["admiral"], fleet["l2_keeper"]
+    sender = keeper if op.sender is None else fleet["users"][op.sender]
+    name, args = op.name, op.args
+
+    if name in ("return_ships", "return_ships_by_amount"):
+        loot = args[-1]
+        await keeper.mint(fleet["loot_token"], admiral, loot)
+        if name == "return_ships":
+            selector, payload = L1_INDEXED_HANDLER_SELECTOR, build_l1_indexed_message_handler_payload(*args)
+        else:
+            selector, payload = L1_HANDLER_SELECTOR, build_l1_message_handler_payload(*args)
+        return await starknet.send_message_to_l2(L1_CONTRACT_ADDRESS, admiral.contract_address, selector, payload)
+
+    calldata = {
+        "deposit": lambda: [*uint(args[0])],
+        "unload_ships": lambda: [len(args[0]), *args[0], args[1]],
+        "unload_ships_to_ledger": lambda: [len(args[0]), *args[0], args[1]],
+        "collect_loot_for": lambda: [args[0], len(args[1]), *args[1]],
+        "withdraw_loot_for": lambda: [len(args[0]), *args[0]],
+        "set_price_per_ship": lambda: [*uint(args[0])],
+        "set_auto_depart_cargo": lambda: [*uint(args[0])],
+    }.get(name, lambda: list(args))()
+    return await sender.send_transaction(admiral.contract_address, name, calldata)
+
+
+async def compare(model: FleetModel, fleet: dict, balances_before: dict):
+    """Raises Divergence when the state of L2Admiral is not the state of the model."""
+    admiral = fleet["admiral"]
+
+    def check(what, contract, expected):
+        if contract != expected:
+            raise Divergence(f"{what}: contract has {contract}, model has {expected}")
+
+    check("open ship", (await admiral.get_open_ship_status().call()).result.ship_idx, model.open_ship_idx)
+    check("oldest active ship", (await admiral.get_oldest_active_ship_idx().call()).result.ship_idx,
+          model.oldest_active_ship_idx)
+    check("fleet size", (await admiral.get_fleet_size().call()).result.count, model.fleet_size())
+
+    for ship_idx in range(1, model.open_ship_idx + 1):
+        res = (await admiral.get_ship_status(ship_idx).call()).result
+        check(f"ship {ship_idx}", (from_uint(res.ship_cargo), from_uint(res.fee_taken), res.status,
+                                   [(c.account, from_uint(c.cargo)) for c in res.crew]), model.ship_status(ship_idx))
+
+    accounts = [user.contract_address for user in fleet["users"]]
+    for account in accounts:
+        res = (await admiral.get_balances(account).call()).result
+        check(f"cargo of {account:#x}", [(c.ship_idx, from_uint(c.amount)) for c in res.cargo], model.balances(account))
+        check(f"loot of {account:#x}", from_uint(res.loot_token_balance) - balances_before[account],
+              model.loot_paid.get(account, 0))
+        owed = (await admiral.get_loot_owed(account).call()).result.loot
+        check(f"loot owed to {account:#x}", from_uint(owed), model.loot_owed.get(account, 0))
+
+    keeper = fleet["l2_keeper"].contract_address
+    res = (await fleet["cargo_token"].balanceOf(keeper).call()).result
+    check("keeper fees", from_uint(res.balance) - balances_before["keeper"], model.keeper_fees)
+
+
+async def run_sequence(starknet, fleet: dict, ops: int, seed: int, compare_every: int = 1) -> List[Operation]:
+    """
+    Runs `ops` random operations on the contract and the model. Whether an operation reverted is
+    compared after every one, the whole state after every `compare_every` and after the last one.
+    Returns the operations, raises Divergence with the operations that led to it otherwise.
+    """
+    keeper = fleet["l2_keeper"].contract_address
+    users = [user.contract_address for user in fleet["users"]]
+    model = FleetModel(keeper)
+    generator = OperationGenerator(random.Random(seed), users)
+
+    balances_before = {account: from_uint((await fleet["loot_token"].balanceOf(account).call()).result.balance)
+                       for account in users}
+    balances_before["keeper"] = from_uint((await fleet["cargo_token"].balanceOf(keeper).call()).result.balance)
+
+    history = []
+    for i in range(ops):
+        op = generator.next(model)
+        history.append(op)
+
+        model_error = contract_error = None
+        try:
+            apply_to_model(model, keeper, users, op)
+        except FleetModelError as e:
+            model_error = e
+        try:
+            await apply_to_contract(starknet, fleet, op)
+        except StarkException as e:
+            contract_error = e
+
+        try:
+            if (model_error is None) != (contract_error is None):
+                raise Divergence(f"model {'reverted: ' + str(model_error) if model_error else 'succeeded'}, "
+                                 f"contract {'reverted' if contract_error else 'succeeded'}")
+            if (i + 1) % compare_every == 0 or i + 1 == ops:
+                await compare(model, fleet, balances_before)
+        except Divergence as e:
+            steps = "\n".join(f"  {i:>4} {op}" for i, op in enumerate(history))
+            raise Divergence(f"{e}\nafter (seed {seed}):\n{steps}") from contract_error
+
+    return history
+
+
+def generate_operations(ops: int, seed: int, accounts: List[int]) -> List[Operation]:
+    """`ops` random operations, generated against a model of their own that runs them as they come."""
+    model = FleetModel(0)
+    generator = OperationGenerator(random.Random(seed), accounts, balance=2**100)
+    history = []
+    for _ in range(ops):
+        op = generator.next(model)
+        history.append(op)
+        try:
+            apply_to_model(model, 0, accounts, op)
+        except FleetModelError:
+            pass
+    return history
+
+
+def run_model(ops: int, seed: int, users: int = 100) -> Tuple[float, float]:
+    """
+    Runs `ops` random operations on the model alone. The operations are generated and bound to a
+    fresh model before the timer starts, so the second rate is the model alone. Returns the
+    operations generated per second (generating runs the model too) and the operations the model
+    runs per second.
+    """
+    accounts = list(range(1, users + 1))
+    start = time.perf_counter()
+    operations = generate_operations(ops, seed, accounts)
+    generated = ops / (time.perf_counter() - start)
+
+    model = FleetModel(0)
+    calls = [model_call(model, 0, accounts, op) for op in operations]
+    start = time.perf_counter()
+    for fn, args in calls:
+        try:
+            fn(*args)
+        except FleetModelError:
+            pass
+    return generated, ops / (time.perf_counter() - start)
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sequences", type=int, default=3)
+    parser.add_argument("--ops", type=int, default=50, help="operations per sequence")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model-only", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.model_only:
+        generated, modelled = run_model(args.ops, args.seed)
+        print(f"generator: {generated:,.0f} operations per second\nmodel: {modelled:,.0f} operations per second")
+        return
+
+    with set_class_hash_cache(class_hash_cache):
+        base_state = await build_base_state()
+        for seed in range(args.seed, args.seed + args.sequences):
+            starknet = snapshot(base_state["starknet"])
+            await run_sequence(starknet, bind_handles(base_state, starknet), args.ops, seed)
+            print(f"seed {seed}: {args.ops} operations, contract and model agree")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
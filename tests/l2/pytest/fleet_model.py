@@ -0,0 +1,396 @@
+"""
+In-memory reference model of FleetManager.cairo and the L2Admiral entry points built on it.
+
+Follows the contract operation for operation (crew swap-removal, unload order from the last crew
+member, oldest/open indexes, fee re-application on return and the rounded down payout of
+_loot_payout) without signing, hashing or running Cairo, so fleets can be simulated at scale and
+the contract checked against it, see differential.py. Failing operations raise FleetModelError
+where the contract reverts, and leave the model unchanged like a reverted transaction would.
+
+Amounts are plain ints, cargo and loot are assumed to stay below 2**128 so that no Uint256
+arithmetic overflows.
+"""
+
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+FINALISED = 0
+OPEN = 1
+AT_SEA = 2
+RETURNED = 3
+SEALED = 4
+
+
+class FleetModelError(Exception):
+    pass
+
+
+class FleetModel:
+    """
+    L2Admiral with the default settings of its constructor. `loot_paid` holds the loot token
+    transferred to every account, `loot_owed` what unload_ships_to_ledger credited and
+    `keeper_fees` the cargo token paid to the keeper on departure.
+
+    Ships are stored as parallel lists indexed by ship index, ship_crew[i] and ship_crew_cargo[i]
+    hold the crew of ship i in crew index order. Returned ships carry the PayoutCtx of the return
+    in ship_payout (ship cargo, cargo and loot of all the ships returned with it). `account_ships`
+    maps every account to the ships it has cargo on, in the order it joined them (newest last),
+    and to its crew index on each. `ships_by_status[status]` is the sorted list of the ships with
+    the status that are not finalised, so finding the ships at sea or returned does not scan the
+    whole fleet.
+    """
+    __slots__ = ("keeper", "ship_cargo", "ship_fee_taken", "ship_statuses", "ship_crew", "ship_crew_cargo",
+                 "ship_payout", "ships_by_status", "open_ship_idx", "oldest_active_ship_idx", "ships_at_sea",
+                 "min_deposit",
+                 "max_fleet_size", "max_crew_size", "auto_depart_cargo", "price_per_ship", "unload_batch_size",
+                 "account_ships", "loot_paid", "loot_owed", "keeper_fees")
+
+    def __init__(self, keeper: int):
+        self.keeper = keeper
+        # Index 0 is never used, ships start at 1
+        self.ship_cargo: List[int] = [0, 0]
+        self.ship_fee_taken: List[int] = [0, 0]
+        self.ship_statuses: List[int] = [FINALISED, OPEN]
+        self.ship_crew: List[List[int]] = [[], []]
+        self.ship_crew_cargo: List[List[int]] = [[], []]
+        self.ship_payout: List[Optional[Tuple[int, int, int]]] = [None, None]
+        # Indexed by status, FINALISED ships are not kept
+        self.ships_by_status: List[List[int]] = [[], [1], [], [], []]
+        self.open_ship_idx = 1
+        self.oldest_active_ship_idx = 1
+        self.ships_at_sea = 0
+
+        self.min_deposit = 0
+        self.max_fleet_size = 20
+        self.max_crew_size = 0
+        self.auto_depart_cargo = 0
+        self.price_per_ship = 0
+        self.unload_batch_size = 5
+
+        self.account_ships: Dict[int, Dict[int, int]] = {}
+        self.loot_paid: Dict[int, int] = {}
+        self.loot_owed: Dict[int, int] = {}
+        self.keeper_fees = 0
+
+    # Views
+
+    def status(self, idx: int) -> int:
+        """Status of the ship, FINALISED past the open one like unwritten storage."""
+        return self.ship_statuses[idx] if 0 < idx < len(self.ship_statuses) else FINALISED
+
+    def ship_status(self, idx: int) -> Tuple[int, int, int, List[Tuple[int, int]]]:
+        """(cargo, fee_taken, status, [(account, cargo)...]) as returned by get_ship_status."""
+        if not 0 < idx < len(self.ship_statuses):
+            return 0, 0, FINALISED, []
+        return (self.ship_cargo[idx], self.ship_fee_taken[idx], self.ship_statuses[idx],
+                list(zip(self.ship_crew[idx], self.ship_crew_cargo[idx])))
+
+    def crew_idx(self, account: int, ship_idx: int) -> Optional[int]:
+        """Crew index of the account on the ship, None when it is not on it."""
+        ships = self.account_ships.get(account)
+        return None if ships is None else ships.get(ship_idx)
+
+    def balances(self, account: int) -> List[Tuple[int, int]]:
+        """(ship_idx, cargo) of the account on every ship, newest first like get_balances."""
+        ships = self.account_ships.get(account, {})
+        return [(idx, self.ship_crew_cargo[idx][ships[idx]]) for idx in reversed(ships)]
+
+    def fleet_size(self) -> int:
+        return self.ships_at_sea
+
+    def ships_with_status(self, status: int) -> List[int]:
+        """Indexes of the ships with the status (not FINALISED), oldest first."""
+        return list(self.ships_by_status[status])
+
+    def _set_status(self, idx: int, status: int):
+        current = self.ship_statuses[idx]
+        if current != FINALISED:
+            ships = self.ships_by_status[current]
+            del ships[bisect_left(ships, idx)]
+        if status != FINALISED:
+            insort(self.ships_by_status[status], idx)
+        self.ship_statuses[idx] = status
+
+    # Deposits and departures
+
+    def deposit(self, account: int, amount: int) -> int:
+        if amount < self.min_deposit:
+            raise FleetModelError(f"Deposit amount must be >= {self.min_deposit}")
+        if amount <= 0:
+            raise FleetModelError("Deposit must be > 0")
+
+        ship_idx = self.open_ship_idx
+        ships = self.account_ships.get(account)
+        idx = None if ships is None else ships.get(ship_idx)
+        if idx is None and self.max_crew_size != 0 and len(self.ship_crew[ship_idx]) >= self.max_crew_size:
+            self._set_status(ship_idx, SEALED)
+            ship_idx = self._open_next_ship()
+
+        self.ship_cargo[ship_idx] += amount
+        if idx is None:
+            crew = self.ship_crew[ship_idx]
+            if ships is None:
+                ships = self.account_ships[account] = {}
+            ships[ship_idx] = len(crew)
+            crew.append(account)
+            self.ship_crew_cargo[ship_idx].append(amount)
+        else:
+            self.ship_crew_cargo[ship_idx][idx] += amount
+
+        self._auto_depart(ship_idx)
+        return ship_idx
+
+    def _auto_depart(self, ship_idx: int):
+        cargo = self.ship_cargo[ship_idx]
+        if self.auto_depart_cargo == 0 or cargo < self.auto_depart_cargo or cargo < self.price_per_ship:
+            return
+        if self.ships_at_sea >= self.max_fleet_size:
+            return
+        self._depart(ship_idx)
+
+    def _open_next_ship(self) -> int:
+        self.open_ship_idx += 1
+        self.ship_cargo.append(0)
+        self.ship_fee_taken.append(0)
+        self.ship_statuses.append(OPEN)
+        self.ship_crew.append([])
+        self.ship_crew_cargo.append([])
+        self.ship_payout.append(None)
+        # Always the newest ship, the list stays sorted
+        self.ships_by_status[OPEN].append(self.open_ship_idx)
+        return self.open_ship_idx
+
+    def depart(self, caller: int, ship_idx: int):
+        if self.ships_at_sea >= self.max_fleet_size:
+            raise FleetModelError("Maximum fleet size exceeded")
+        if caller != self.keeper and self.crew_idx(caller, ship_idx) is None:
+            raise FleetModelError("Ships can only be departed by active crew")
+        self._depart(ship_idx)
+
+    def _depart(self, ship_idx: int):
+        status = self.status(ship_idx)
+        if status not in (OPEN, SEALED):
+            raise FleetModelError("Only the open ship or a sealed ship can be departed")
+        fee = self.price_per_ship
+        if self.ship_cargo[ship_idx] < fee:
+            raise FleetModelError("SafeUint256: subtraction overflow")
+
+        if status == OPEN:
+            self._open_next_ship()
+        self.ship_cargo[ship_idx] -= fee
+        self.ship_fee_taken[ship_idx] = fee
+        self._set_status(ship_idx, AT_SEA)
+        self.ships_at_sea += 1
+        self.keeper_fees += fee
+
+    # Returns from L1
+
+    def return_ships(self, ship_indexes: List[int], cargo: List[int], total_loot: int):
+        """process_indexed_msg_from_l1: the ships come back with the cargo they departed with."""
+        if not cargo or len(ship_indexes) != len(cargo):
+            raise FleetModelError("Every returned ship needs an index and a cargo")
+
+        returned = []
+        # The contract checks the last ship first
+        for idx, amount in reversed(list(zip(ship_indexes, cargo))):
+            status = self.status(idx)
+            error = None
+            if status == FINALISED:
+                error = "Ship is finalised or does not exist"
+            elif self.ship_cargo[idx] != amount:
+                error = "Returned cargo does not match the ship"
+            elif status != AT_SEA:
+                error = "Only ships at sea can return"
+            if error:
+                self._undo_returns(returned)
+                raise FleetModelError(error)
+            self._mark_returned(idx)
+            returned.append(idx)
+
+        self._record_payouts(ship_indexes, cargo, total_loot)
+
+    def return_ships_by_amount(self, cargo: List[int], total_loot: int) -> List[int]:
+        """process_msg_from_l1: every amount returns the oldest ship at sea with that cargo."""
+        if not cargo or self.ships_at_sea == 0 or len(cargo) > self.ships_at_sea:
+            raise FleetModelError("Ships to return must be at sea")
+
+        returned = []
+        for amount in reversed(cargo):
+            idx = next((i for i in self.ships_by_status[AT_SEA] if self.ship_cargo[i] == amount), None)
+            if idx is None:
+                self._undo_returns(returned)
+                raise FleetModelError("No ship at sea with that cargo")
+            self._mark_returned(idx)
+            returned.append(idx)
+
+        ship_indexes = returned[::-1]
+        self._record_payouts(ship_indexes, cargo, total_loot)
+        return ship_indexes
+
+    def _mark_returned(self, idx: int):
+        self._set_status(idx, RETURNED)
+        self.ships_at_sea -= 1
+
+    def _undo_returns(self, returned: List[int]):
+        for idx in returned:
+            self._set_status(idx, AT_SEA)
+            self.ships_at_sea += 1
+
+    def _record_payouts(self, ship_indexes: List[int], cargo: List[int], total_loot: int):
+        # The fee every ship paid on departure is added back, the crew deposited it
+        total = sum(amount + self.ship_fee_taken[idx] for idx, amount in zip(ship_indexes, cargo))
+        for idx, amount in zip(ship_indexes, cargo):
+            self.ship_payout[idx] = (amount, total, total_loot)
+
+    # Payouts
+
+    @staticmethod
+    def loot_payout(crew_cargo: int, payout: Tuple[int, int, int]) -> int:
+        """_loot_payout: crew_cargo * all ships loot / all ships cargo, rounded down."""
+        _, all_ships_cargo, all_ships_loot = payout
+        return crew_cargo * all_ships_loot // all_ships_cargo
+
+    def _pay(self, account: int, cargo: int, payout: Tuple[int, int, int], to_ledger: bool):
+        book = self.loot_owed if to_ledger else self.loot_paid
+        book[account] = book.get(account, 0) + self.loot_payout(cargo, payout)
+
+    def _unlink(self, account: int, ship_idx: int):
+        ships = self.account_ships[account]
+        del ships[ship_idx]
+        if not ships:
+            del self.account_ships[account]
+
+    def _disembark(self, ship_idx: int, idx: int) -> int:
+        """Takes crew member `idx` off the ship, its slot goes to the last crew member."""
+        crew = self.ship_crew[ship_idx]
+        crew_cargo = self.ship_crew_cargo[ship_idx]
+        cargo = crew_cargo[idx]
+        last_account = crew.pop()
+        last_cargo = crew_cargo.pop()
+        if idx < len(crew):
+            crew[idx] = last_account
+            crew_cargo[idx] = last_cargo
+            self.account_ships[last_account][ship_idx] = idx
+        return cargo
+
+    @staticmethod
+    def _cargo_left(ship_cargo: int, crew_cargo: int) -> int:
+        """
+        _cargo_left: cargo left on a ship once crew with `crew_cargo` between them leave it. The
+        departure fee came off the ship's cargo but not off the crew's, so it stops at 0.
+        """
+        return max(ship_cargo - crew_cargo, 0)
+
+    def _finalise_batch(self, ship_idx: int, batch_size: int, to_ledger: bool) -> bool:
+        """FleetManager_finalizeBatch: pays out the last `batch_size` crew members, last one first."""
+        crew = self.ship_crew[ship_idx]
+        crew_cargo = self.ship_crew_cargo[ship_idx]
+        finalised = len(crew) <= batch_size
+        if not finalised:
+            self.ship_cargo[ship_idx] = self._cargo_left(self.ship_cargo[ship_idx], sum(crew_cargo[-batch_size:]))
+
+        payout = self.ship_payout[ship_idx]
+        for _ in range(min(batch_size, len(crew))):
+            account = crew.pop()
+            self._pay(account, crew_cargo.pop(), payout, to_ledger)
+            self._unlink(account, ship_idx)
+
+        if finalised:
+            self._finalise(ship_idx)
+        return finalised
+
+    def _finalise(self, ship_idx: int):
+        self.ship_cargo[ship_idx] = self.ship_fee_taken[ship_idx] = 0
+        self.ship_crew[ship_idx].clear()
+        self.ship_crew_cargo[ship_idx].clear()
+        self.ship_payout[ship_idx] = None
+        self._set_status(ship_idx, FINALISED)
+
+    def _advance_oldest_index(self):
+        idx = self.oldest_active_ship_idx
+        while self.ship_statuses[idx] == FINALISED:
+            idx += 1
+        self.oldest_active_ship_idx = idx
+
+    def unload_ship(self, idx: int) -> bool:
+        status = self.status(idx)
+        if status == FINALISED:
+            raise FleetModelError("Ship is finalised or does not exist")
+        if status != RETURNED:
+            return False
+
+        if self._finalise_batch(idx, self.unload_batch_size, False):
+            self._advance_oldest_index()
+        return True
+
+    def unload_ships(self, ship_indexes: List[int], crew_budget: int,
+                     to_ledger: bool = False) -> List[Tuple[int, int, int]]:
+        """unload_ships (or unload_ships_to_ledger), returns (ship_idx, crew_unloaded, crew_remaining) per ship."""
+        if crew_budget <= 0:
+            raise FleetModelError("Crew budget must be > 0")
+
+        # Plan every batch first, a batch that fails reverts the whole transaction. A ship can be
+        # listed more than once, the crew left after the batches planned before count then.
+        plan = []
+        crew_left = {}
+        budget = crew_budget
+        # Without indexes the returned ships are unloaded oldest first, the others are skipped anyway
+        for idx in ship_indexes or self.ships_with_status(RETURNED):
+            if budget == 0:
+                break
+            if self.status(idx) != RETURNED:
+                continue
+            crew = crew_left.get(idx, len(self.ship_crew[idx]))
+            if crew is None:
+                continue
+            unloaded = min(crew, budget)
+            crew_left[idx] = crew - unloaded if unloaded < crew else None
+            plan.append((idx, unloaded, crew - unloaded))
+            budget -= unloaded
+
+        for idx, unloaded, _ in plan:
+            self._finalise_batch(idx, unloaded, to_ledger)
+        self._advance_oldest_index()
+        return plan
+
+    def _collect_loot(self, account: int, ship_idx: int) -> bool:
+        if self.status(ship_idx) != RETURNED:
+            return False
+        idx = self.crew_idx(account, ship_idx)
+        if idx is None:
+            return False
+
+        cargo = self._disembark(ship_idx, idx)
+        self._unlink(account, ship_idx)
+        self.ship_cargo[ship_idx] = self._cargo_left(self.ship_cargo[ship_idx], cargo)
+        self._pay(account, cargo, self.ship_payout[ship_idx], False)
+        if not self.ship_crew[ship_idx]:
+            self._finalise(ship_idx)
+            self._advance_oldest_index()
+        return True
+
+    def collect_loot(self, account: int, ship_idx: int):
+        status = self.status(ship_idx)
+        if status == FINALISED:
+            raise FleetModelError("Ship is finalised or does not exist")
+        if status != RETURNED:
+            raise FleetModelError("Ship must be in returned status")
+        if not self._collect_loot(account, ship_idx):
+            raise FleetModelError("No loot to collect")
+
+    def collect_loot_for(self, ship_idx: int, accounts: List[int]) -> int:
+        return sum(self._collect_loot(account, ship_idx) for account in accounts)
+
+    def withdraw_loot(self, account: int):
+        if not self._withdraw_loot(account):
+            raise FleetModelError("No loot to withdraw")
+
+    def withdraw_loot_for(self, accounts: List[int]) -> int:
+        return sum(map(self._withdraw_loot, accounts))
+
+    def _withdraw_loot(self, account: int) -> bool:
+        loot = self.loot_owed.pop(account, 0)
+        if loot == 0:
+            return False
+        self.loot_paid[account] = self.loot_paid.get(account, 0) + loot
+        return True
@@ -0,0 +1,320 @@
+"""
+Event-sourced index of L2Admiral in SQLite.
+
+Frontends rebuild the fleet with get_fleet, get_balances and get_ship_status, and every one of
+those calls walks the contract storage again. The indexer instead replays the events L2Admiral
+emits (ev_deposited, ev_departed, ev_l1_message_received, ev_returned, ev_unloaded,
+ev_loot_collected and ev_finalised) into tables of ships, crews and account positions, which
+answer the same questions with an indexed lookup:
+
+    python tests/l2/pytest/indexer.py --db fleet.db --users 10 --rounds 5
+
+Events are read from the events log of the Starknet testing state. How far into the log the index
+got is checkpointed in the same SQLite transaction as the rows the events produced, so a sync that
+fails leaves the index at the last checkpoint and an indexer opened on the same database resumes
+from there.
+
+Crew are kept in crew index order like FleetManager keeps them, which tells which crew an unload
+batch paid out (the last ones) and who takes the slot of a crew member collecting their loot (the
+last one). Amounts and accounts are stored as text, they do not fit SQLite's 64 bit integers.
+"""
+
+import argparse
+import asyncio
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+
+from starkware.starknet.core.os.class_hash import set_class_hash_cache
+from starkware.starknet.public.abi import get_selector_from_name
+
+from benchmark import Recorder, Workload, run_workload
+from conftest import ShipStatus, build_base_state
+from contract_cache import class_hash_cache
+from snapshot import bind_handles, snapshot
+
+FINALISED = ShipStatus.FINALISED.value
+OPEN = ShipStatus.OPEN.value
+AT_SEA = ShipStatus.AT_SEA.value
+RETURNED = ShipStatus.RETURNED.value
+SEALED = ShipStatus.SEALED.value
+
+EVENTS = ["ev_deposited", "ev_departed", "ev_l1_message_received", "ev_returned", "ev_unloaded", "ev_loot_collected",
+          "ev_finalised"]
+EVENT_SELECTORS = {get_selector_from_name(name): name for name in EVENTS}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoint (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    -- Events of the log consumed so far
+    events INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ships (
+    idx INTEGER PRIMARY KEY,
+    status INTEGER NOT NULL,
+    cargo TEXT NOT NULL,
+    fee_taken TEXT NOT NULL,
+    crew INTEGER NOT NULL,
+    return_id INTEGER REFERENCES returns (id)
+);
+CREATE INDEX IF NOT EXISTS ships_by_status ON ships (status, idx);
+CREATE TABLE IF NOT EXISTS crew (
+    ship_idx INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    account TEXT NOT NULL,
+    cargo TEXT NOT NULL,
+    PRIMARY KEY (ship_idx, position)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS crew_by_account ON crew (account, ship_idx);
+CREATE TABLE IF NOT EXISTS returns (
+    id INTEGER PRIMARY KEY,
+    from_address TEXT NOT NULL,
+    total_loot TEXT NOT NULL,
+    -- Cargo of all the ships returned together, with their fees, what the loot is split over
+    all_ships_cargo TEXT NOT NULL,
+    gas_used TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS accounts (
+    account TEXT PRIMARY KEY,
+    deposited TEXT NOT NULL,
+    -- Loot the account was paid out or credited, see _loot_payout
+    loot TEXT NOT NULL
+);
+"""
+
+
+def _uint(data: List[int], i: int) -> int:
+    return data[i] + (data[i + 1] << 128)
+
+
+def _account(address: int) -> str:
+    return hex(address)
+
+
+class Indexer:
+    """
+    SQLite index of one L2Admiral. `sync()` indexes the events added to the log since the last
+    checkpoint, the query methods return what the matching views of L2Admiral return.
+    """
+
+    def __init__(self, db_path: str, admiral_address: int):
+        self.db = sqlite3.connect(db_path)
+        self.admiral_address = admiral_address
+        # Id of the return the ev_returned events that follow an ev_l1_message_received belong to
+        self.return_id: Optional[int] = None
+        with self.db:
+            self.db.executescript(SCHEMA)
+            self.db.execute("INSERT OR IGNORE INTO checkpoint (id, events) VALUES (0, 0)")
+            # Ships start at 1, open from the start
+            self.db.execute("INSERT OR IGNORE INTO ships VALUES (1, ?, '0', '0', 0, NULL)", (OPEN,))
+
+    def close(self):
+        self.db.close()
+
+    @property
+    def checkpoint(self) -> int:
+        return self.db.execute("SELECT events FROM checkpoint").fetchone()[0]
+
+    def sync(self, events) -> int:
+        """
+        Indexes the events past the checkpoint, `events` being the whole events log (e.g.
+        starknet.state.events). Returns the number of L2Admiral events indexed.
+        """
+        start = self.checkpoint
+        indexed = 0
+        with self.db:
+            for event in events[start:]:
+                name = EVENT_SELECTORS.get(event.keys[0]) if event.keys else None
+                if event.from_address != self.admiral_address or name is None:
+                    continue
+                getattr(self, f"_on_{name[len('ev_'):]}")(event.data)
+                indexed += 1
+            self.db.execute("UPDATE checkpoint SET events = ?", (len(events),))
+        return indexed
+
+    # Event handlers
+
+    def _on_deposited(self, data: List[int]):
+        account, amount, ship_idx = _account(data[0]), _uint(data, 1), data[3]
+
+        # A deposit into a new ship means the open ship was sealed
+        self.db.execute("UPDATE ships SET status = ? WHERE status = ? AND idx < ?", (SEALED, OPEN, ship_idx))
+        self.db.execute("INSERT OR IGNORE INTO ships VALUES (?, ?, '0', '0', 0, NULL)", (ship_idx, OPEN))
+        ship = self._ship_row(ship_idx)
+
+        row = self.db.execute("SELECT position, cargo FROM crew WHERE ship_idx = ? AND account = ?",
+                              (ship_idx, account)).fetchone()
+        if row is None:
+            self.db.execute("INSERT INTO crew VALUES (?, ?, ?, ?)", (ship_idx, ship["crew"], account, str(amount)))
+            self.db.execute("UPDATE ships SET crew = crew + 1 WHERE idx = ?", (ship_idx,))
+        else:
+            self.db.execute("UPDATE crew SET cargo = ? WHERE ship_idx = ? AND position = ?",
+                            (str(int(row[1]) + amount), ship_idx, row[0]))
+        self._set_cargo(ship_idx, ship["cargo"] + amount)
+
+        deposited, loot = self._account_row(account)
+        self.db.execute("INSERT OR REPLACE INTO accounts VALUES (?, ?, ?)",
+                        (account, str(deposited + amount), str(loot)))
+
+    def _on_departed(self, data: List[int]):
+        ship_idx, total, fee = data[0], _uint(data, 2), _uint(data, 4)
+        self.db.execute("INSERT OR IGNORE INTO ships VALUES (?, ?, '0', '0', 0, NULL)", (ship_idx, OPEN))
+        if self._ship_row(ship_idx)["status"] == OPEN:
+            self.db.execute("INSERT OR IGNORE INTO ships VALUES (?, ?, '0', '0', 0, NULL)", (ship_idx + 1, OPEN))
+        self.db.execute("UPDATE ships SET status = ?, cargo = ?, fee_taken = ? WHERE idx = ?",
+                        (AT_SEA, str(total - fee), str(fee), ship_idx))
+
+    def _on_l1_message_received(self, data: List[int]):
+        cargo_len = data[1]
+        total_loot = _uint(data, 2 + 2 * cargo_len)
+        gas_used = _uint(data, 4 + 2 * cargo_len)
+        cursor = self.db.execute("INSERT INTO returns (from_address, total_loot, all_ships_cargo, gas_used) "
+                                 "VALUES (?, ?, '0', ?)", (_account(data[0]), str(total_loot), str(gas_used)))
+        self.return_id = cursor.lastrowid
+
+    def _on_returned(self, data: List[int]):
+        ship_idx = data[0]
+        ship = self._ship_row(ship_idx)
+        all_ships_cargo = int(self.db.execute("SELECT all_ships_cargo FROM returns WHERE id = ?",
+                                              (self.return_id,)).fetchone()[0])
+        self.db.execute("UPDATE returns SET all_ships_cargo = ? WHERE id = ?",
+                        (str(all_ships_cargo + ship["cargo"] + ship["fee_taken"]), self.return_id))
+        self.db.execute("UPDATE ships SET status = ?, return_id = ? WHERE idx = ?",
+                        (RETURNED, self.return_id, ship_idx))
+
+    def _on_unloaded(self, data: List[int]):
+        ship_idx, crew_remaining = data
+        ship = self._ship_row(ship_idx)
+        cargo = self._pay_out(ship_idx, ship["return_id"], crew_remaining)
+        self.db.execute("UPDATE ships SET crew = ? WHERE idx = ?", (crew_remaining, ship_idx))
+        # The departure fee came off the ship's cargo but not off the crew's, the ship runs out first
+        self._set_cargo(ship_idx, max(ship["cargo"] - cargo, 0))
+
+    def _on_loot_collected(self, data: List[int]):
+        ship_idx, account = data[0], _account(data[1])
+        ship = self._ship_row(ship_idx)
+        position, cargo = self.db.execute("SELECT position, cargo FROM crew WHERE ship_idx = ? AND account = ?",
+                                          (ship_idx, account)).fetchone()
+        self._pay(account, int(cargo), ship["return_id"])
+
+        # The last crew member takes the slot
+        self.db.execute("DELETE FROM crew WHERE ship_idx = ? AND position = ?", (ship_idx, position))
+        self.db.execute("UPDATE crew SET position = ? WHERE ship_idx = ? AND position = ?",
+                        (position, ship_idx, ship["crew"] - 1))
+        self.db.execute("UPDATE ships SET crew = crew - 1 WHERE idx = ?", (ship_idx,))
+        self._set_cargo(ship_idx, max(ship["cargo"] - int(cargo), 0))
+
+    def _on_finalised(self, data: List[int]):
+        ship_idx = data[0]
+        self._pay_out(ship_idx, self._ship_row(ship_idx)["return_id"], 0)
+        self.db.execute("UPDATE ships SET status = ?, cargo = '0', fee_taken = '0', crew = 0 WHERE idx = ?",
+                        (FINALISED, ship_idx))
+
+    def _pay_out(self, ship_idx: int, return_id: int, crew_remaining: int) -> int:
+        """Pays out the crew from the last one down to `crew_remaining`, returns the cargo they had."""
+        crew = self.db.execute("SELECT account, cargo FROM crew WHERE ship_idx = ? AND position >= ?",
+                               (ship_idx, crew_remaining)).fetchall()
+        for account, cargo in crew:
+            self._pay(account, int(cargo), return_id)
+        self.db.execute("DELETE FROM crew WHERE ship_idx = ? AND position >= ?", (ship_idx, crew_remaining))
+        return sum(int(cargo) for _, cargo in crew)
+
+    def _pay(self, account: str, cargo: int, return_id: int):
+        total_loot, all_ships_cargo = self.db.execute("SELECT total_loot, all_ships_cargo FROM returns WHERE id = ?",
+                                                      (return_id,)).fetchone()
+        _, loot = self._account_row(account)
+        loot += cargo * int(total_loot) // int(all_ships_cargo)
+        self.db.execute("UPDATE accounts SET loot = ? WHERE account = ?", (str(loot), account))
+
+    def _ship_row(self, ship_idx: int) -> Dict[str, int]:
+        status, cargo, fee_taken, crew, return_id = self.db.execute(
+            "SELECT status, cargo, fee_taken, crew, return_id FROM ships WHERE idx = ?", (ship_idx,)).fetchone()
+        return {"status": status, "cargo": int(cargo), "fee_taken": int(fee_taken), "crew": crew,
+                "return_id": return_id}
+
+    def _set_cargo(self, ship_idx: int, cargo: int):
+        self.db.execute("UPDATE ships SET cargo = ? WHERE idx = ?", (str(cargo), ship_idx))
+
+    def _account_row(self, account: str) -> Tuple[int, int]:
+        row = self.db.execute("SELECT deposited, loot FROM accounts WHERE account = ?", (account,)).fetchone()
+        return (int(row[0]), int(row[1])) if row else (0, 0)
+
+    # Queries
+
+    def open_ship_idx(self) -> int:
+        return self.db.execute("SELECT idx FROM ships WHERE status = ?", (OPEN,)).fetchone()[0]
+
+    def oldest_active_ship_idx(self) -> int:
+        return self.db.execute("SELECT MIN(idx) FROM ships WHERE status != ?", (FINALISED,)).fetchone()[0]
+
+    def fleet_size(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM ships WHERE status = ?", (AT_SEA,)).fetchone()[0]
+
+    def ship_status(self, ship_idx: int) -> Tuple[int, int, int, List[Tuple[int, int]]]:
+        """(cargo, fee_taken, status, [(account, cargo)...]) like get_ship_status."""
+        row = self.db.execute("SELECT cargo, fee_taken, status FROM ships WHERE idx = ?", (ship_idx,)).fetchone()
+        if row is None:
+            return 0, 0, FINALISED, []
+        crew = self.db.execute("SELECT account, cargo FROM crew WHERE ship_idx = ? ORDER BY position",
+                               (ship_idx,)).fetchall()
+        return int(row[0]), int(row[1]), row[2], [(int(account, 16), int(cargo)) for account, cargo in crew]
+
+    def fleet(self) -> List[Tuple[int, int, int, int, int]]:
+        """(ship_idx, cargo, fee_taken, crew, status) from the oldest active ship to the open one, like get_fleet."""
+        rows = self.db.execute("SELECT idx, cargo, fee_taken, crew, status FROM ships WHERE idx >= ? ORDER BY idx",
+                               (self.oldest_active_ship_idx(),)).fetchall()
+        return [(idx, int(cargo), int(fee_taken), crew, status) for idx, cargo, fee_taken, crew, status in rows]
+
+    def ships_with_status(self, status: int) -> List[int]:
+        return [idx for idx, in self.db.execute("SELECT idx FROM ships WHERE status = ? ORDER BY idx", (status,))]
+
+    def balances(self, account: int) -> List[Tuple[int, int]]:
+        """(ship_idx, cargo) of the account on every ship, newest first like get_balances."""
+        rows = self.db.execute("SELECT ship_idx, cargo FROM crew WHERE account = ? ORDER BY ship_idx DESC",
+                               (_account(account),))
+        return [(ship_idx, int(cargo)) for ship_idx, cargo in rows]
+
+    def accounts(self) -> List[int]:
+        return [int(account, 16) for account, in self.db.execute("SELECT account FROM accounts")]
+
+    def position(self, account: int) -> Tuple[int, int]:
+        """(cargo deposited, loot paid out or credited) of the account over all ships."""
+        return self._account_row(_account(account))
+
+
+async def main(argv=None):
+    defaults = Workload()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", default=":memory:")
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--rounds", type=int, default=defaults.rounds)
+    parser.add_argument("--queries", type=int, default=1000, help="of every kind, to time them")
+    args = parser.parse_args(argv)
+
+    with set_class_hash_cache(class_hash_cache):
+        base_state = await build_base_state()
+        starknet = snapshot(base_state["starknet"])
+        fleet = bind_handles(base_state, starknet)
+        await run_workload(starknet, fleet, Workload(users=args.users, rounds=args.rounds), Recorder())
+
+    indexer = Indexer(args.db, fleet["admiral"].contract_address)
+    start = time.perf_counter()
+    indexed = indexer.sync(starknet.state.events)
+    print(f"{indexed} events indexed in {time.perf_counter() - start:.3f}s")
+
+    accounts = indexer.accounts()
+    queries = {
+        "balances": lambda i: indexer.balances(accounts[i % len(accounts)]),
+        "ship_status": lambda i: indexer.ship_status(1 + i % indexer.open_ship_idx()),
+        "fleet": lambda i: indexer.fleet(),
+    }
+    for name, query in queries.items():
+        start = time.perf_counter()
+        for i in range(args.queries):
+            query(i)
+        print(f"  {name:<12} {(time.perf_counter() - start) / args.queries * 1e6:>8.1f} us/query")
+    indexer.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,28 @@
+from starkware.starknet.public.abi import get_selector_from_name
+
+L1_HANDLER_SELECTOR = get_selector_from_name("process_msg_from_l1")
+L1_INDEXED_HANDLER_SELECTOR = get_selector_from_name("process_indexed_msg_from_l1")
+
+MESSAGE_VERSION = 1
+
+
+def build_l1_message_handler_payload(amounts: list[int], payout: int):
+    payload = [len(amounts)]
+    for x in amounts:
+        payload.append(x)
+        payload.append(0)
+    payload.append(payout)
+    payload.append(0)
+    payload.append(37000) # Gas Used
+    payload.append(0)
+
+    return payload
+
+
+def build_l1_indexed_message_handler_payload(ship_indexes: list[int], amounts: list[int], payout: int,
+                                             version: int = MESSAGE_VERSION):
+    return [version, len(ship_indexes)] + list(ship_indexes) + build_l1_message_handler_payload(amounts, payout)
+
+
+def build_depart_message_payload(ship_idx: int, amount: int):
+    return [MESSAGE_VERSION, ship_idx, amount, 0]
@@ -1,6 +1,20 @@
 """Utilities for testing Cairo contracts."""
 
-from starkware.crypto.signature.signature import private_to_stark_key, sign
+import functools
+import os
+
+from fastecdsa.point import Point
+from starkware.crypto.signature.fast_pedersen_hash import curve, pedersen_hash
+from starkware.crypto.signature.signature import (
+    EC_GEN,
+    EC_ORDER,
+    N_ELEMENT_BITS_ECDSA,
+    div_mod,
+    generate_k_rfc6979,
+    inv_mod_curve_size,
+    private_to_stark_key,
+    sign,
+)
 from starkware.starknet.core.os.transaction_hash.transaction_hash import (
     TransactionHashPrefix,
     calculate_transaction_hash_common,
@@ -13,6 +27,18 @@ from starkware.starkware_utils.error_handling import StarkException
 MAX_UINT128 = 2 ** 128 - 1
 MAX_UINT256 = (MAX_UINT128, MAX_UINT128)
 
+# Opt-in native signer for benchmark runs, see fast_sign()
+FAST_SIGNER = os.environ.get("IRONFLEET_FAST_SIGNER", "0") == "1"
+
+EC_GEN_POINT = Point(*EC_GEN, curve=curve)
+
+# Transaction hashes of the same account and calls share most of their hash chain
+cached_pedersen_hash = functools.lru_cache(maxsize=2 ** 16)(pedersen_hash)
+cached_selector = functools.lru_cache(maxsize=None)(get_selector_from_name)
+stark_key = functools.lru_cache(maxsize=None)(private_to_stark_key)
+
+EXECUTE_SELECTOR = get_selector_from_name("__execute__")
+
 
 def str_to_felt(text):
     b_text = bytes(text, 'ascii')
@@ -77,11 +103,12 @@ def get_transaction_hash(account, call_array, calldata, nonce, max_fee):
         TransactionHashPrefix.INVOKE,
         0,
         account,
-        get_selector_from_name("__execute__"),
+        EXECUTE_SELECTOR,
         execute_calldata,
         max_fee,
         StarknetChainId.TESTNET.value,
         [],
+        hash_function=cached_pedersen_hash,
     )
 
 
@@ -93,7 +120,7 @@ def from_call_to_call_array(calls):
         assert len(call) == 3, "Invalid call parameters"
         entry = (
             int(call[0], 16),
-            get_selector_from_name(call[1]),
+            cached_selector(call[1]),
             len(calldata),
             len(call[2]),
         )
@@ -102,16 +129,41 @@ def from_call_to_call_array(calls):
     return (call_array, calldata)
 
 
+def fast_sign(msg_hash, priv_key):
+    """
+    Same signature as signature.sign(), with the curve multiplication done by fastecdsa
+    instead of the pure-Python ec_mult().
+    """
+    assert 0 <= msg_hash < 2**N_ELEMENT_BITS_ECDSA, "Message not signable."
+
+    seed = None
+    while True:
+        k = generate_k_rfc6979(msg_hash, priv_key, seed)
+        seed = 1 if seed is None else seed + 1
+
+        r = (k * EC_GEN_POINT).x
+        if not (1 <= r < 2**N_ELEMENT_BITS_ECDSA) or (msg_hash + r * priv_key) % EC_ORDER == 0:
+            continue
+
+        w = div_mod(k, msg_hash + r * priv_key, EC_ORDER)
+        if not (1 <= w < 2**N_ELEMENT_BITS_ECDSA):
+            continue
+
+        return r, inv_mod_curve_size(w)
+
+
 class NileSigner:
     """Utility for signing transactions for an Account on Starknet."""
 
     def __init__(self, private_key):
         """Construct a Signer object. Takes a private key."""
         self.private_key = private_key
-        self.public_key = private_to_stark_key(private_key)
+        self.public_key = stark_key(private_key)
 
     def sign(self, message_hash):
         """Sign a message hash."""
+        if FAST_SIGNER:
+            return fast_sign(message_hash, self.private_key)
         return sign(msg_hash=message_hash, priv_key=self.private_key)
 
     def sign_transaction(self, sender, calls, nonce, max_fee):
@@ -168,12 +220,14 @@ class Signer():
             execution_info = await account.get_nonce().call()
             nonce, = execution_info.result
 
+        (call_array, calldata, sig_r, sig_s) = self.sign_transactions(account, calls, nonce, max_fee)
+        return await account.__execute__(call_array, calldata, nonce).invoke(signature=[sig_r, sig_s])
+
+    def sign_transactions(self, account, calls, nonce, max_fee=0):
         build_calls = []
         for call in calls:
             build_call = list(call)
             build_call[0] = hex(build_call[0])
             build_calls.append(build_call)
 
-        (call_array, calldata, sig_r, sig_s) = self.signer.sign_transaction(
-            hex(account.contract_address), build_calls, nonce, max_fee)
-        return await account.__execute__(call_array, calldata, nonce).invoke(signature=[sig_r, sig_s])
+        return self.signer.sign_transaction(hex(account.contract_address), build_calls, nonce, max_fee)
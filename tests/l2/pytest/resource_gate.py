@@ -0,0 +1,212 @@
+"""
+Pytest plugin gating the execution resources of the watched contracts' entry points.
+
+Every call into a watched contract made while a test runs is recorded by entry point, keeping
+the largest step count, memory holes, builtin usage and number of storage keys changed by the
+transaction seen. The records are compared with the committed baseline and a test fails when
+any of them grew beyond the tolerance.
+
+    pytest tests/l2/pytest --update-resource-baseline    # accept the current resources
+"""
+
+import contextlib
+import json
+import os
+from typing import Dict, List, Optional
+
+import pytest
+from starkware.starknet.public.abi import get_selector_from_name
+from starkware.starknet.testing.state import StarknetState
+
+from contract_cache import get_class_hash, get_contract_class
+from state_diff import StateDiff, track
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "resource_baseline.json")
+DEFAULT_TOLERANCE = 0.02
+
+# Contract sources to gate, resolved to class hashes and entry point names once the gate starts
+_watched_sources: List[str] = []
+
+
+def watch(source: str):
+    """Gates every entry point of the contract compiled from `source`."""
+    if source not in _watched_sources:
+        _watched_sources.append(source)
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> List[str]:
+    """Returns a description of every resource in `current` exceeding its `baseline` by more than `tolerance`."""
+    regressions = []
+    for entry_point, resources in sorted(current.items()):
+        if entry_point not in baseline:
+            continue
+
+        expected = baseline[entry_point]
+        metrics = [(metric, resources[metric], expected[metric])
+                   for metric in ("n_steps", "n_memory_holes", "storage_keys") if metric in expected]
+        metrics += [(builtin, count, expected["builtins"].get(builtin, 0))
+                    for builtin, count in sorted(resources["builtins"].items())]
+
+        for metric, value, limit in metrics:
+            if value > limit * (1 + tolerance):
+                regressions.append(f"{entry_point} {metric}: {value} > {limit} (baseline) + {tolerance:.0%}")
+
+    return regressions
+
+
+class ResourceGate:
+
+    def __init__(self, baseline_file: str, tolerance: float, update: bool):
+        self.baseline_file = baseline_file
+        self.tolerance = tolerance
+        self.update = update
+        self.baseline: Dict[str, dict] = {}
+        if os.path.isfile(baseline_file):
+            with open(baseline_file) as f:
+                self.baseline = json.load(f)
+
+        # class hash -> (contract name, {selector: entry point name})
+        self.contracts: Optional[Dict[bytes, tuple]] = None
+        # Resources recorded by each test, keyed by test id and "Contract.entry_point"
+        self.results: Dict[str, Dict[str, dict]] = {}
+        self.unknown_tests: List[str] = []
+        self.current: Optional[Dict[str, dict]] = None
+        self.paused = 0
+
+    def _resolve_contracts(self):
+        self.contracts = {}
+        for source in _watched_sources:
+            name = os.path.splitext(os.path.basename(source))[0]
+            entry_points = {get_selector_from_name(f["name"]): f["name"]
+                            for f in get_contract_class(source).abi if f["type"] in ("function", "l1_handler")}
+            self.contracts[get_class_hash(source).to_bytes(32, "big")] = (name, entry_points)
+
+    def record(self, call_info, state_diff: StateDiff):
+        if self.current is None or self.paused:
+            return
+        if self.contracts is None:
+            self._resolve_contracts()
+
+        calls = [call_info]
+        while calls:
+            call = calls.pop()
+            calls.extend(call.internal_calls)
+            if call.class_hash not in self.contracts:
+                continue
+
+            name, entry_points = self.contracts[call.class_hash]
+            key = f"{name}.{entry_points.get(call.entry_point_selector, hex(call.entry_point_selector))}"
+            resources = call.execution_resources
+            recorded = self.current.setdefault(key, {"calls": 0, "n_steps": 0, "n_memory_holes": 0, "storage_keys": 0,
+                                                     "builtins": {}})
+            recorded["calls"] += 1
+            recorded["n_steps"] = max(recorded["n_steps"], resources.n_steps)
+            recorded["n_memory_holes"] = max(recorded["n_memory_holes"], resources.n_memory_holes)
+            # Storage keys changed by the whole transaction, token balances and account nonce included
+            recorded["storage_keys"] = max(recorded["storage_keys"], state_diff.keys_changed)
+            for builtin, count in resources.builtin_instance_counter.items():
+                if count:
+                    recorded["builtins"][builtin] = max(recorded["builtins"].get(builtin, 0), count)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        self.current = {}
+        try:
+            yield
+        finally:
+            self.results[item.nodeid] = self.current
+            self.current = None
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        outcome = yield
+        report = outcome.get_result()
+        if call.when != "call" or not report.passed or self.update or not self.results.get(item.nodeid):
+            return
+
+        if item.nodeid not in self.baseline:
+            self.unknown_tests.append(item.nodeid)
+            return
+
+        regressions = compare(self.baseline[item.nodeid], self.results[item.nodeid], self.tolerance)
+        if regressions:
+            report.outcome = "failed"
+            report.longrepr = "Execution resources regressed (rerun with --update-resource-baseline to accept):\n  " \
+                              + "\n  ".join(regressions)
+
+    def pytest_sessionfinish(self, session):
+        if not self.update:
+            return
+
+        for nodeid, results in self.results.items():
+            if results:
+                self.baseline[nodeid] = results
+            else:
+                self.baseline.pop(nodeid, None)
+
+        tmp_file = f"{self.baseline_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self.baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        os.replace(tmp_file, self.baseline_file)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if self.update:
+            terminalreporter.write_line(f"resource baseline updated: {self.baseline_file}")
+        elif self.unknown_tests:
+            terminalreporter.write_line(f"{len(self.unknown_tests)} test(s) have no resource baseline, "
+                                        f"run with --update-resource-baseline to add them")
+
+
+_gate: Optional[ResourceGate] = None
+_invoke_raw = StarknetState.invoke_raw
+
+
+async def _recording_invoke_raw(self, *args, **kwargs):
+    with track() as state_diff:
+        execution_info = await _invoke_raw(self, *args, **kwargs)
+    if _gate is not None:
+        _gate.record(execution_info.call_info, state_diff)
+    return execution_info
+
+
+@contextlib.contextmanager
+def paused():
+    """Calls made inside the block are not recorded, e.g. while building a shared state."""
+    if _gate is None:
+        yield
+        return
+
+    _gate.paused += 1
+    try:
+        yield
+    finally:
+        _gate.paused -= 1
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("resource gate")
+    group.addoption("--update-resource-baseline", action="store_true",
+                    help="write the execution resources of the tests run to the baseline instead of checking them")
+    group.addoption("--resource-baseline", default=BASELINE_FILE, help="baseline file")
+    group.addoption("--resource-tolerance", type=float, default=DEFAULT_TOLERANCE,
+                    help="allowed relative increase over the baseline (default %(default)s)")
+
+
+def pytest_configure(config):
+    global _gate
+    update = config.getoption("update_resource_baseline")
+    if update and hasattr(config, "workerinput"):
+        raise pytest.UsageError("--update-resource-baseline cannot be used with pytest-xdist workers")
+
+    _gate = ResourceGate(config.getoption("resource_baseline"), config.getoption("resource_tolerance"), update)
+    config.pluginmanager.register(_gate, "resource_gate_instance")
+    StarknetState.invoke_raw = _recording_invoke_raw
+
+
+def pytest_unconfigure(config):
+    global _gate
+    if _gate is not None:
+        config.pluginmanager.unregister(_gate)
+        _gate = None
+    StarknetState.invoke_raw = _invoke_raw
@@ -0,0 +1,210 @@
+"""
+Pre-seeded scenario states for tests and benchmarks.
+
+Building a large fleet takes thousands of signed transactions, so every scenario is built once
+on top of the base state and persisted to SCENARIO_DIR. Later runs load it straight from disk.
+"""
+
+import copy
+import functools
+import hashlib
+import os
+import pickle
+from collections import namedtuple
+from typing import Dict
+
+from starkware.starknet.testing.contract import StarknetContract
+from starkware.starknet.testing.starknet import Starknet
+
+import resource_gate
+from account import Account
+from l1_messages import L1_INDEXED_HANDLER_SELECTOR, build_l1_indexed_message_handler_payload
+from snapshot import bind_handles, deploy_salt, snapshot
+
+SCENARIO_DIR = os.environ.get("IRONFLEET_SCENARIO_CACHE",
+                              os.path.join(os.path.dirname(__file__), ".scenarios"))
+
+CREW_DEPOSIT = 100
+
+ContractRef = namedtuple("ContractRef", ["contract_address", "abi"])
+AccountRef = namedtuple("AccountRef", ["private_key", "contract_address", "abi"])
+
+# Scenarios loaded by this process, tests get snapshots of these
+_loaded_scenarios: Dict[str, tuple] = {}
+
+
+async def deploy_crew(starknet: Starknet, fleet: dict, size: int, balance: int = None):
+    """
+    Deploys `size` accounts holding `balance` cargo each, approved for the admiral. By default
+    that is enough to deposit into every ship of a full fleet.
+    """
+    template = fleet["users"][0]
+    carried_state = starknet.state.state
+    class_hash = carried_state.contract_states[template.contract_address].state.contract_hash
+    account_class = carried_state.get_contract_class(class_hash)
+
+    if balance is None:
+        max_fleet_size = (await fleet["admiral"].get_metadata().call()).result.max_fleet_size
+        balance = CREW_DEPOSIT * (max_fleet_size + 1)
+
+    crew = []
+    for _ in range(size):
+        member = copy.copy(template)
+        member.set_contract(await starknet.deploy(contract_class=account_class,
+                                                  constructor_calldata=[template.public_key],
+                                                  contract_address_salt=deploy_salt(starknet)))
+        await fleet["l2_keeper"].mint(fleet["cargo_token"], member, balance)
+        await member.approve(fleet["cargo_token"], fleet["admiral"].contract_address, balance)
+        crew.append(member)
+
+    return crew
+
+
+async def _sail(fleet: dict, crew: list, ships: int):
+    admiral = fleet["admiral"]
+    first_ship = (await admiral.get_open_ship_status().call()).result.ship_idx
+
+    for ship_idx in range(first_ship, first_ship + ships):
+        for member in crew:
+            await member.deposit_into_ship(admiral, CREW_DEPOSIT)
+        await fleet["l2_keeper"].depart(admiral, ship_idx)
+
+
+async def build_full_fleet(starknet: Starknet, fleet: dict, crew_size: int, ships: int = None):
+    """`ships` (max_fleet_size by default) ships at sea, each carrying the same `crew_size` crew."""
+    if ships is None:
+        ships = (await fleet["admiral"].get_metadata().call()).result.max_fleet_size
+
+    fleet["crew"] = await deploy_crew(starknet, fleet, crew_size)
+    await _sail(fleet, fleet["crew"], ships)
+
+
+async def build_returned_backlog(starknet: Starknet, fleet: dict, crew_size: int, ships: int, loot: int):
+    """A full fleet that came back in a single L1 message and is waiting for unload_ship."""
+    await build_full_fleet(starknet, fleet, crew_size, ships)
+
+    admiral = fleet["admiral"]
+    l1_contract_address = (await admiral.get_l1_contract_address().call()).result.address
+    await fleet["l2_keeper"].mint(fleet["loot_token"], admiral, loot)
+
+    open_ship_idx = (await admiral.get_open_ship_status().call()).result.ship_idx
+    ship_indexes = list(range(open_ship_idx - ships, open_ship_idx))
+    amounts = [CREW_DEPOSIT * crew_size] * ships
+    await starknet.send_message_to_l2(l1_contract_address, admiral.contract_address, L1_INDEXED_HANDLER_SELECTOR,
+                                      build_l1_indexed_message_handler_payload(ship_indexes, amounts, loot))
+
+
+SCENARIOS = {
+    "small_fleet": functools.partial(build_full_fleet, crew_size=3, ships=2),
+    "full_fleet": functools.partial(build_full_fleet, crew_size=200),
+    "returned_backlog": functools.partial(build_returned_backlog, crew_size=200, ships=20, loot=10 ** 6),
+}
+
+
+def _dump_handles(handles):
+    if isinstance(handles, dict):
+        return {name: _dump_handles(handle) for name, handle in handles.items()}
+    if isinstance(handles, list):
+        return [_dump_handles(handle) for handle in handles]
+    if isinstance(handles, Account):
+        return AccountRef(handles.signer.private_key, handles.contract_address, handles.contract.abi)
+    if isinstance(handles, StarknetContract):
+        return ContractRef(handles.contract_address, handles.abi)
+    return handles
+
+
+def _load_handles(refs, starknet: Starknet):
+    if isinstance(refs, dict):
+        return {name: _load_handles(ref, starknet) for name, ref in refs.items()}
+    if isinstance(refs, list):
+        return [_load_handles(ref, starknet) for ref in refs]
+    if isinstance(refs, AccountRef):
+        account = Account(refs.private_key)
+        account.set_contract(StarknetContract(state=starknet.state, abi=refs.abi,
+                                              contract_address=refs.contract_address, deploy_execution_info=None))
+        return account
+    if isinstance(refs, ContractRef):
+        return StarknetContract(state=starknet.state, abi=refs.abi, contract_address=refs.contract_address,
+                                deploy_execution_info=None)
+    return refs
+
+
+def save_scenario(filename: str, starknet: Starknet, handles: dict):
+    """Writes the state of the given Starknet, and the contract/account handles into it, to a file."""
+    state = starknet.state
+    carried_state = state.state
+    data = {
+        "storage": dict(carried_state.ffc.storage.db),
+        "contract_definitions": dict(carried_state.contract_definitions),
+        "contract_states": dict(carried_state.contract_states),
+        "block_info": carried_state.block_info,
+        "l2_to_l1_messages": dict(state._l2_to_l1_messages),
+        "l2_to_l1_messages_log": list(state.l2_to_l1_messages_log),
+        "events": list(state.events),
+        "l1_to_l2_nonce": starknet.l1_to_l2_nonce,
+        "handles": _dump_handles(handles),
+    }
+
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    tmp_file = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp_file, "wb") as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, filename)
+
+
+async def load_scenario_file(filename: str):
+    """Inverse of save_scenario(), returns a fresh Starknet and the handles bound to it."""
+    with open(filename, "rb") as f:
+        data = pickle.load(f)
+
+    starknet = await Starknet.empty()
+    state = starknet.state
+    carried_state = state.state
+    carried_state.ffc.storage.db.update(data["storage"])
+    carried_state.contract_definitions.update(data["contract_definitions"])
+    carried_state.contract_states.update(data["contract_states"])
+    carried_state.block_info = data["block_info"]
+    state._l2_to_l1_messages.update(data["l2_to_l1_messages"])
+    state.l2_to_l1_messages_log.extend(data["l2_to_l1_messages_log"])
+    state.events.extend(data["events"])
+    starknet.l1_to_l2_nonce = data["l1_to_l2_nonce"]
+
+    return starknet, _load_handles(data["handles"], starknet)
+
+
+def scenario_file(name: str, base_state: dict) -> str:
+    """
+    Scenarios are keyed by their name, the sources building them and the classes deployed in
+    the base state, so changing a contract, the base state or a builder rebuilds them.
+    """
+    h = hashlib.sha256(name.encode())
+    for source in (__file__, os.path.join(os.path.dirname(__file__), "conftest.py")):
+        with open(source, "rb") as f:
+            h.update(f.read())
+    for class_hash in sorted(base_state["starknet"].state.state.contract_definitions.keys()):
+        h.update(class_hash)
+
+    return os.path.join(SCENARIO_DIR, f"{name}-{h.hexdigest()[:16]}.pickle")
+
+
+async def load_scenario(name: str, base_state: dict):
+    """
+    Returns a Starknet snapshot of the named scenario and the handles bound to it, building
+    and persisting the scenario first if it is not on disk yet.
+    """
+    if name not in _loaded_scenarios:
+        filename = scenario_file(name, base_state)
+        if not os.path.isfile(filename):
+            starknet = snapshot(base_state["starknet"])
+            handles = bind_handles(base_state, starknet)
+            del handles["starknet"]
+
+            with resource_gate.paused():
+                await SCENARIOS[name](starknet, handles)
+            save_scenario(filename, starknet, handles)
+
+        _loaded_scenarios[name] = await load_scenario_file(filename)
+
+    starknet, handles = _loaded_scenarios[name]
+    snap = snapshot(starknet)
+    return snap, bind_handles(handles, snap)
@@ -0,0 +1,72 @@
+"""Copy-on-write snapshots of a Starknet testing state."""
+
+import copy
+
+from starkware.starknet.testing.contract import StarknetContract
+from starkware.starknet.testing.starknet import Starknet
+from starkware.starknet.testing.state import StarknetState
+
+from account import Account
+
+
+class SnapshotState(StarknetState):
+    """
+    A StarknetState layered on top of another one. Changes land in a new level of the
+    CarriedState chain maps and never reach the parent, so taking a snapshot is O(1) and
+    reverting it is a matter of dropping it.
+    """
+
+    @classmethod
+    def of(cls, parent: StarknetState) -> "SnapshotState":
+        state = cls(state=parent.state.create_child_state_for_querying(), general_config=parent.general_config)
+        state._l2_to_l1_messages = dict(parent._l2_to_l1_messages)
+        state.l2_to_l1_messages_log = list(parent.l2_to_l1_messages_log)
+        state.events = list(parent.events)
+        return state
+
+    def copy(self) -> "SnapshotState":
+        # StarknetContract.call() runs on a copy and throws it away, a lazy copy is enough
+        return SnapshotState.of(self)
+
+
+def snapshot(starknet: Starknet) -> Starknet:
+    """Returns a Starknet that starts from the current state of the given one without ever modifying it."""
+    snap = Starknet(state=SnapshotState.of(starknet.state))
+    snap.l1_to_l2_nonce = starknet.l1_to_l2_nonce
+    return snap
+
+
+def deploy_salt(starknet: Starknet) -> int:
+    """
+    Salt for the next deploy. Derived from the number of contracts deployed so far instead of
+    random, so a state built the same way always ends up with the same addresses.
+    """
+    return len(starknet.state.state.contract_states)
+
+
+def bind_contract(contract: StarknetContract, starknet: Starknet) -> StarknetContract:
+    """Returns a handle to the same contract that runs against the given Starknet."""
+    return StarknetContract(state=starknet.state, abi=contract.abi, contract_address=contract.contract_address,
+                            deploy_execution_info=contract.deploy_execution_info)
+
+
+def bind_account(account, starknet: Starknet):
+    """Returns a copy of the account (keys included) whose contract runs against the given Starknet."""
+    bound = copy.copy(account)
+    bound.set_contract(bind_contract(account.contract, starknet))
+    # The snapshot starts out with the same account nonce
+    bound.nonce = account.nonce
+    return bound
+
+
+def bind_handles(handles, starknet: Starknet):
+    """Rebinds every contract and account found in a (nested) dict/list of handles."""
+    if isinstance(handles, dict):
+        return {name: bind_handles(handle, starknet) for name, handle in handles.items()}
+    if isinstance(handles, list):
+        return [bind_handles(handle, starknet) for handle in handles]
+    if isinstance(handles, Account):
+        return bind_account(handles, starknet)
+    if isinstance(handles, StarknetContract):
+        return bind_contract(handles, starknet)
+    return handles
@@ -0,0 +1,113 @@
+"""
+State diff accounting for transactions run by the testing Starknet.
+
+Starknet pays L1 for the storage it changes: the data availability (DA) output holds every
+modified contract (address, number of updates) and every changed storage key (key, value).
+
+    with track() as diff:
+        await user.deposit_into_ship(admiral, 100)
+    diff.keys_changed, diff.new_keys, diff.da_gas
+"""
+
+import contextlib
+from typing import Dict, List, Mapping, Tuple
+
+from services.external_api import eth_gas_constants
+from starkware.starknet.business_logic.state.state import CarriedState
+from starkware.starknet.storage.starknet_storage import StorageLeaf
+
+
+class StateDiff:
+    """Storage writes made while tracking, with the value of every key before its first write."""
+
+    def __init__(self):
+        # (contract address, key) -> (value before, value after)
+        self.writes: Dict[Tuple[int, int], Tuple[int, int]] = {}
+
+    def add(self, contract_address: int, key: int, before: int, after: int):
+        before = self.writes.get((contract_address, key), (before, None))[0]
+        self.writes[(contract_address, key)] = (before, after)
+
+    @property
+    def keys_written(self) -> int:
+        return len(self.writes)
+
+    @property
+    def keys_changed(self) -> int:
+        return sum(1 for before, after in self.writes.values() if before != after)
+
+    @property
+    def new_keys(self) -> int:
+        """Keys going from zero to a value, the slot did not exist before."""
+        return sum(1 for before, after in self.writes.values() if before == 0 and after != 0)
+
+    @property
+    def overwritten_keys(self) -> int:
+        """Keys that held a value and changed it (cleared included)."""
+        return sum(1 for before, after in self.writes.values() if before != 0 and before != after)
+
+    @property
+    def cleared_keys(self) -> int:
+        return sum(1 for before, after in self.writes.values() if before != 0 and after == 0)
+
+    def keys_changed_by(self, contract_address: int) -> int:
+        return sum(1 for (address, _), (before, after) in self.writes.items()
+                   if address == contract_address and before != after)
+
+    @property
+    def modified_contracts(self) -> int:
+        return len({address for (address, _), (before, after) in self.writes.items() if before != after})
+
+    @property
+    def da_felts(self) -> int:
+        # Address and update count for every modified contract, key and value for every changed key
+        return 2 * self.modified_contracts + 2 * self.keys_changed
+
+    @property
+    def da_gas(self) -> int:
+        return self.da_felts * eth_gas_constants.SHARP_GAS_PER_MEMORY_WORD
+
+    def as_dict(self) -> dict:
+        return {
+            "keys_written": self.keys_written,
+            "keys_changed": self.keys_changed,
+            "new_keys": self.new_keys,
+            "overwritten_keys": self.overwritten_keys,
+            "cleared_keys": self.cleared_keys,
+            "modified_contracts": self.modified_contracts,
+            "da_felts": self.da_felts,
+            "da_gas": self.da_gas,
+        }
+
+
+_active: List[StateDiff] = []
+_update_contract_storage = CarriedState.update_contract_storage
+
+
+def _tracking_update_contract_storage(self, contract_address: int, modifications: Mapping[int, StorageLeaf]):
+    # The testing state never commits storage to the contracts' trees, so whatever is not in
+    # storage_updates is still zero
+    storage_updates = self.contract_states[contract_address].storage_updates
+    for key, leaf in modifications.items():
+        before = storage_updates[key].value if key in storage_updates else 0
+        for diff in _active:
+            diff.add(contract_address, key, before, leaf.value)
+
+    return _update_contract_storage(self, contract_address, modifications)
+
+
+@contextlib.contextmanager
+def track():
+    """
+    Records the storage writes of every transaction run inside the block. Discard the diff
+    of a transaction that failed, its writes were reverted.
+    """
+    diff = StateDiff()
+    _active.append(diff)
+    CarriedState.update_contract_storage = _tracking_update_contract_storage
+    try:
+        yield diff
+    finally:
+        _active.remove(diff)
+        if not _active:
+            CarriedState.update_contract_storage = _update_contract_storage
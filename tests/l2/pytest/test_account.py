@@ -0,0 +1,43 @@
+import pytest
+from starkware.crypto.signature.signature import sign
+
+from open_zeppelin.utils import fast_sign, uint
+
+
+async def onchain_nonce(account):
+    return (await account.contract.get_nonce().call()).result[0]
+
+
+@pytest.mark.asyncio
+async def test_local_nonce(cargo_token, admiral, user1):
+    await user1.approve(cargo_token, admiral.contract_address, 1)
+    await user1.approve(cargo_token, admiral.contract_address, 2)
+    assert user1.nonce == await onchain_nonce(user1)
+
+    # A failed transaction makes the account read its nonce again
+    with pytest.raises(Exception):
+        await user1.send_transaction(admiral.contract_address, 'set_keeper_address', calldata=[42])
+    assert user1.nonce is None
+
+    await user1.approve(cargo_token, admiral.contract_address, 3)
+    assert user1.nonce == await onchain_nonce(user1)
+
+
+@pytest.mark.asyncio
+async def test_presigned_queue(cargo_token, admiral, user1):
+    queue = await user1.presign_transactions([
+        [(cargo_token.contract_address, 'approve', [admiral.contract_address, *uint(amount)])]
+        for amount in range(1, 4)
+    ])
+    assert [tx.nonce for tx in queue] == [user1.nonce, user1.nonce + 1, user1.nonce + 2]
+
+    await user1.send_presigned(queue)
+    assert user1.nonce == await onchain_nonce(user1)
+
+    res = await cargo_token.allowance(user1.contract_address, admiral.contract_address).call()
+    assert res.result.remaining == uint(3)
+
+
+def test_fast_sign():
+    for msg_hash in (1, 2 ** 200 + 12345, 2 ** 251 - 1):
+        assert fast_sign(msg_hash, 123456789987654321) == sign(msg_hash, 123456789987654321)
@@ -0,0 +1,62 @@
+import pytest
+from starkware.starknet.testing.starknet import Starknet
+
+from conftest import L1_CONTRACT_ADDRESS, ShipStatus
+from l1_messages import build_depart_message_payload
+from open_zeppelin.utils import uint
+
+
+async def set_auto_depart_cargo(admiral, l2_keeper, cargo):
+    await l2_keeper.send_transaction(admiral.contract_address, 'set_auto_depart_cargo', calldata=[*uint(cargo)])
+
+
+async def ship_status(admiral, ship_idx):
+    return (await admiral.get_ship_status(ship_idx).call()).result.status
+
+
+@pytest.mark.asyncio
+async def test_deposit_departs_full_ship(starknet: Starknet, admiral, starkgate, l2_keeper, user1, user2, user3):
+    await set_auto_depart_cargo(admiral, l2_keeper, 300)
+    assert (await admiral.get_auto_depart_cargo().call()).result.cargo == uint(300)
+
+    await user1.deposit_into_ship(admiral, 100)
+    await user2.deposit_into_ship(admiral, 100)
+    assert await ship_status(admiral, 1) == ShipStatus.OPEN.value
+
+    await user3.deposit_into_ship(admiral, 150)
+    assert await ship_status(admiral, 1) == ShipStatus.AT_SEA.value
+    assert (await admiral.get_open_ship_status().call()).result.ship_idx == 2
+    assert (await admiral.get_fleet_size().call()).result.count == 1
+    starknet.consume_message_from_l2(admiral.contract_address, L1_CONTRACT_ADDRESS,
+                                     build_depart_message_payload(1, 350))
+    assert (await starkgate.balance(L1_CONTRACT_ADDRESS).call()).result.balance == uint(350)
+
+    # Switched off, the ship waits for the keeper
+    await set_auto_depart_cargo(admiral, l2_keeper, 0)
+    await user1.deposit_into_ship(admiral, 1000)
+    assert await ship_status(admiral, 2) == ShipStatus.OPEN.value
+
+
+@pytest.mark.asyncio
+async def test_no_auto_departure_past_fleet_size(admiral, l2_keeper, user1):
+    await l2_keeper.send_transaction(admiral.contract_address, 'set_max_fleet_size', calldata=[1])
+    await user1.deposit_into_ship(admiral, 100)
+    await l2_keeper.depart(admiral, 1)
+
+    await set_auto_depart_cargo(admiral, l2_keeper, 100)
+    await user1.deposit_into_ship(admiral, 200)
+    assert await ship_status(admiral, 2) == ShipStatus.OPEN.value
+
+
+@pytest.mark.asyncio
+async def test_no_auto_departure_below_price(admiral, l2_keeper, user1):
+    await l2_keeper.send_transaction(admiral.contract_address, 'set_price_per_ship', calldata=[*uint(500)])
+    await set_auto_depart_cargo(admiral, l2_keeper, 100)
+
+    await user1.deposit_into_ship(admiral, 200)
+    assert await ship_status(admiral, 1) == ShipStatus.OPEN.value
+    await user1.deposit_into_ship(admiral, 300)
+    assert await ship_status(admiral, 1) == ShipStatus.AT_SEA.value
+
+    with pytest.raises(Exception):
+        await user1.send_transaction(admiral.contract_address, 'set_auto_depart_cargo', calldata=[*uint(100)])
@@ -0,0 +1,66 @@
+import pytest
+
+from conftest import L1_CONTRACT_ADDRESS, ShipStatus
+from l1_messages import L1_HANDLER_SELECTOR, build_l1_message_handler_payload
+from open_zeppelin.utils import uint
+
+
+@pytest.mark.asyncio
+async def test_user_batch(admiral, user1):
+    nonce = await user1.next_nonce()
+    res = await user1.batch().deposit_into_ship(admiral, 100).deposit_into_ship(admiral, 50).send()
+    assert len(res) == 1
+    assert user1.nonce == nonce + 1
+
+    res = await admiral.get_ship_status(1).call()
+    assert res.result.ship_cargo == uint(150)
+
+
+@pytest.mark.asyncio
+async def test_keeper_batch(starknet, admiral, loot_token, l2_keeper, user1, user2):
+    await user1.deposit_into_ship(admiral, 100)
+    await l2_keeper.depart(admiral, 1)
+    await user2.deposit_into_ship(admiral, 200)
+    await l2_keeper.depart(admiral, 2)
+
+    await starknet.send_message_to_l2(L1_CONTRACT_ADDRESS, admiral.contract_address, L1_HANDLER_SELECTOR,
+                                      build_l1_message_handler_payload([100, 200], 300))
+
+    # Fund the loot and unload both ships in one transaction
+    res = await l2_keeper.batch().mint(loot_token, admiral, 300).unload_ship(admiral, 1).unload_ship(admiral, 2).send()
+    assert len(res) == 1
+
+    for ship_idx in (1, 2):
+        res = await admiral.get_ship_status(ship_idx).call()
+        assert res.result.status == ShipStatus.FINALISED.value
+
+
+@pytest.mark.asyncio
+async def test_batch_split_on_calldata(admiral, user1):
+    batch = user1.batch(max_calldata=20)
+    for _ in range(5):
+        batch.deposit_into_ship(admiral, 10)
+
+    assert [len(chunk) for chunk in batch.split()] == [2, 2, 1]
+    res = await batch.send()
+    assert len(res) == 3
+    assert len(batch) == 0
+
+    res = await admiral.get_ship_status(1).call()
+    assert res.result.ship_cargo == uint(50)
+
+
+@pytest.mark.asyncio
+async def test_batch_split_on_steps(admiral, user1):
+    one_deposit = await user1.estimate_steps([(admiral.contract_address, 'deposit', [*uint(10)])])
+
+    batch = user1.batch(max_steps=one_deposit * 2)
+    for _ in range(4):
+        batch.deposit_into_ship(admiral, 10)
+    res = await batch.send()
+    assert 1 < len(res) < 4
+    for tx in res:
+        assert tx.call_info.execution_resources.n_steps <= one_deposit * 2
+
+    res = await admiral.get_ship_status(1).call()
+    assert res.result.ship_cargo == uint(40)
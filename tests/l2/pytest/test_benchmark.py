@@ -0,0 +1,37 @@
+import csv
+import json
+
+import pytest
+
+from benchmark import Recorder, Workload, run_workload
+from snapshot import bind_handles
+
+
+@pytest.mark.asyncio
+async def test_benchmark_workload(starknet, base_state, tmp_path):
+    fleet = bind_handles(base_state, starknet)
+    workload = Workload(users=2, rounds=3, ships_per_return=2)
+    recorder = await run_workload(starknet, fleet, workload, Recorder())
+
+    summary = recorder.summary()
+    assert summary["deposit"]["transactions"] == 6
+    assert summary["depart"]["transactions"] == 3
+    assert summary["process_indexed_msg_from_l1"]["transactions"] == 2
+    assert summary["unload_ship"]["transactions"] >= 3
+    assert summary["deposit"]["mean_steps"] > 0
+    assert "pedersen_builtin" in summary["deposit"]["builtins"]
+
+    res = await fleet["admiral"].get_fleet_size().call()
+    assert res.result.count == 0
+
+    recorder.write_json(tmp_path / "bench.json", workload)
+    recorder.write_csv(tmp_path / "bench.csv")
+
+    with open(tmp_path / "bench.json") as f:
+        report = json.load(f)
+    assert report["workload"]["users"] == 2
+    assert len(report["records"]) == len(recorder.records)
+
+    with open(tmp_path / "bench.csv") as f:
+        rows = list(csv.DictReader(f))
+    assert {row["entry_point"] for row in rows} == set(summary)
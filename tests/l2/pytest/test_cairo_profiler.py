@@ -0,0 +1,45 @@
+import gzip
+
+import pytest
+from starkware.cairo.lang.tracer.third_party.profile_pb2 import Profile
+
+from cairo_profiler import profiled
+
+
+@pytest.mark.asyncio
+async def test_profile_transaction(admiral, user1, tmp_path):
+    with profiled() as profiler:
+        res = await user1.deposit_into_ship(admiral, 100)
+
+    # Account and admiral steps all end up in the profile
+    assert profiler.total_steps == res.call_info.execution_resources.n_steps
+
+    summary = {function: (inclusive, exclusive) for function, inclusive, exclusive in profiler.summary()}
+    assert summary["__wrappers__.__execute__"][0] == profiler.total_steps
+    deposit_steps = res.call_info.internal_calls[0].execution_resources.n_steps
+    assert summary["__wrappers__.deposit"][0] == deposit_steps
+    assert summary["__main__.deposit"][0] < deposit_steps
+    assert all(exclusive <= inclusive for inclusive, exclusive in summary.values())
+
+    # The deposit runs inside the account's call_contract syscall
+    deposit_stack = next(stack for stack in profiler.samples if stack[-1] == "__main__.deposit")
+    assert deposit_stack.index("__wrappers__.__execute__") < deposit_stack.index("__wrappers__.deposit")
+
+    profiler.write_folded(tmp_path / "deposit.folded")
+    with open(tmp_path / "deposit.folded") as f:
+        assert sum(int(line.rsplit(" ", 1)[1]) for line in f) == profiler.total_steps
+
+    profiler.write_pprof(tmp_path / "deposit.pb.gz")
+    profile = Profile()
+    with open(tmp_path / "deposit.pb.gz", "rb") as f:
+        profile.ParseFromString(gzip.decompress(f.read()))
+    assert sum(sample.value[0] for sample in profile.sample) == profiler.total_steps
+
+
+@pytest.mark.asyncio
+async def test_profile_call(admiral):
+    with profiled() as profiler:
+        res = await admiral.get_fleet().call()
+
+    assert profiler.total_steps == res.call_info.execution_resources.n_steps
+    assert profiler.summary()[0][0] == "__wrappers__.get_fleet"
@@ -0,0 +1,67 @@
+import pytest
+
+from calibrate_unload import UnloadCostModel, fit, measure
+from conftest import L1_CONTRACT_ADDRESS, ShipStatus
+from l1_messages import L1_INDEXED_HANDLER_SELECTOR, build_l1_indexed_message_handler_payload
+from snapshot import bind_handles
+
+
+def test_fit_bounds_every_measurement():
+    measurements = {1: 1500, 2: 2000, 4: 3100, 8: 5000}
+    model = fit(measurements)
+
+    assert model.crew_steps == 550
+    assert all(model.steps(size) >= steps for size, steps in measurements.items())
+    assert model.steps(1) == 1500
+    assert model.batch_size(model.steps(6)) == 6
+
+    with pytest.raises(ValueError):
+        fit({1: 1500})
+
+
+@pytest.mark.asyncio
+async def test_step_budget_sizes_unload_batches(starknet, base_state):
+    fleet = bind_handles(base_state, starknet)
+    admiral, l2_keeper = fleet["admiral"], fleet["l2_keeper"]
+    model = fit(await measure(starknet, fleet, [1, 3]))
+    assert model.crew_steps > 0
+
+    # A budget for two crew members
+    step_budget = model.steps(2)
+    await l2_keeper.send_transaction(admiral.contract_address, 'set_unload_step_budget',
+                                     calldata=[step_budget, model.ship_steps, model.crew_steps])
+    res = await admiral.get_unload_step_budget().call()
+    assert (res.result.cost.step_budget, res.result.batch_size) == (step_budget, 2)
+
+    ship_idx = (await admiral.get_open_ship_status().call()).result.ship_idx
+    for user in fleet["users"]:
+        await user.deposit_into_ship(admiral, 100)
+    await l2_keeper.depart(admiral, ship_idx)
+    await l2_keeper.mint(fleet["loot_token"], admiral, 300)
+    payload = build_l1_indexed_message_handler_payload([ship_idx], [300], 300)
+    await starknet.send_message_to_l2(L1_CONTRACT_ADDRESS, admiral.contract_address, L1_INDEXED_HANDLER_SELECTOR, payload)
+
+    res = await l2_keeper.send_transaction(admiral.contract_address, 'unload_ship', calldata=[ship_idx])
+    assert res.call_info.execution_resources.n_steps <= step_budget
+    res = await admiral.get_ship_status(ship_idx).call()
+    assert (res.result.status, len(res.result.crew)) == (ShipStatus.RETURNED.value, 1)
+
+
+@pytest.mark.asyncio
+async def test_set_unload_step_budget(admiral, l2_keeper, user1):
+    with pytest.raises(Exception):
+        await user1.send_transaction(admiral.contract_address, 'set_unload_step_budget', calldata=[10000, 1000, 3000])
+    # No room for a single crew member
+    with pytest.raises(Exception):
+        await l2_keeper.send_transaction(admiral.contract_address, 'set_unload_step_budget', calldata=[3999, 1000, 3000])
+    with pytest.raises(Exception):
+        await l2_keeper.send_transaction(admiral.contract_address, 'set_unload_step_budget', calldata=[10000, 1000, 0])
+
+    await l2_keeper.send_transaction(admiral.contract_address, 'set_unload_step_budget', calldata=[10000, 1000, 3000])
+    assert (await admiral.get_unload_step_budget().call()).result.batch_size == 3
+
+    # Back to the fixed batch size
+    await l2_keeper.send_transaction(admiral.contract_address, 'set_unload_step_budget', calldata=[0, 1000, 3000])
+    res = await admiral.get_unload_step_budget().call()
+    assert (res.result.cost, res.result.batch_size) == ((0, 0, 0), 5)
+    assert UnloadCostModel(1000, 3000).batch_size(10000) == 3
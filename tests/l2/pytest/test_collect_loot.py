@@ -0,0 +1,91 @@
+import pytest
+from starkware.starknet.testing.starknet import Starknet
+
+from conftest import ShipStatus
+from open_zeppelin.utils import from_uint
+from voyages import loot_balance, sail_and_return
+
+
+async def collect_loot(user, admiral, ship_idx):
+    return await user.send_transaction(admiral.contract_address, 'collect_loot', calldata=[ship_idx])
+
+
+@pytest.mark.asyncio
+async def test_collect_then_unload(starknet: Starknet, admiral, loot_token, l2_keeper, user1, user2, user3):
+    await sail_and_return(starknet, admiral, loot_token, l2_keeper, [(user1, 100), (user2, 300), (user3, 600)], 500)
+
+    await collect_loot(user2, admiral, 1)
+    assert await loot_balance(loot_token, user2) == 150
+    res = await admiral.get_ship_status(1).call()
+    assert (res.result.status, len(res.result.crew)) == (ShipStatus.RETURNED.value, 2)
+    assert {c.account for c in res.result.crew} == {user1.contract_address, user3.contract_address}
+    assert (await admiral.get_balances(user2.contract_address).call()).result.cargo == []
+
+    with pytest.raises(Exception):
+        await collect_loot(user2, admiral, 1)
+
+    # The keeper pays out the others, user2 is not paid twice
+    await admiral.unload_ship(1).invoke()
+    assert [await loot_balance(loot_token, u) for u in (user1, user2, user3)] == [50, 150, 300]
+    assert (await admiral.get_ship_status(1).call()).result.status == ShipStatus.FINALISED.value
+
+
+@pytest.mark.asyncio
+async def test_last_collector_finalises(starknet: Starknet, admiral, loot_token, l2_keeper, user1, user2):
+    await sail_and_return(starknet, admiral, loot_token, l2_keeper, [(user1, 100), (user2, 300)], 40)
+
+    await collect_loot(user1, admiral, 1)
+    await collect_loot(user2, admiral, 1)
+
+    assert [await loot_balance(loot_token, u) for u in (user1, user2)] == [10, 30]
+    res = await admiral.get_ship_status(1).call()
+    assert (res.result.status, res.result.crew) == (ShipStatus.FINALISED.value, [])
+    assert (await admiral.get_oldest_active_ship_idx().call()).result.ship_idx == 2
+
+    with pytest.raises(Exception):
+        await collect_loot(user1, admiral, 1)
+
+
+@pytest.mark.asyncio
+async def test_collect_with_departure_fee(starknet: Starknet, admiral, loot_token, l2_keeper, user1, user2, user3):
+    # The ship returns with 280 cargo, the crew deposited 310: 2 loot per cargo deposited
+    await sail_and_return(starknet, admiral, loot_token, l2_keeper, [(user1, 100), (user2, 200), (user3, 10)], 620,
+                          price_per_ship=30)
+
+    await collect_loot(user2, admiral, 1)
+    assert from_uint((await admiral.get_ship_status(1).call()).result.ship_cargo) == 80
+
+    # user1 has more cargo than the ship has left after the fee, user3 collects last
+    await collect_loot(user1, admiral, 1)
+    await collect_loot(user3, admiral, 1)
+
+    assert [await loot_balance(loot_token, u) for u in (user1, user2, user3)] == [200, 400, 20]
+    assert (await admiral.get_ship_status(1).call()).result.status == ShipStatus.FINALISED.value
+
+
+@pytest.mark.asyncio
+async def test_collect_loot_for(starknet: Starknet, admiral, loot_token, l2_keeper, user1, user2, user3):
+    await sail_and_return(starknet, admiral, loot_token, l2_keeper, [(user1, 100), (user2, 300)], 40)
+
+    res = await l2_keeper.send_transaction(admiral.contract_address, 'collect_loot_for',
+                                           calldata=[1, 3, user2.contract_address, user3.contract_address,
+                                                     user2.contract_address])
+    assert res.result.response == [1]
+    assert [await loot_balance(loot_token, u) for u in (user1, user2, user3, l2_keeper)] == [0, 30, 0, 0]
+
+    res = await l2_keeper.send_transaction(admiral.contract_address, 'collect_loot_for',
+                                           calldata=[1, 2, user1.contract_address, user2.contract_address])
+    assert res.result.response == [1]
+    assert await loot_balance(loot_token, user1) == 10
+    assert (await admiral.get_ship_status(1).call()).result.status == ShipStatus.FINALISED.value
+
+
+@pytest.mark.asyncio
+async def test_collect_loot_at_sea(admiral, l2_keeper, user1, user2):
+    await user1.deposit_into_ship(admiral, 100)
+    await l2_keeper.depart(admiral, 1)
+
+    with pytest.raises(Exception):
+        await collect_loot(user1, admiral, 1)
+    with pytest.raises(Exception):
+        await collect_loot(user1, admiral, 2)
@@ -0,0 +1,71 @@
+import pytest
+from starkware.starknet.testing.starknet import Starknet
+
+from conftest import ShipStatus
+
+
+async def ship_crew(admiral, ship_idx):
+    res = await admiral.get_ship_status(ship_idx).call()
+    return res.result.status, [(c.account, c.cargo.low) for c in res.result.crew]
+
+
+@pytest.mark.asyncio
+async def test_full_ship_is_sealed(starknet: Starknet, admiral, l2_keeper, user1, user2, user3):
+    await l2_keeper.send_transaction(admiral.contract_address, 'set_max_crew_size', calldata=[2])
+    assert (await admiral.get_max_crew_size().call()).result.max_size == 2
+
+    await user1.deposit_into_ship(admiral, 100)
+    await user2.deposit_into_ship(admiral, 100)
+    # Crew already on board can still add cargo
+    await user1.deposit_into_ship(admiral, 50)
+    assert (await admiral.get_open_ship_status().call()).result.ship_idx == 1
+
+    await user3.deposit_into_ship(admiral, 100)
+    assert await ship_crew(admiral, 1) == (ShipStatus.SEALED.value,
+                                           [(user1.contract_address, 150), (user2.contract_address, 100)])
+    res = await admiral.get_open_ship_status().call()
+    assert (res.result.ship_idx, res.result.status) == (2, ShipStatus.OPEN.value)
+    assert [(c.account, c.cargo.low) for c in res.result.crew] == [(user3.contract_address, 100)]
+
+    # Deposits from the sealed ship's crew go to the open ship
+    await user1.deposit_into_ship(admiral, 10)
+    assert await ship_crew(admiral, 2) == (ShipStatus.OPEN.value,
+                                           [(user3.contract_address, 100), (user1.contract_address, 10)])
+    res = await admiral.get_balances(user1.contract_address).call()
+    assert [(c.ship_idx, c.amount.low) for c in res.result.cargo] == [(2, 10), (1, 150)]
+
+    res = await admiral.get_fleet_page(0, 10, ShipStatus.SEALED.value).call()
+    assert [s.idx for s in res.result.ships] == [1]
+
+    # The sealed ship departs without opening another one, then the open ship departs
+    await user2.depart(admiral, 1)
+    assert (await admiral.get_ship_status(1).call()).result.status == ShipStatus.AT_SEA.value
+    assert (await admiral.get_open_ship_status().call()).result.ship_idx == 2
+    with pytest.raises(Exception):
+        await l2_keeper.depart(admiral, 1)
+
+    await l2_keeper.depart(admiral, 2)
+    assert (await admiral.get_open_ship_status().call()).result.ship_idx == 3
+    assert (await admiral.get_fleet_size().call()).result.count == 2
+
+
+@pytest.mark.asyncio
+async def test_lowered_crew_size(admiral, l2_keeper, user1, user2, user3):
+    await user1.deposit_into_ship(admiral, 100)
+    await user2.deposit_into_ship(admiral, 100)
+
+    # The ship has more crew than the new limit already, only new crew is turned away
+    await l2_keeper.send_transaction(admiral.contract_address, 'set_max_crew_size', calldata=[1])
+    await user1.deposit_into_ship(admiral, 100)
+    assert (await admiral.get_ship_status(1).call()).result.status == ShipStatus.OPEN.value
+    await user3.deposit_into_ship(admiral, 100)
+    assert (await admiral.get_ship_status(1).call()).result.status == ShipStatus.SEALED.value
+
+    # Without a limit the open ship takes everyone
+    await l2_keeper.send_transaction(admiral.contract_address, 'set_max_crew_size', calldata=[0])
+    await user1.deposit_into_ship(admiral, 100)
+    await user2.deposit_into_ship(admiral, 100)
+    assert len((await admiral.get_ship_status(2).call()).result.crew) == 3
+
+    with pytest.raises(Exception):
+        await user1.send_transaction(admiral.contract_address, 'set_max_crew_size', calldata=[1])
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+import pytest_asyncio
+
+from conftest import ShipStatus
+from cross_layer import (ARTIFACTS_DIR, CrossLayerSimulator, deploy_l2_admiral, is_depart_message,
+                         starkgate_withdrawal_payload)
+from l1_messages import build_depart_message_payload
+from snapshot import bind_handles
+
+
+@pytest_asyncio.fixture
+async def simulator(starknet, base_state):
+    if not os.path.isdir(ARTIFACTS_DIR):
+        pytest.skip("L1 contracts are not compiled, run `yarn compile:l1`")
+    return await CrossLayerSimulator.create(starknet, bind_handles(base_state, starknet))
+
+
+def test_starkgate_messages():
+    assert is_depart_message(build_depart_message_payload(3, 250))
+    assert not is_depart_message([250, 0])
+    assert starkgate_withdrawal_payload(0x42, 2**128 + 5) == [0, 0x42, 5, 1]
+
+
+@pytest.mark.asyncio
+async def test_fresh_admiral_takes_l1_address(starknet, base_state):
+    fleet = await deploy_l2_admiral(starknet, bind_handles(base_state, starknet))
+    admiral = fleet["admiral"]
+    assert admiral.contract_address != base_state["admiral"].contract_address
+    assert (await admiral.get_l1_contract_address().call()).result.address == 0
+
+    await fleet["l2_keeper"].send_transaction(admiral.contract_address, 'set_l1_conductor_address', calldata=[0x1234])
+    assert (await admiral.get_l1_contract_address().call()).result.address == 0x1234
+    await fleet["users"][0].deposit_into_ship(admiral, 100)
+
+
+@pytest.mark.asyncio
+async def test_round_trip(simulator):
+    fleet = simulator.fleet
+    admiral, loot_token = fleet["admiral"], fleet["loot_token"]
+
+    ship_idx = await simulator.round_trip({user: 100 for user in fleet["users"]})
+
+    assert (await admiral.get_ship_status(ship_idx).call()).result.status == ShipStatus.FINALISED.value
+    cargo_minus_fee = simulator.departed[ship_idx]
+    loot = [(await loot_token.balanceOf(user.contract_address).call()).result.balance.low for user in fleet["users"]]
+    # The mock DeFi contract swaps 1:1, the crew split the cargo they sent (rounded down)
+    assert cargo_minus_fee - len(loot) < sum(loot) <= cargo_minus_fee
+
+    summary = simulator.summary()
+    assert summary["l1:executeShipRides"]["calls"] == 1
+    assert summary["l2:deposit"]["calls"] == 3
+    assert summary["l2:l1_handler"]["cost"] > 0
+    assert simulator.total("l1") > 0
+
+    # Messages are relayed exactly once, the next ship goes around the same way
+    ship_idx = await simulator.round_trip({fleet["users"][0]: 50})
+    assert (await admiral.get_ship_status(ship_idx).call()).result.status == ShipStatus.FINALISED.value
+    assert simulator.summary()["l1:executeShipRides"]["calls"] == 2
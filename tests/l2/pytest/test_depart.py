@@ -1,10 +1,9 @@
 import pytest
 from starkware.starknet.testing.starknet import Starknet
-from starkware.starknet.public.abi import get_selector_from_name
 
 from open_zeppelin.utils import (uint)
 from conftest import L1_CONTRACT_ADDRESS
-L1_HANDLER_SELECTOR = get_selector_from_name("process_msg_from_l1")
+from l1_messages import L1_HANDLER_SELECTOR, build_depart_message_payload
 
 
 @pytest.mark.parametrize(
@@ -24,8 +23,6 @@ class TestDepartureSingleUser:
 
     @pytest.mark.asyncio
     async def test_depart_single_user(self, starknet: Starknet, admiral, cargo_token, starkgate, l2_keeper, user1, ships_config):
-        await l2_keeper.mint(cargo_token, user1, 2000)
-        await user1.approve(cargo_token, admiral.contract_address, 5000)
         total = 0
         fleet_size = 0
 
@@ -48,7 +45,8 @@ class TestDepartureSingleUser:
             await check_ship_details(admiral, 0, 0)
 
             print(f"Checking message was sent to L1")
-            starknet.consume_message_from_l2(admiral.contract_address, L1_CONTRACT_ADDRESS, [ship_cargo, 0])
+            starknet.consume_message_from_l2(admiral.contract_address, L1_CONTRACT_ADDRESS,
+                                             build_depart_message_payload(fleet_size, ship_cargo))
 
             print(f"Check active ships count is {fleet_size}")
             res = await admiral.get_fleet_size().call()
@@ -83,11 +81,6 @@ class TestDepartureMultipleUsers:
     async def test_three_users_single_deposits_single_departure(self, starknet, admiral, cargo_token, starkgate, l2_keeper, user1, user2, user3, ships_config):
         users = [user1, user2, user3]
 
-        for u in users:
-            await l2_keeper.mint(cargo_token, u, 5000)
-            await u.approve(cargo_token, admiral.contract_address, 5000)
-
-
         for (deposits, (starkgate_balance, oldest_ship_idx, active_ships_count)) in ships_config:
 
             ship_cargo = 0
@@ -105,7 +98,8 @@ class TestDepartureMultipleUsers:
             await check_ships_indices(admiral, oldest_ship_idx, active_ships_count)
 
             print(f"Checking message was sent to L1")
-            starknet.consume_message_from_l2(admiral.contract_address, L1_CONTRACT_ADDRESS, [ship_cargo, 0])
+            starknet.consume_message_from_l2(admiral.contract_address, L1_CONTRACT_ADDRESS,
+                                             build_depart_message_payload(ship_idx, ship_cargo))
 
             print(f"Check starkgate balance is {starkgate_balance}")
             res = await starkgate.balance(L1_CONTRACT_ADDRESS).call()
@@ -114,8 +108,6 @@ class TestDepartureMultipleUsers:
 @pytest.mark.asyncio
 async def test_depart_exceed_fleet_size(starknet, admiral, cargo_token, l2_keeper, user1):
     max_size = 2
-    await l2_keeper.mint(cargo_token, user1, 100000)
-    await user1.approve(cargo_token, admiral.contract_address, 100000)
     await l2_keeper.send_transaction(admiral.contract_address, 'set_max_fleet_size', calldata=[max_size])
 
     await user1.deposit_into_ship(admiral, 1000)
@@ -147,9 +139,6 @@ async def test_depart_exceed_fleet_size(starknet, admiral, cargo_token, l2_keepe
 
 @pytest.mark.asyncio
 async def test_depart_wrong_index(admiral, cargo_token, l2_keeper, user1):
-    await l2_keeper.mint(cargo_token, user1, 2000)
-    await user1.approve(cargo_token, admiral.contract_address, 5000)
-
     await user1.deposit_into_ship(admiral, 1000)
 
     with pytest.raises(Exception):
@@ -157,8 +146,6 @@ async def test_depart_wrong_index(admiral, cargo_token, l2_keeper, user1):
 
 @pytest.mark.asyncio
 async def test_depart_not_crew(admiral, cargo_token, l2_keeper, user1, user2):
-    await l2_keeper.mint(cargo_token, user1, 2000)
-    await user1.approve(cargo_token, admiral.contract_address, 5000)
     await user1.deposit_into_ship(admiral, 1000)
 
     with pytest.raises(Exception):
@@ -166,8 +153,6 @@ async def test_depart_not_crew(admiral, cargo_token, l2_keeper, user1, user2):
 
 @pytest.mark.asyncio
 async def test_depart_keeper(admiral, cargo_token, l2_keeper, user1):
-    await l2_keeper.mint(cargo_token, user1, 2000)
-    await user1.approve(cargo_token, admiral.contract_address, 5000)
     await user1.deposit_into_ship(admiral, 1000)
 
     await l2_keeper.depart(admiral, 1)
@@ -0,0 +1,58 @@
+import pytest
+from starkware.starknet.testing.starknet import Starknet
+
+from conftest import L1_CONTRACT_ADDRESS, ShipStatus
+from l1_messages import L1_HANDLER_SELECTOR, build_l1_message_handler_payload
+
+
+async def scan_fleet(admiral):
+    """Oldest active ship index and number of ships at sea, found by reading every ship."""
+    open_idx = (await admiral.get_open_ship_status().call()).result.ship_idx
+    statuses = [(await admiral.get_ship_status(idx).call()).result.status for idx in range(1, open_idx)]
+
+    oldest_idx = next((idx for idx, status in enumerate(statuses, 1) if status != ShipStatus.FINALISED.value),
+                      open_idx)
+    return oldest_idx, statuses.count(ShipStatus.AT_SEA.value)
+
+
+async def check_counters(admiral):
+    oldest_idx, at_sea = await scan_fleet(admiral)
+    assert (await admiral.get_oldest_active_ship_idx().call()).result.ship_idx == oldest_idx
+    assert (await admiral.get_fleet_size().call()).result.count == at_sea
+
+
+@pytest.mark.parametrize(
+    "ships,returns",
+    [
+        # ( [ departed ships ], [ ([returned ships], [unload order]) ] )
+        ([200, 250, 300, 350], [([200, 250], [200, 250]), ([300, 350], [300, 350])]),
+        ([200, 250, 300, 350], [([250, 300], [300, 250]), ([200, 350], [350, 200])]),
+        ([200, 250, 300, 350], [([350], [350]), ([250], [250]), ([200, 300], [200, 300])]),
+    ],
+    ids=[
+        "Returned and unloaded in order",
+        "Returned and unloaded out of order",
+        "Newest ships unloaded first",
+    ]
+)
+@pytest.mark.asyncio
+async def test_counters_match_scanned_fleet(starknet: Starknet, admiral, loot_token, l2_keeper, user1, ships, returns):
+    await check_counters(admiral)
+
+    for ship_idx, deposit in enumerate(ships, 1):
+        await user1.deposit_into_ship(admiral, deposit)
+        await check_counters(admiral)
+        await l2_keeper.depart(admiral, ship_idx)
+        await check_counters(admiral)
+
+    for returned, unload_order in returns:
+        await l2_keeper.mint(loot_token, admiral, 30)
+        payload = build_l1_message_handler_payload(returned, 30)
+        await starknet.send_message_to_l2(L1_CONTRACT_ADDRESS, admiral.contract_address, L1_HANDLER_SELECTOR, payload)
+        await check_counters(admiral)
+
+        for amount in unload_order:
+            await admiral.unload_ship(ships.index(amount) + 1).invoke()
+            await check_counters(admiral)
+
+    assert await scan_fleet(admiral) == (len(ships) + 1, 0)
@@ -0,0 +1,101 @@
+import pytest
+
+from differential import run_model, run_sequence
+from fleet_model import AT_SEA, FINALISED, OPEN, RETURNED, SEALED, FleetModel, FleetModelError
+from snapshot import bind_handles
+
+KEEPER = 1
+
+
+def returned_ship(crew_cargo, loot, price_per_ship=0):
+    model = FleetModel(KEEPER)
+    model.price_per_ship = price_per_ship
+    for account, cargo in crew_cargo.items():
+        model.deposit(account, cargo)
+    model.depart(KEEPER, 1)
+    model.return_ships([1], [model.ship_status(1)[0]], loot)
+    return model
+
+
+def test_collect_loot_moves_last_crew_member():
+    model = returned_ship({10: 100, 11: 200, 12: 300}, loot=1200)
+
+    model.collect_loot(10, 1)
+    assert model.ship_status(1) == (500, 0, RETURNED, [(12, 300), (11, 200)])
+    assert model.loot_paid == {10: 200}
+    assert model.balances(12) == [(1, 300)]
+
+    with pytest.raises(FleetModelError, match="No loot to collect"):
+        model.collect_loot(10, 1)
+
+
+def test_unload_pays_last_crew_member_first():
+    model = returned_ship({10 + i: 100 for i in range(7)}, loot=701)
+    model.unload_batch_size = 5
+
+    assert model.unload_ship(1)
+    assert model.ship_status(1)[3] == [(10, 100), (11, 100)]
+    assert sorted(model.loot_paid) == list(range(12, 17))
+    # Rounded down per crew member
+    assert set(model.loot_paid.values()) == {100}
+
+    assert model.unload_ship(1)
+    assert model.ship_status(1)[2] == FINALISED
+    assert model.oldest_active_ship_idx == 2
+    with pytest.raises(FleetModelError, match="finalised"):
+        model.unload_ship(1)
+
+
+def test_sealed_ships_and_status_index():
+    model = FleetModel(KEEPER)
+    model.max_crew_size = 1
+    model.deposit(10, 100)
+    assert model.deposit(11, 100) == 2
+    assert model.ships_with_status(SEALED) == [1]
+    assert model.ships_with_status(OPEN) == [2]
+
+    model.depart(KEEPER, 1)
+    model.return_ships_by_amount([100], 50)
+    model.depart(11, 2)
+    assert model.ships_with_status(RETURNED) == [1]
+    assert model.ships_with_status(AT_SEA) == [2]
+
+    model.unload_ships([], 10, to_ledger=True)
+    assert model.ships_with_status(RETURNED) == []
+    assert model.loot_owed == {10: 50}
+    model.withdraw_loot(10)
+    assert model.loot_paid == {10: 50}
+
+
+def test_last_crew_member_collects_after_fee():
+    # The fee comes off the ship's cargo but not off the crew's, the ship runs out before its crew
+    model = returned_ship({10: 100, 11: 200}, loot=300, price_per_ship=30)
+    model.collect_loot(10, 1)
+    assert model.ship_status(1) == (170, 30, RETURNED, [(11, 200)])
+
+    model.collect_loot(11, 1)
+    assert model.ship_status(1)[2] == FINALISED
+    assert model.loot_paid == {10: 100, 11: 200}
+
+
+def test_partial_batch_empties_ship_after_fee():
+    model = returned_ship({10: 10, 11: 10, 12: 100}, loot=120, price_per_ship=30)
+    model.unload_batch_size = 1
+
+    assert model.unload_ship(1)
+    assert model.ship_status(1) == (0, 30, RETURNED, [(10, 10), (11, 10)])
+    assert model.unload_ships([1], 5) == [(1, 2, 0)]
+    assert model.ship_status(1)[2] == FINALISED
+    assert model.loot_paid == {10: 10, 11: 10, 12: 100}
+
+
+def test_model_runs_long_sequences():
+    generated, modelled = run_model(2000, seed=0)
+    assert generated > 0 and modelled > 0
+
+
+@pytest.mark.asyncio
+async def test_contract_matches_model(starknet, base_state):
+    history = await run_sequence(starknet, bind_handles(base_state, starknet), ops=25, seed=0,
+                                 compare_every=5)
+    assert len(history) == 25
@@ -1,16 +1,14 @@
 import pytest
 
 from open_zeppelin.utils import (str_to_felt, uint)
-from conftest import ShipStatus
+from conftest import L1_CONTRACT_ADDRESS, ShipStatus, USER_CARGO_BALANCE
+from l1_messages import L1_INDEXED_HANDLER_SELECTOR, build_l1_indexed_message_handler_payload
 
 
 class TestGetAllActiveRides:
 
     @pytest.mark.asyncio
     async def test_finalize_enough_balance(self, admiral, cargo_token, l2_keeper, user1):
-        await l2_keeper.mint(cargo_token, user1, 5000)
-        await user1.approve(cargo_token, admiral.contract_address, 5000)
-
         # Deposit & depart
         await user1.deposit_into_ship(admiral, 50)
         await user1.depart(admiral, 1)
@@ -35,7 +33,7 @@ class TestGetAllActiveRides:
 
         res = await admiral.get_balances(user1.contract_address).call()
         print(f">>>>>> {res.result}")
-        assert uint(4870) == res.result.cargo_token_balance
+        assert uint(USER_CARGO_BALANCE - 130) == res.result.cargo_token_balance
         assert uint(0) == res.result.loot_token_balance
 
         assert 3 == len(res.result.cargo)
@@ -50,9 +48,6 @@ class TestGetAllActiveRides:
 
     @pytest.mark.asyncio
     async def test_get_metadata(self, admiral, cargo_token, l2_keeper, user1):
-        await l2_keeper.mint(cargo_token, user1, 5000)
-        await user1.approve(cargo_token, admiral.contract_address, 5000)
-
         res = await admiral.get_metadata().call()
         print(f">>>>>>> {res.result}")
 
@@ -71,3 +66,136 @@ def check_ship(ship, status: ShipStatus, cargo, crew):
     assert ship.status == status.value
     assert ship.cargo == uint(cargo)
     assert ship.crew == crew
+
+
+@pytest.mark.asyncio
+async def test_balances_follow_finalisation(starknet, admiral, cargo_token, loot_token, l2_keeper, user1, user2):
+    # user1 on ships 1, 2 and 3, user2 on ships 2 and 4 (open)
+    await user1.deposit_into_ship(admiral, 200)
+    await l2_keeper.depart(admiral, 1)
+    await user1.deposit_into_ship(admiral, 100)
+    await user2.deposit_into_ship(admiral, 150)
+    await l2_keeper.depart(admiral, 2)
+    await user1.deposit_into_ship(admiral, 300)
+    await user1.deposit_into_ship(admiral, 10)
+    await l2_keeper.depart(admiral, 3)
+    await user2.deposit_into_ship(admiral, 40)
+
+    await check_cargo(admiral, user1, [(3, 310), (2, 100), (1, 200)])
+    await check_cargo(admiral, user2, [(4, 40), (2, 150)])
+
+    print("Finalising the middle ship first")
+    await l2_keeper.mint(loot_token, admiral, 30)
+    payload = build_l1_indexed_message_handler_payload([2], [250], 30)
+    await starknet.send_message_to_l2(L1_CONTRACT_ADDRESS, admiral.contract_address, L1_INDEXED_HANDLER_SELECTOR, payload)
+    await admiral.unload_ship(2).invoke()
+
+    await check_cargo(admiral, user1, [(3, 310), (1, 200)])
+    await check_cargo(admiral, user2, [(4, 40)])
+
+    print("Finalising the oldest and newest ships")
+    payload = build_l1_indexed_message_handler_payload([1, 3], [200, 310], 0)
+    await starknet.send_message_to_l2(L1_CONTRACT_ADDRESS, admiral.contract_address, L1_INDEXED_HANDLER_SELECTOR, payload)
+    await admiral.unload_ship(3).invoke()
+    await check_cargo(admiral, user1, [(1, 200)])
+    await admiral.unload_ship(1).invoke()
+    await check_cargo(admiral, user1, [])
+
+    print("Joining a new ship after the others were finalised")
+    await user1.deposit_into_ship(admiral, 5)
+    await check_cargo(admiral, user1, [(4, 5)])
+    await check_cargo(admiral, user2, [(4, 40)])
+
+
+@pytest.mark.asyncio
+async def test_get_balances_of(admiral, cargo_token, l2_keeper, user1, user2, user3):
+    await user1.deposit_into_ship(admiral, 50)
+    await user2.deposit_into_ship(admiral, 20)
+    await l2_keeper.depart(admiral, 1)
+    await user2.deposit_into_ship(admiral, 30)
+
+    accounts = [user2, user3, user1]
+    res = await admiral.get_balances_of([a.contract_address for a in accounts]).call()
+    assert [b.account for b in res.result.balances] == [a.contract_address for a in accounts]
+    assert [b.cargo_len for b in res.result.balances] == [2, 0, 1]
+    assert [(c.ship_idx, c.amount) for c in res.result.cargo] == [(2, uint(30)), (1, uint(20)), (1, uint(50))]
+
+    for account, balances in zip(accounts, res.result.balances):
+        single = await admiral.get_balances(account.contract_address).call()
+        assert balances.cargo_token_balance == single.result.cargo_token_balance
+        assert balances.loot_token_balance == single.result.loot_token_balance
+
+
+async def check_cargo(admiral, account, expected):
+    res = await admiral.get_balances(account.contract_address).call()
+    assert [(c.ship_idx, c.amount) for c in res.result.cargo] == [(idx, uint(amount)) for idx, amount in expected]
+
+
+async def read_fleet_pages(admiral, limit, status=0, cursor=0):
+    ships = []
+    pages = 0
+    while True:
+        res = await admiral.get_fleet_page(cursor, limit, status).call()
+        assert len(res.result.ships) <= limit
+        ships += [(s.idx, s.ship.status) for s in res.result.ships]
+        pages += 1
+        cursor = res.result.next_cursor
+        if cursor == 0:
+            return ships, pages
+
+
+@pytest.mark.asyncio
+async def test_get_fleet_page(starknet, admiral, cargo_token, loot_token, l2_keeper, user1):
+    for ship_idx, deposit in enumerate([50, 60, 70, 80], 1):
+        await user1.deposit_into_ship(admiral, deposit)
+        await l2_keeper.depart(admiral, ship_idx)
+
+    payload = build_l1_indexed_message_handler_payload([1, 3], [50, 70], 0)
+    await starknet.send_message_to_l2(L1_CONTRACT_ADDRESS, admiral.contract_address, L1_INDEXED_HANDLER_SELECTOR, payload)
+    await admiral.unload_ship(1).invoke()
+
+    # Ship 1 is finalised, the fleet starts at ship 2 and ends with the open ship 5
+    fleet = [(2, ShipStatus.AT_SEA.value), (3, ShipStatus.RETURNED.value), (4, ShipStatus.AT_SEA.value),
+             (5, ShipStatus.OPEN.value)]
+    assert await read_fleet_pages(admiral, 10) == (fleet, 1)
+    assert await read_fleet_pages(admiral, 4) == (fleet, 1)
+    assert await read_fleet_pages(admiral, 3) == (fleet, 2)
+    assert await read_fleet_pages(admiral, 1) == (fleet, 4)
+    assert await read_fleet_pages(admiral, 1, cursor=4) == (fleet[2:], 2)
+
+    for status in (ShipStatus.OPEN, ShipStatus.AT_SEA, ShipStatus.RETURNED):
+        expected = [s for s in fleet if s[1] == status.value]
+        assert (await read_fleet_pages(admiral, 2, status.value))[0] == expected
+
+    res = await admiral.get_fleet_page(6, 2, 0).call()
+    assert (res.result.ships, res.result.next_cursor) == ([], 0)
+
+    with pytest.raises(Exception):
+        await admiral.get_fleet_page(0, 0, 0).call()
+    with pytest.raises(Exception):
+        await admiral.get_fleet_page(0, 2, 5).call()
+
+
+@pytest.mark.asyncio
+async def test_get_ship_crew(admiral, cargo_token, user1, user2, user3):
+    users = [user1, user2, user3]
+    for i, user in enumerate(users, 1):
+        await user.deposit_into_ship(admiral, 10 * i)
+    expected = [(u.contract_address, uint(10 * i)) for i, u in enumerate(users, 1)]
+
+    for limit in (1, 2, 3, 5):
+        crew = []
+        cursor = 0
+        while True:
+            res = await admiral.get_ship_crew(1, cursor, limit).call()
+            assert len(res.result.crew) <= limit
+            crew += [(c.account, c.cargo) for c in res.result.crew]
+            cursor = res.result.next_cursor
+            if cursor == 0:
+                break
+        assert crew == expected
+
+    res = await admiral.get_ship_crew(1, 3, 2).call()
+    assert (res.result.crew, res.result.next_cursor) == ([], 0)
+    res = await admiral.get_ship_crew(2, 0, 2).call()
+    assert (res.result.crew, res.result.next_cursor) == ([], 0)
@@ -0,0 +1,92 @@
+import pytest
+from starkware.starknet.testing.starknet import Starknet
+
+from conftest import L1_CONTRACT_ADDRESS
+from l1_messages import (L1_HANDLER_SELECTOR, L1_INDEXED_HANDLER_SELECTOR, build_l1_message_handler_payload,
+                         build_l1_indexed_message_handler_payload)
+from voyages import sail
+
+FINALISED = 0
+AT_SEA = 2
+RETURNED = 3
+
+
+async def ship_statuses(admiral, count):
+    return [(await admiral.get_ship_status(idx).call()).result.status for idx in range(1, count + 1)]
+
+
+@pytest.mark.asyncio
+async def test_return_ships_with_same_cargo_by_index(starknet: Starknet, admiral, loot_token, l2_keeper, user1):
+    await sail(admiral, l2_keeper, [[(user1, 200)], [(user1, 200)], [(user1, 200)]])
+
+    print("Returning the newest of three ships with the same cargo")
+    await l2_keeper.mint(loot_token, admiral, 30)
+    payload = build_l1_indexed_message_handler_payload([3], [200], 30)
+    await starknet.send_message_to_l2(L1_CONTRACT_ADDRESS, admiral.contract_address, L1_INDEXED_HANDLER_SELECTOR, payload)
+    assert await ship_statuses(admiral, 3) == [AT_SEA, AT_SEA, RETURNED]
+
+    await admiral.unload_ship(3).invoke()
+    assert await ship_statuses(admiral, 3) == [AT_SEA, AT_SEA, FINALISED]
+    assert (await loot_token.balanceOf(user1.contract_address).call()).result.balance.low == 30
+
+    print("Returning the two others in reverse order")
+    await l2_keeper.mint(loot_token, admiral, 60)
+    payload = build_l1_indexed_message_handler_payload([2, 1], [200, 200], 60)
+    await starknet.send_message_to_l2(L1_CONTRACT_ADDRESS, admiral.contract_address, L1_INDEXED_HANDLER_SELECTOR, payload)
+    assert await ship_statuses(admiral, 3) == [RETURNED, RETURNED, FINALISED]
+    assert (await admiral.get_fleet_size().call()).result.count == 0
+
+
+@pytest.mark.asyncio
+async def test_old_and_new_message_formats(starknet: Starknet, admiral, loot_token, l2_keeper, user1):
+    await sail(admiral, l2_keeper, [[(user1, 200)], [(user1, 250)]])
+
+    payload = build_l1_message_handler_payload([250], 30)
+    await starknet.send_message_to_l2(L1_CONTRACT_ADDRESS, admiral.contract_address, L1_HANDLER_SELECTOR, payload)
+    payload = build_l1_indexed_message_handler_payload([1], [200], 30)
+    await starknet.send_message_to_l2(L1_CONTRACT_ADDRESS, admiral.contract_address, L1_INDEXED_HANDLER_SELECTOR, payload)
+
+    assert await ship_statuses(admiral, 2) == [RETURNED, RETURNED]
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        build_l1_indexed_message_handler_payload([1], [250], 30),
+        build_l1_indexed_message_handler_payload([1, 1], [200, 200], 30),
+        build_l1_indexed_message_handler_payload([1, 2], [200], 30),
+        build_l1_indexed_message_handler_payload([3], [0], 30),
+        build_l1_indexed_message_handler_payload([1], [200], 30, version=2),
+    ],
+    ids=[
+        "cargo does not match the ship",
+        "same ship returned twice",
+        "more indexes than cargo",
+        "open ship",
+        "unknown version",
+    ]
+)
+@pytest.mark.asyncio
+async def test_invalid_indexed_message(starknet: Starknet, admiral, l2_keeper, user1, payload):
+    await sail(admiral, l2_keeper, [[(user1, 200)], [(user1, 250)]])
+
+    with pytest.raises(Exception):
+        await starknet.send_message_to_l2(L1_CONTRACT_ADDRESS, admiral.contract_address, L1_INDEXED_HANDLER_SELECTOR,
+                                          payload)
+
+    assert await ship_statuses(admiral, 2) == [AT_SEA, AT_SEA]
+
+
+@pytest.mark.asyncio
+async def test_l1_admiral_return_message_layout(starknet: Starknet, admiral, loot_token, l2_keeper, user1):
+    await sail(admiral, l2_keeper, [[(user1, 50)], [(user1, 50)], [(user1, 20)]])
+
+    # The payload as L1Admiral.sendReturnMessage lays it out word by word (see "should execute ship rides and
+    # echo the ship indexes to L2" in tests/l1/L1Admiral.ts): version, ship count, ship indexes, amount count,
+    # amounts, payout and gas used, every uint256 as low and high
+    payload = [1, 3, 2, 1, 3, 3, 50, 0, 50, 0, 20, 0, 120, 0, 37000, 0]
+    assert payload == build_l1_indexed_message_handler_payload([2, 1, 3], [50, 50, 20], 120)
+
+    await l2_keeper.mint(loot_token, admiral, 120)
+    await starknet.send_message_to_l2(L1_CONTRACT_ADDRESS, admiral.contract_address, L1_INDEXED_HANDLER_SELECTOR, payload)
+    assert await ship_statuses(admiral, 3) == [RETURNED, RETURNED, RETURNED]
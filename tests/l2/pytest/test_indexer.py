@@ -0,0 +1,101 @@
+import pytest
+from starkware.starknet.testing.starknet import Starknet
+
+from conftest import L1_CONTRACT_ADDRESS, ShipStatus
+from indexer import Indexer
+from l1_messages import L1_INDEXED_HANDLER_SELECTOR, build_l1_indexed_message_handler_payload
+from open_zeppelin.utils import from_uint, uint
+
+
+async def assert_matches_contract(indexer, admiral, loot_token, users):
+    assert indexer.open_ship_idx() == (await admiral.get_open_ship_status().call()).result.ship_idx
+    assert indexer.oldest_active_ship_idx() == (await admiral.get_oldest_active_ship_idx().call()).result.ship_idx
+    assert indexer.fleet_size() == (await admiral.get_fleet_size().call()).result.count
+
+    for ship_idx in range(1, indexer.open_ship_idx() + 1):
+        res = (await admiral.get_ship_status(ship_idx).call()).result
+        assert indexer.ship_status(ship_idx) == (from_uint(res.ship_cargo), from_uint(res.fee_taken), res.status,
+                                                 [(c.account, from_uint(c.cargo)) for c in res.crew])
+
+    for user in users:
+        res = (await admiral.get_balances(user.contract_address).call()).result
+        assert indexer.balances(user.contract_address) == [(c.ship_idx, from_uint(c.amount)) for c in res.cargo]
+        owed = (await admiral.get_loot_owed(user.contract_address).call()).result.loot
+        loot = (await loot_token.balanceOf(user.contract_address).call()).result.balance
+        assert indexer.position(user.contract_address)[1] == from_uint(loot) + from_uint(owed)
+
+
+@pytest.mark.asyncio
+async def test_index_follows_the_fleet(starknet: Starknet, admiral, loot_token, l2_keeper, user1, user2, user3,
+                                       tmp_path):
+    db_path = str(tmp_path / "fleet.db")
+    users = [user1, user2, user3]
+    await l2_keeper.send_transaction(admiral.contract_address, 'set_max_crew_size', calldata=[2])
+    await l2_keeper.send_transaction(admiral.contract_address, 'set_unload_batch_size', calldata=[1])
+
+    # The third crew member seals ship 1 and opens ship 2
+    await user1.deposit_into_ship(admiral, 100)
+    await user2.deposit_into_ship(admiral, 200)
+    await user3.deposit_into_ship(admiral, 300)
+    await user1.deposit_into_ship(admiral, 50)
+
+    indexer = Indexer(db_path, admiral.contract_address)
+    assert indexer.sync(starknet.state.events) == 4
+    assert indexer.ships_with_status(ShipStatus.SEALED.value) == [1]
+    assert indexer.position(user1.contract_address) == (150, 0)
+    await assert_matches_contract(indexer, admiral, loot_token, users)
+    indexer.close()
+
+    await l2_keeper.depart(admiral, 1)
+    await l2_keeper.depart(admiral, 2)
+    await l2_keeper.mint(loot_token, admiral, 1300)
+    payload = build_l1_indexed_message_handler_payload([1, 2], [300, 350], 1300)
+    await starknet.send_message_to_l2(L1_CONTRACT_ADDRESS, admiral.contract_address, L1_INDEXED_HANDLER_SELECTOR,
+                                      payload)
+
+    # user2 takes user1's slot, then the batch of one pays out user1 on ship 2 (the last crew member)
+    await user1.send_transaction(admiral.contract_address, 'collect_loot', [1])
+    await l2_keeper.send_transaction(admiral.contract_address, 'unload_ship', [2])
+
+    # Reopened on the same database the index resumes from its checkpoint
+    indexer = Indexer(db_path, admiral.contract_address)
+    checkpoint = indexer.checkpoint
+    assert indexer.sync(starknet.state.events) == 7
+    assert indexer.checkpoint == len(starknet.state.events) > checkpoint
+    assert indexer.ships_with_status(ShipStatus.RETURNED.value) == [1, 2]
+    await assert_matches_contract(indexer, admiral, loot_token, users)
+
+    await l2_keeper.send_transaction(admiral.contract_address, 'unload_ships_to_ledger', [0, 5])
+    await user1.deposit_into_ship(admiral, 10)
+    assert indexer.sync(starknet.state.events) == 3
+    assert indexer.sync(starknet.state.events) == 0
+    assert [ship[0] for ship in indexer.fleet()] == [3]
+    # 650 cargo for 1300 loot
+    assert indexer.position(user1.contract_address) == (160, 300)
+    assert indexer.position(user2.contract_address) == (200, 400)
+    await assert_matches_contract(indexer, admiral, loot_token, users)
+
+
+@pytest.mark.asyncio
+async def test_index_empties_ship_after_fee(starknet: Starknet, admiral, loot_token, l2_keeper, user1, user2, user3,
+                                            tmp_path):
+    users = [user1, user2, user3]
+    await l2_keeper.send_transaction(admiral.contract_address, 'set_unload_batch_size', calldata=[1])
+    await l2_keeper.send_transaction(admiral.contract_address, 'set_price_per_ship', calldata=[*uint(30)])
+    await user1.deposit_into_ship(admiral, 10)
+    await user2.deposit_into_ship(admiral, 10)
+    await user3.deposit_into_ship(admiral, 100)
+    await l2_keeper.depart(admiral, 1)
+    await l2_keeper.mint(loot_token, admiral, 120)
+    payload = build_l1_indexed_message_handler_payload([1], [90], 120)
+    await starknet.send_message_to_l2(L1_CONTRACT_ADDRESS, admiral.contract_address, L1_INDEXED_HANDLER_SELECTOR,
+                                      payload)
+
+    # user3 leaves with more cargo than the fee left on the ship
+    await l2_keeper.send_transaction(admiral.contract_address, 'unload_ship', [1])
+    await user1.send_transaction(admiral.contract_address, 'collect_loot', [1])
+
+    indexer = Indexer(str(tmp_path / "fleet.db"), admiral.contract_address)
+    indexer.sync(starknet.state.events)
+    assert indexer.ship_status(1) == (0, 30, ShipStatus.RETURNED.value, [(user2.contract_address, 10)])
+    await assert_matches_contract(indexer, admiral, loot_token, users)
@@ -0,0 +1,71 @@
+import pytest
+from starkware.starknet.public.abi import get_storage_var_address
+from starkware.starknet.storage.starknet_storage import StorageLeaf
+from starkware.starknet.testing.starknet import Starknet
+
+from conftest import ShipStatus
+from open_zeppelin.utils import from_uint, to_uint
+from state_diff import track
+
+WIDE_AMOUNT = 2 ** 128 + 5
+
+
+async def ship_cargo(admiral, ship_idx):
+    res = await admiral.get_ship_status(ship_idx).call()
+    return [(c.account, from_uint(c.cargo)) for c in res.result.crew], res.result
+
+
+@pytest.mark.asyncio
+async def test_amounts_too_large_to_pack(admiral, cargo_token, l2_keeper, user1, user2):
+    await l2_keeper.send_transaction(cargo_token.contract_address, 'mint',
+                                     [user1.contract_address, *to_uint(WIDE_AMOUNT)])
+    await user1.send_transaction(cargo_token.contract_address, 'approve',
+                                 [admiral.contract_address, *to_uint(WIDE_AMOUNT)])
+
+    await user2.deposit_into_ship(admiral, 100)
+    await user1.send_transaction(admiral.contract_address, 'deposit', [*to_uint(WIDE_AMOUNT)])
+    await user2.deposit_into_ship(admiral, 100)
+
+    crew, ship = await ship_cargo(admiral, 1)
+    assert crew == [(user2.contract_address, 200), (user1.contract_address, WIDE_AMOUNT)]
+    assert from_uint(ship.ship_cargo) == WIDE_AMOUNT + 200
+    assert ship.status == ShipStatus.OPEN.value
+
+    await l2_keeper.depart(admiral, 1)
+    _, ship = await ship_cargo(admiral, 1)
+    assert from_uint(ship.ship_cargo) == WIDE_AMOUNT + 200
+    assert (ship.status, len(ship.crew)) == (ShipStatus.AT_SEA.value, 2)
+
+
+@pytest.mark.asyncio
+async def test_records_written_before_packing(starknet: Starknet, admiral, user1, user2):
+    await user1.deposit_into_ship(admiral, 100)
+
+    # Put ship 1 and user1's crew record back into the wide layout the previous contract wrote
+    packed_ship = get_storage_var_address("sv_fleet_packed", 1)
+    packed_crew = get_storage_var_address("sv_crew_packed", 1, user1.contract_address)
+    wide_ship = get_storage_var_address("sv_fleet", 1)
+    wide_crew = get_storage_var_address("sv_crew_cargo", 1, user1.contract_address)
+    legacy = {
+        packed_ship: 0, packed_ship + 1: 0, packed_crew: 0,
+        # Ship(cargo=100, fee_taken=0, crew=1, status=OPEN), Crew(idx=0, cargo=100)
+        wide_ship: 100, wide_ship + 4: 1, wide_ship + 5: ShipStatus.OPEN.value,
+        wide_crew + 1: 100,
+    }
+    starknet.state.state.update_contract_storage(admiral.contract_address,
+                                                 {key: StorageLeaf(value) for key, value in legacy.items()})
+
+    crew, ship = await ship_cargo(admiral, 1)
+    assert crew == [(user1.contract_address, 100)]
+    assert (ship.ship_cargo.low, ship.status) == (100, ShipStatus.OPEN.value)
+
+    # The next write moves the records to the packed layout
+    with track() as diff:
+        await user1.deposit_into_ship(admiral, 50)
+        await user2.deposit_into_ship(admiral, 50)
+    assert diff.writes[(admiral.contract_address, packed_crew)][0] == 0
+    assert diff.writes[(admiral.contract_address, packed_ship)][0] == 0
+
+    crew, ship = await ship_cargo(admiral, 1)
+    assert crew == [(user1.contract_address, 150), (user2.contract_address, 50)]
+    assert (ship.ship_cargo.low, ship.status) == (200, ShipStatus.OPEN.value)
@@ -0,0 +1,34 @@
+from resource_gate import compare
+
+BASELINE = {
+    "L2Admiral.deposit": {"calls": 2, "n_steps": 1000, "n_memory_holes": 50, "storage_keys": 8,
+                          "builtins": {"pedersen_builtin": 10, "range_check_builtin": 40}},
+}
+
+
+def resources(n_steps=1000, n_memory_holes=50, storage_keys=8, **builtins):
+    return {"calls": 1, "n_steps": n_steps, "n_memory_holes": n_memory_holes, "storage_keys": storage_keys,
+            "builtins": {"pedersen_builtin": 10, "range_check_builtin": 40, **builtins}}
+
+
+def test_within_tolerance():
+    assert compare(BASELINE, {"L2Admiral.deposit": resources(n_steps=1020)}, 0.02) == []
+    assert compare(BASELINE, {"L2Admiral.deposit": resources(n_steps=900, n_memory_holes=10)}, 0.02) == []
+
+
+def test_regressions():
+    regressions = compare(BASELINE, {"L2Admiral.deposit": resources(n_steps=1021, storage_keys=9,
+                                                                     pedersen_builtin=11)}, 0.02)
+    assert regressions == [
+        "L2Admiral.deposit n_steps: 1021 > 1000 (baseline) + 2%",
+        "L2Admiral.deposit storage_keys: 9 > 8 (baseline) + 2%",
+        "L2Admiral.deposit pedersen_builtin: 11 > 10 (baseline) + 2%",
+    ]
+
+
+def test_new_builtin_and_entry_point():
+    assert compare(BASELINE, {"L2Admiral.deposit": resources(bitwise_builtin=1)}, 0.02) == [
+        "L2Admiral.deposit bitwise_builtin: 1 > 0 (baseline) + 2%",
+    ]
+    # Entry points the baseline has never seen for this test are not gated
+    assert compare(BASELINE, {"L2Admiral.depart": resources(n_steps=10 ** 6)}, 0.02) == []
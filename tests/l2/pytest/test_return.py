@@ -1,16 +1,14 @@
 import pytest
 from starkware.starknet.testing.starknet import Starknet
-from starkware.starknet.public.abi import get_selector_from_name
 
 from conftest import L1_CONTRACT_ADDRESS
+from l1_messages import L1_HANDLER_SELECTOR, build_l1_message_handler_payload
 
 FINALISED = 0
 OPEN = 1
 AT_SEA = 2
 RETURNED = 3
 
-L1_HANDLER_SELECTOR = get_selector_from_name("process_msg_from_l1")
-
 
 @pytest.mark.parametrize(
     "ships,finalisations",
@@ -43,9 +41,6 @@ class TestFinalizeHasBalance:
 
     @pytest.mark.asyncio
     async def test_finalize_enough_balance(self, starknet: Starknet, admiral, cargo_token, loot_token, l2_keeper, user1, ships, finalisations):
-        await l2_keeper.mint(cargo_token, user1, 2000)
-        await user1.approve(cargo_token, admiral.contract_address, 5000)
-
         fleet_size = 0
         for deposit in ships:
             print(f"Depositing {deposit} into ship and departing")
@@ -97,9 +92,6 @@ class TestReturn:
 
     @pytest.mark.asyncio
     async def test_finalize_insufficient_balance(self, starknet: Starknet, admiral, cargo_token, loot_token, l2_keeper, user1, ships, return_messages, finalisations):
-        await l2_keeper.mint(cargo_token, user1, 2000)
-        await user1.approve(cargo_token, admiral.contract_address, 5000)
-
         fleet = []
         for deposit in ships:
             print(f"Depositing {deposit} into ship and departing")
@@ -162,12 +154,6 @@ class TestReturn:
 async def test_finalise_exceed_batch_size(starknet, admiral, cargo_token, l2_keeper, loot_token, user1, user2, user3):
     print(f"Setup")
     await l2_keeper.send_transaction(admiral.contract_address, 'set_unload_batch_size', calldata=[2])
-    await l2_keeper.mint(cargo_token, user1, 2000)
-    await l2_keeper.mint(cargo_token, user2, 2000)
-    await l2_keeper.mint(cargo_token, user3, 2000)
-    await user1.approve(cargo_token, admiral.contract_address, 5000)
-    await user2.approve(cargo_token, admiral.contract_address, 5000)
-    await user3.approve(cargo_token, admiral.contract_address, 5000)
 
     print(f"Deposit from three users")
     await user1.deposit_into_ship(admiral, 150)
@@ -219,13 +205,6 @@ async def test_finalise_exceed_batch_size(starknet, admiral, cargo_token, l2_kee
 @pytest.mark.asyncio
 async def test_finalise_less_than_batch_size(starknet, admiral, cargo_token, l2_keeper, loot_token, user1, user2, user3):
     print(f"Setup")
-    await l2_keeper.mint(cargo_token, user1, 2000)
-    await l2_keeper.mint(cargo_token, user2, 2000)
-    await l2_keeper.mint(cargo_token, user3, 2000)
-    await user1.approve(cargo_token, admiral.contract_address, 5000)
-    await user2.approve(cargo_token, admiral.contract_address, 5000)
-    await user3.approve(cargo_token, admiral.contract_address, 5000)
-
     print(f"Deposit from three users")
     await user1.deposit_into_ship(admiral, 150)
     await user2.deposit_into_ship(admiral, 200)
@@ -263,17 +242,3 @@ async def check_ships_indices(admiral, oldest_idx: int, active_count: int):
     active_ships_count = await admiral.get_fleet_size().call()
     assert oldest_active_idx.result.ship_idx == oldest_idx
     assert active_ships_count.result.count == active_count
-
-
-def build_l1_message_handler_payload(amounts: list[int], payout: int):
-    payload = [len(amounts)]
-    for x in amounts:
-        payload.append(x)
-        payload.append(0)
-    payload.append(payout)
-    payload.append(0)
-    payload.append(37000) # Gas Used
-    payload.append(0)
-
-
-    return payload
@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from conftest import ShipStatus
+from open_zeppelin.utils import uint
+from scenarios import CREW_DEPOSIT, scenario_file
+
+
+@pytest.mark.asyncio
+async def test_small_fleet_scenario(scenario, base_state):
+    starknet, fleet = await scenario("small_fleet")
+    assert os.path.isfile(scenario_file("small_fleet", base_state))
+
+    res = await fleet["admiral"].get_fleet_size().call()
+    assert res.result.count == 2
+
+    res = await fleet["admiral"].get_fleet().call()
+    assert [ship.status for ship in res.result.ships] == [ShipStatus.AT_SEA.value, ShipStatus.AT_SEA.value, ShipStatus.OPEN.value]
+    assert res.result.ships[0].crew == len(fleet["crew"])
+    assert res.result.ships[0].cargo == uint(CREW_DEPOSIT * len(fleet["crew"]))
+
+    # The loaded handles can keep transacting on the scenario
+    await fleet["crew"][0].deposit_into_ship(fleet["admiral"], CREW_DEPOSIT)
+    await fleet["l2_keeper"].depart(fleet["admiral"], 3)
+    res = await fleet["admiral"].get_fleet_size().call()
+    assert res.result.count == 3
+
+
+@pytest.mark.asyncio
+async def test_scenario_snapshots_are_isolated(scenario):
+    starknet, fleet = await scenario("small_fleet")
+    await fleet["crew"][0].deposit_into_ship(fleet["admiral"], CREW_DEPOSIT)
+    await fleet["l2_keeper"].depart(fleet["admiral"], 3)
+
+    starknet, fleet = await scenario("small_fleet")
+    res = await fleet["admiral"].get_fleet_size().call()
+    assert res.result.count == 2
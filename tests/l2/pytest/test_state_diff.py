@@ -0,0 +1,48 @@
+import pytest
+from starkware.starknet.public.abi import get_storage_var_address
+
+from state_diff import track
+
+# PACKED_PRESENT flag of a packed crew record
+FLAGS = 2 ** 200
+
+
+@pytest.mark.asyncio
+async def test_deposit_state_diff(admiral, cargo_token, user1):
+    with track() as first:
+        await user1.deposit_into_ship(admiral, 100)
+
+    # First contribution: crew list entry, crew record and the account's newest ship are new
+    # slots, the packed ship record (cargo and crew count) is updated
+    assert first.keys_changed_by(admiral.contract_address) == 4
+    # Both balances and the allowance
+    assert first.keys_changed_by(cargo_token.contract_address) == 3
+    # The nonce
+    assert first.keys_changed_by(user1.contract_address) == 1
+    assert (first.new_keys, first.overwritten_keys) == (4, 4)
+    assert first.modified_contracts == 3
+    assert first.da_felts == 2 * 3 + 2 * 8
+
+    with track() as second:
+        await user1.deposit_into_ship(admiral, 100)
+
+    # Crew and ship cargo are only updated
+    assert second.keys_changed_by(admiral.contract_address) == 2
+    assert (second.new_keys, second.overwritten_keys) == (0, 6)
+    assert second.da_gas < first.da_gas
+
+
+@pytest.mark.asyncio
+async def test_nested_tracking(admiral, user1):
+    with track() as outer:
+        await user1.deposit_into_ship(admiral, 100)
+        with track() as inner:
+            await user1.deposit_into_ship(admiral, 50)
+
+    # The outer diff keeps the value from before its first write
+    assert outer.keys_changed == 8
+    assert inner.keys_changed == 6
+    key = (admiral.contract_address, get_storage_var_address("sv_crew_packed", 1, user1.contract_address))
+    assert outer.writes[key][0] == 0
+    assert inner.writes[key][0] == outer.writes[key][0] + 100 + FLAGS
+    assert inner.writes[key][1] == outer.writes[key][1] == 150 + FLAGS
@@ -0,0 +1,59 @@
+import pytest
+from starkware.starknet.testing.starknet import Starknet
+
+from conftest import ShipStatus
+from voyages import loot_balance, return_ships, sail
+
+
+@pytest.mark.asyncio
+async def test_unload_returned_ships_oldest_first(starknet: Starknet, admiral, loot_token, l2_keeper, user1, user2, user3):
+    cargo = await sail(admiral, l2_keeper, [
+        [(user1, 100), (user2, 100), (user3, 200)],
+        [(user1, 300), (user2, 100)],
+        [(user3, 400)],
+        [(user1, 50)],
+    ])
+    await return_ships(starknet, admiral, loot_token, l2_keeper, [1, 2, 3], cargo, 1200)
+
+    res = await admiral.unload_ships([], 4).invoke()
+    assert [(p.ship_idx, p.crew_unloaded, p.crew_remaining) for p in res.result.progress] == [(1, 3, 0), (2, 1, 1)]
+    assert (await admiral.get_ship_status(1).call()).result.status == ShipStatus.FINALISED.value
+    assert (await admiral.get_ship_status(2).call()).result.status == ShipStatus.RETURNED.value
+    assert (await admiral.get_oldest_active_ship_idx().call()).result.ship_idx == 2
+
+    res = await admiral.unload_ships([], 10).invoke()
+    assert [(p.ship_idx, p.crew_unloaded, p.crew_remaining) for p in res.result.progress] == [(2, 1, 0), (3, 1, 0)]
+    # Ship 4 is still at sea
+    assert (await admiral.get_oldest_active_ship_idx().call()).result.ship_idx == 4
+
+    # Loot is split by cargo over the 1200 cargo returned together
+    assert await loot_balance(loot_token, user1) == 100 + 300
+    assert await loot_balance(loot_token, user2) == 100 + 100
+    assert await loot_balance(loot_token, user3) == 200 + 400
+
+    res = await admiral.unload_ships([], 10).invoke()
+    assert res.result.progress == []
+
+
+@pytest.mark.asyncio
+async def test_unload_listed_ships(starknet: Starknet, admiral, loot_token, l2_keeper, user1, user2, user3):
+    cargo = await sail(admiral, l2_keeper, [
+        [(user1, 100), (user2, 100)],
+        [(user1, 100), (user2, 100), (user3, 100)],
+        [(user3, 100)],
+    ])
+    await return_ships(starknet, admiral, loot_token, l2_keeper, [2, 3], cargo, 0)
+
+    # Ship 1 is at sea and skipped, the newest ships are unloaded in the order given
+    res = await admiral.unload_ships([1, 3, 2], 3).invoke()
+    assert [(p.ship_idx, p.crew_unloaded, p.crew_remaining) for p in res.result.progress] == [(3, 1, 0), (2, 2, 1)]
+    assert (await admiral.get_oldest_active_ship_idx().call()).result.ship_idx == 1
+
+    await return_ships(starknet, admiral, loot_token, l2_keeper, [1], cargo, 0)
+    res = await admiral.unload_ships([2, 1], 5).invoke()
+    assert [(p.ship_idx, p.crew_unloaded, p.crew_remaining) for p in res.result.progress] == [(2, 1, 0), (1, 2, 0)]
+    assert (await admiral.get_oldest_active_ship_idx().call()).result.ship_idx == 4
+    assert (await admiral.get_fleet_size().call()).result.count == 0
+
+    with pytest.raises(Exception):
+        await admiral.unload_ships([], 0).invoke()
@@ -0,0 +1,65 @@
+import pytest
+from starkware.starknet.definitions.general_config import DEFAULT_MAX_STEPS
+from starkware.starknet.testing.starknet import Starknet
+
+from calibrate_unload import fit, measure
+from conftest import ShipStatus
+from snapshot import bind_handles
+from state_diff import track
+from voyages import loot_balance, return_ships, sail
+
+
+async def loot_owed(admiral, user):
+    return (await admiral.get_loot_owed(user.contract_address).call()).result.loot.low
+
+
+@pytest.mark.asyncio
+async def test_ledger_pays_the_same_as_transfers(starknet: Starknet, admiral, loot_token, l2_keeper, user1, user2, user3):
+    crew = [(user1, 100), (user2, 300), (user3, 600)]
+    cargo = await sail(admiral, l2_keeper, [crew, crew, [(user1, 200)]])
+    await return_ships(starknet, admiral, loot_token, l2_keeper, [1, 2, 3], cargo, 2200)
+
+    with track() as pushed_diff:
+        pushed = await admiral.unload_ships([1], 3).invoke()
+    with track() as credited_diff:
+        credited = await admiral.unload_ships_to_ledger([2], 3).invoke()
+    assert [(p.ship_idx, p.crew_unloaded, p.crew_remaining) for p in credited.result.progress] == [(2, 3, 0)]
+    await admiral.unload_ships_to_ledger([], 5).invoke()
+    assert [(await admiral.get_ship_status(idx).call()).result.status for idx in (1, 2, 3)] == \
+           [ShipStatus.FINALISED.value] * 3
+    assert (await admiral.get_oldest_active_ship_idx().call()).result.ship_idx == 4
+
+    # Ship 1 was transferred, ships 2 and 3 are owed
+    assert [await loot_balance(loot_token, u) for u in (user1, user2, user3)] == [100, 300, 600]
+    assert [await loot_owed(admiral, u) for u in (user1, user2, user3)] == [100 + 200, 300, 600]
+
+    # Crediting the crew does not touch the loot token
+    assert credited_diff.keys_changed_by(loot_token.contract_address) == 0
+    assert credited_diff.keys_changed < pushed_diff.keys_changed
+
+    await user1.send_transaction(admiral.contract_address, 'withdraw_loot', calldata=[])
+    assert await loot_balance(loot_token, user1) == 100 + 300
+    assert await loot_owed(admiral, user1) == 0
+    with pytest.raises(Exception):
+        await user1.send_transaction(admiral.contract_address, 'withdraw_loot', calldata=[])
+
+    res = await l2_keeper.send_transaction(admiral.contract_address, 'withdraw_loot_for',
+                                           calldata=[3, user1.contract_address, user2.contract_address,
+                                                     user3.contract_address])
+    assert res.result.response == [2]
+    assert [await loot_balance(loot_token, u) for u in (user1, user2, user3)] == [400, 600, 1200]
+    assert (await loot_token.balanceOf(admiral.contract_address).call()).result.balance.low == 0
+
+
+@pytest.mark.asyncio
+async def test_ledger_settles_more_crew_per_transaction(starknet, base_state):
+    fleet = bind_handles(base_state, starknet)
+    pushed = fit(await measure(starknet, fleet, [1, 3], "unload_ships"))
+    credited = fit(await measure(starknet, fleet, [1, 3], "unload_ships_to_ledger"))
+
+    # Without a loot token transfer per crew member a transaction within the Starknet step limit
+    # settles over a fifth more crew
+    pushed_crew = pushed.batch_size(DEFAULT_MAX_STEPS)
+    credited_crew = credited.batch_size(DEFAULT_MAX_STEPS)
+    assert credited_crew * 5 >= pushed_crew * 6, \
+        f"unload_ships_to_ledger settles {credited_crew} crew per transaction, unload_ships {pushed_crew}"
@@ -0,0 +1,36 @@
+"""Sailing ships out of a fresh fleet and bringing them back, shared by the unload and loot tests."""
+
+from conftest import L1_CONTRACT_ADDRESS
+from l1_messages import L1_INDEXED_HANDLER_SELECTOR, build_l1_indexed_message_handler_payload
+from open_zeppelin.utils import uint
+
+
+async def sail(admiral, l2_keeper, ships):
+    """Departs one ship per list of (user, deposit), returns the cargo of every ship."""
+    cargo = []
+    for ship_idx, deposits in enumerate(ships, 1):
+        for user, deposit in deposits:
+            await user.deposit_into_ship(admiral, deposit)
+        await l2_keeper.depart(admiral, ship_idx)
+        cargo.append(sum(deposit for _, deposit in deposits))
+    return cargo
+
+
+async def return_ships(starknet, admiral, loot_token, l2_keeper, ship_indexes, cargo, loot):
+    """Returns the ships with `loot` between them, `cargo` holds the cargo of every ship sailed."""
+    await l2_keeper.mint(loot_token, admiral, loot)
+    payload = build_l1_indexed_message_handler_payload(ship_indexes, [cargo[idx - 1] for idx in ship_indexes], loot)
+    await starknet.send_message_to_l2(L1_CONTRACT_ADDRESS, admiral.contract_address, L1_INDEXED_HANDLER_SELECTOR, payload)
+
+
+async def sail_and_return(starknet, admiral, loot_token, l2_keeper, deposits, loot, price_per_ship=0):
+    """Ship 1 departs with the given (user, deposit) crew, paying `price_per_ship`, and returns with `loot`."""
+    if price_per_ship:
+        await l2_keeper.send_transaction(admiral.contract_address, 'set_price_per_ship',
+                                         calldata=[*uint(price_per_ship)])
+    cargo = await sail(admiral, l2_keeper, [deposits])
+    await return_ships(starknet, admiral, loot_token, l2_keeper, [1], [cargo[0] - price_per_ship], loot)
+
+
+async def loot_balance(loot_token, user):
+    return (await loot_token.balanceOf(user.contract_address).call()).result.balance.low